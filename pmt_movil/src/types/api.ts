@@ -19,10 +19,20 @@ export interface Boleta {
   ubicacion_infraccion?: string
   nombre_infractor?: string
   articulo_codigo?: string
+  articulo_descripcion?: string
+  articulo_valor?: number
   infraccion_saldo?: number
   estado_boleta?: string
 }
 
+export interface SolvenciaResult {
+  placa: string
+  boletas: Boleta[]
+  cantidad: number
+  total_saldo: number
+  es_solvente: boolean | null
+}
+
 export interface RecentSearchItem {
   placa: string
   desc: string
@@ -15,10 +15,41 @@ Configuración en el Hikvision:
 
 import frappe
 import json
-import frappe
+import re
 from datetime import datetime
 from lxml import etree
 
+from sam.api.hikvision_attendance import get_touched_days, refresh_attendance_days
+from sam.api.hikvision_payload import insert_payloads, is_compressed_storage, lean_row
+from sam.api.hikvision_spool import is_buffered_ingestion, spool_event
+from sam.sam.doctype.hikvision_event.hikvision_event import make_event_key, make_event_name
+
+
+JSON_DECODER = json.JSONDecoder()
+
+# Inicio de un payload JSON/XML al comienzo de una línea
+PAYLOAD_START = re.compile(r"^[ \t]*[{<]", re.M)
+
+# Columnas de Hikvision Event que se llenan desde el payload
+EVENT_FIELDS = [
+	"received_at",
+	"source_ip",
+	"content_type",
+	"raw_body",
+	"parsed_json",
+	"event_type",
+	"employee_no",
+	"name_field",
+	"card_no",
+	"event_time",
+	"device_ip",
+	"serial_no",
+	"event_key",
+	"major_event",
+	"minor_event",
+	"attendance_status",
+]
+
 
 @frappe.whitelist(allow_guest=True, methods=["POST", "GET"])
 def receive_event():
@@ -41,51 +72,41 @@ def receive_event():
 		# Parsear el evento
 		parsed_data = parse_hikvision_event(raw_body, content_type)
 		
-		# Verificar si es un evento de marcaje (attendanceResult)
-		event_type = parsed_data.get("eventType") if parsed_data else None
-		
-		# Extraer datos del AccessControllerEvent si existe
-		acs_event = parsed_data.get("AccessControllerEvent", {}) if parsed_data else {}
-		
-		# Obtener el nombre del empleado
-		employee_name = acs_event.get("name") or parsed_data.get("name") if parsed_data else None
-		major_event = acs_event.get("majorEventType")
+		# Extraer las columnas del evento
+		row = build_event_row(parsed_data, raw_body, content_type, source_ip)
 		
 		# Solo guardar eventos con persona identificada (tiene nombre)
-		if not employee_name:
+		if not row["name_field"]:
 			# Responder 200 OK pero no guardar
 			return {"status": "ok", "message": "Event ignored (no employee identified)"}
 		
 		# Log del evento recibido
 		frappe.logger("hikvision", allow_site=True).info(
-			f"Attendance event received from {source_ip} | Name: {employee_name}"
+			f"Attendance event received from {source_ip} | Name: {row['name_field']}"
 		)
 		
-		# Crear el documento de evento
-		event_doc = frappe.get_doc({
-			"doctype": "Hikvision Event",
-			"received_at": datetime.now(),
-			"source_ip": source_ip,
-			"content_type": content_type,
-			"raw_body": raw_body,
-			"parsed_json": json.dumps(parsed_data, indent=2) if parsed_data else None,
-			"event_type": event_type,
-			"employee_no": acs_event.get("employeeNoString") or parsed_data.get("employeeNo") if parsed_data else None,
-			"name_field": employee_name,
-			"card_no": acs_event.get("cardNo") or parsed_data.get("cardNo") if parsed_data else None,
-			"event_time": parse_datetime(parsed_data.get("dateTime")) if parsed_data else None,
-			"device_ip": parsed_data.get("ipAddress") or parsed_data.get("deviceIP") if parsed_data else None,
-			"major_event": major_event,
-			"minor_event": acs_event.get("subEventType") or parsed_data.get("minor") if parsed_data else None,
-			"attendance_status": acs_event.get("attendanceStatus") or parsed_data.get("attendanceStatus") if parsed_data else None,
-		})
+		# Modo buffer: encolar y dejar la escritura al worker
+		if is_buffered_ingestion():
+			spool_event(row)
+			return {"status": "ok", "message": "Event received"}
+
+		# Crear el documento de evento (sin payload si va comprimido aparte)
+		compressed = is_compressed_storage()
+		event_doc = frappe.get_doc({"doctype": "Hikvision Event", **(lean_row(row) if compressed else row)})
 		
 		# Insertar sin notificaciones
-		event_doc.insert(ignore_permissions=True)
+		try:
+			event_doc.insert(ignore_permissions=True)
+		except (frappe.DuplicateEntryError, frappe.UniqueValidationError):
+			# Mismo marcaje ya recibido (push repetido, alertStream o AcsEvent)
+			frappe.db.rollback()
+			return {"status": "ok", "message": "Duplicate event ignored"}
+		if compressed:
+			insert_payloads([(event_doc.name, row)])
 		frappe.db.commit()
 		
 		frappe.logger("hikvision", allow_site=True).info(
-			f"Attendance stored: {event_doc.name} | Employee: {acs_event.get('employeeNoString', 'N/A')} | Name: {acs_event.get('name', 'N/A')}"
+			f"Attendance stored: {event_doc.name} | Employee: {row['employee_no'] or 'N/A'} | Name: {row['name_field']}"
 		)
 		
 	except Exception as e:
@@ -146,6 +167,146 @@ def get_events(limit=50, event_type=None, employee_no=None):
 		return {"status": "error", "message": str(e)}
 
 
+def build_event_row(parsed_data, raw_body, content_type, source_ip):
+	"""
+	Extrae las columnas de Hikvision Event desde un evento parseado.
+
+	Args:
+		parsed_data (dict): Evento parseado (JSON o XML)
+		raw_body (str): Cuerpo raw del evento
+		content_type (str): Content-Type header
+		source_ip (str): IP que envió el evento
+
+	Returns:
+		dict: Valores por fieldname (ver EVENT_FIELDS)
+	"""
+	parsed_data = parsed_data or {}
+
+	# Extraer datos del AccessControllerEvent si existe
+	acs_event = parsed_data.get("AccessControllerEvent") or {}
+
+	row = {
+		"received_at": datetime.now(),
+		"source_ip": source_ip,
+		"content_type": content_type,
+		"raw_body": raw_body,
+		"parsed_json": json.dumps(parsed_data, indent=2) if parsed_data else None,
+		"event_type": parsed_data.get("eventType"),
+		"employee_no": acs_event.get("employeeNoString") or parsed_data.get("employeeNo"),
+		"name_field": acs_event.get("name") or parsed_data.get("name"),
+		"card_no": acs_event.get("cardNo") or parsed_data.get("cardNo"),
+		"event_time": parse_datetime(parsed_data.get("dateTime")),
+		"device_ip": parsed_data.get("ipAddress") or parsed_data.get("deviceIP"),
+		"major_event": acs_event.get("majorEventType"),
+		"minor_event": acs_event.get("subEventType") or parsed_data.get("minor"),
+		"attendance_status": acs_event.get("attendanceStatus") or parsed_data.get("attendanceStatus"),
+		"serial_no": acs_event.get("serialNo") or parsed_data.get("serialNo"),
+	}
+	row["event_key"] = make_event_key(row)
+	return row
+
+
+def insert_events(rows):
+	"""
+	Inserta un lote de eventos con un solo INSERT IGNORE multi-fila.
+
+	No ejecuta hooks de documento ni hace commit; el llamador confirma
+	la transacción una vez por lote. Solo los eventos que realmente se
+	insertaron guardan payload, refrescan Hikvision Attendance Day y se
+	cuentan.
+
+	Args:
+		rows (list): Diccionarios generados por build_event_row
+
+	Returns:
+		int: Cantidad de eventos nuevos; los duplicados no se cuentan
+	"""
+	if not rows:
+		return 0
+
+	now = frappe.utils.now()
+	owner = "Administrator"
+	compressed = is_compressed_storage()
+	# Un mismo event_key puede venir repetido en el lote
+	events = {}
+	for row in rows:
+		events.setdefault(make_event_name(row.get("event_key")), row)
+
+	fields = ["name", "owner", "creation", "modified", "modified_by", "docstatus", *EVENT_FIELDS]
+	values = [
+		(name, owner, now, now, owner, 0, *((lean_row(row) if compressed else row).get(f) for f in EVENT_FIELDS))
+		for name, row in events.items()
+	]
+	# Los que ya existen (reintentos, push y polling del mismo evento, aun
+	# guardados con otro nombre) se descartan en la base por event_key
+	frappe.db.bulk_insert("Hikvision Event", fields, values, ignore_duplicates=True)
+	inserted = get_inserted_names(events, now)
+	events = [(name, row) for name, row in events.items() if name in inserted]
+	if compressed:
+		insert_payloads(events)
+	refresh_attendance_days(get_touched_days([row for _, row in events]))
+	return len(events)
+
+
+def get_inserted_names(events, creation):
+	"""
+	Nombres de events que insertó el INSERT IGNORE con esa fecha de
+	creación. Los eventos sin event_key siempre se insertan.
+
+	Args:
+		events (dict): Fila de build_event_row por nombre de Hikvision Event
+		creation (str): creation usado en el INSERT
+
+	Returns:
+		set: Nombres insertados
+	"""
+	keys = [row["event_key"] for row in events.values() if row.get("event_key")]
+	inserted = {name for name, row in events.items() if not row.get("event_key")}
+	if keys:
+		inserted.update(
+			frappe.db.sql_list(
+				"SELECT name FROM `tabHikvision Event` WHERE event_key IN %(keys)s AND creation = %(creation)s",
+				{"keys": keys, "creation": creation},
+			)
+		)
+	return inserted
+
+
+def store_event_batch(rows):
+	"""
+	Guarda un lote con un solo INSERT y un commit. Si el lote falla,
+	reintenta fila por fila para no perder los eventos válidos por culpa
+	de uno inválido.
+
+	Args:
+		rows (list): Diccionarios generados por build_event_row
+
+	Returns:
+		int: Filas guardadas
+	"""
+	try:
+		inserted = insert_events(rows)
+		frappe.db.commit()
+		return inserted
+	except Exception as e:
+		frappe.db.rollback()
+		frappe.logger("hikvision", allow_site=True).warning(
+			f"Batch insert failed, retrying row by row: {e!s}"
+		)
+
+	inserted = 0
+	for row in rows:
+		try:
+			inserted += insert_events([row])
+			frappe.db.commit()
+		except Exception as e:
+			frappe.db.rollback()
+			frappe.logger("hikvision", allow_site=True).error(
+				f"Event dropped: {e!s} | Row: {frappe.as_json(row, indent=None)[:500]}"
+			)
+	return inserted
+
+
 def parse_hikvision_event(raw_body, content_type):
 	"""
 	Parsea el cuerpo del evento recibido del Hikvision.
@@ -155,7 +316,10 @@ def parse_hikvision_event(raw_body, content_type):
 	- text/xml
 	- text/plain (asume JSON o XML)
 	- application/json
-	- multipart/x-mixed-replace (stream)
+	- multipart/x-mixed-replace y multipart/form-data (stream / push con imagen)
+
+	El formato se decide por el primer carácter del cuerpo (o de la parte
+	multipart) y su Content-Type, sin intentos fallidos de json.loads.
 	
 	Args:
 		raw_body (str): Cuerpo raw del evento
@@ -169,105 +333,115 @@ def parse_hikvision_event(raw_body, content_type):
 	
 	# Normalizar content type
 	content_type = (content_type or "").lower()
+	body = raw_body.strip()
 	
 	try:
-		# Limpiar el body si tiene multipart boundary
-		clean_body = extract_json_from_multipart(raw_body)
+		# Multipart: una sola pasada para ubicar la parte JSON/XML
+		if body.startswith("--"):
+			part_type, body = extract_multipart_payload(body)
+			if body is None:
+				return None
+			content_type = part_type or content_type
 		
-		# Intentar parsear como JSON primero (formato más común del Hikvision)
-		try:
-			return json.loads(clean_body)
-		except:
-			pass
+		if body.startswith("{"):
+			# raw_decode ignora lo que venga después del objeto (boundary final)
+			return JSON_DECODER.raw_decode(body)[0]
 		
-		# Intentar parsear como XML
-		if "xml" in content_type:
-			return parse_xml_event(clean_body)
+		if body.startswith("<") or body.startswith("\ufeff"):
+			return parse_xml_event(body)
 		
-		# Último intento: XML
+		# Formato no reconocido por el primer carácter: JSON y luego XML
 		try:
-			return parse_xml_event(clean_body)
-		except:
-			pass
-			
+			return json.loads(body)
+		except ValueError:
+			return parse_xml_event(body)
+
 	except Exception as e:
-		frappe.logger("hikvision", allow_site=True).warning(
-			f"Failed to parse event: {str(e)}"
-		)
+		if "json" in content_type or "xml" in content_type:
+			frappe.logger("hikvision", allow_site=True).warning(
+				f"Failed to parse event: {e!s}"
+			)
 		return None
 
 
-def extract_json_from_multipart(raw_body):
+def extract_multipart_payload(body):
 	"""
-	Extrae JSON limpio de un body multipart.
+	Extrae la parte de texto (JSON o XML) de un body multipart.
 	
 	El Hikvision envía eventos con formato:
 	--MIME_boundary
 	Content-Disposition: form-data; name="event_log"
+	Content-Type: application/json
 	
 	{...json...}
+	--MIME_boundary
+	Content-Type: image/jpeg
+	...
 	--MIME_boundary--
 	
 	Args:
-		raw_body (str): Cuerpo raw del evento
+		body (str): Cuerpo multipart (empieza con el boundary)
 	
 	Returns:
-		str: JSON limpio
+		tuple: (content_type de la parte, payload) o (None, None) si no hay
+		una parte JSON/XML
 	"""
-	if not raw_body:
-		return raw_body
-	
-	body = raw_body.strip()
-	
-	# Si empieza con {, es JSON puro
-	if body.startswith("{"):
-		# Buscar el cierre del JSON
-		boundary_markers = ["--MIME_boundary", "--boundary", "\n--"]
-		
-		for marker in boundary_markers:
-			if marker in body:
-				parts = body.split(marker)
-				if parts:
-					json_part = parts[0].strip()
-					if not json_part.endswith("}"):
-						last_brace = json_part.rfind("}")
-						if last_brace > 0:
-							json_part = json_part[:last_brace+1]
-					return json_part
-		return body
-	
-	# Si empieza con --, es multipart
-	if body.startswith("--"):
-		# Buscar el JSON después de los headers multipart
-		lines = body.split("\n")
-		json_start = -1
-		brace_count = 0
-		json_lines = []
+	boundary = body.split("\n", 1)[0].strip().rstrip("-")
+
+	for part in body.split(boundary):
+		headers, sep, payload = part.partition("\n\n")
+		if not sep:
+			headers, sep, payload = part.partition("\r\n\r\n")
+		if not sep:
+			headers, payload = "", part
 		
-		for i, line in enumerate(lines):
-			# Buscar el inicio del JSON (línea que empieza con {)
-			if line.strip().startswith("{"):
-				json_start = i
-			
-			if json_start >= 0:
-				# Acumular líneas del JSON
-				json_lines.append(line)
-				brace_count += line.count("{") - line.count("}")
-				
-				# Si encontramos el cierre del JSON
-				if brace_count == 0:
-					break
+		part_type = ""
+		for header in headers.splitlines():
+			name, _, value = header.partition(":")
+			if name.strip().lower() == "content-type":
+				part_type = value.strip().lower()
+		if part_type.startswith("image"):
+			continue
 		
-		if json_lines:
-			return "\n".join(json_lines)
+		# Normalmente el payload empieza justo después de los headers
+		match = PAYLOAD_START.search(payload)
+		if match:
+			return part_type, payload[match.start():].strip()
 	
-	return raw_body
+	return None, None
+
+
+# Campos XML a diccionario: clave -> tags candidatos, en orden de prioridad
+XML_FIELD_MAPPING = {
+	# Campos estándar Hikvision
+	"eventType": ["eventType", "eventtype"],
+	"dateTime": ["dateTime", "datetime", "timeStamp"],
+	"ipAddress": ["ipAddress", "ipaddress", "deviceIP", "deviceIp"],
+	"employeeNo": ["employeeNo", "employeeno", "employeeID", "employeeId"],
+	"name": ["name", "employeeName"],
+	"cardNo": ["cardNo", "cardno", "cardNumber"],
+	"major": ["major", "majorEvent"],
+	"minor": ["minor", "minorEvent"],
+	"attendanceStatus": ["attendanceStatus", "attendancestatus"],
+	# Campos adicionales
+	"deviceName": ["deviceName"],
+	"serialNumber": ["serialNumber"],
+	"macAddress": ["macAddress"],
+	"channelID": ["channelID", "channelId"],
+	"regionID": ["regionID", "regionId"],
+}
+XML_FIELD_TAGS = frozenset(tag for tags in XML_FIELD_MAPPING.values() for tag in tags)
+XML_VERIFY_TAGS = ("FaceVerifyResult", "FingerprintVerifyResult")
 
 
 def parse_xml_event(xml_string):
 	"""
 	Parsea un evento XML del Hikvision (EventNotificationAlert).
 	
+	Recorre el árbol una sola vez, guardando el primer elemento de cada tag
+	conocido (sin namespace); luego cada campo toma el primer tag candidato
+	con texto.
+
 	Args:
 		xml_string (str): String XML del evento
 	
@@ -282,45 +456,35 @@ def parse_xml_event(xml_string):
 	# Parsear XML
 	parser = etree.XMLParser(remove_blank_text=True, recover=True)
 	root = etree.fromstring(xml_string.encode('utf-8'), parser=parser)
+	if root is None:
+		raise ValueError("Invalid XML event")
+
+	# Primer elemento (en orden de documento) de cada tag de interés
+	first = {}
+	for element in root.iter():
+		tag = element.tag
+		if element is root or not isinstance(tag, str):
+			continue  # la raíz no cuenta (igual que .//tag); comentarios / PIs
+		tag = tag.rpartition("}")[2]
+		if tag not in first and (tag in XML_FIELD_TAGS or tag in XML_VERIFY_TAGS):
+			first[tag] = element
 	
 	# Extraer campos comunes del EventNotificationAlert
 	result = {}
-	
-	# Mapeo de campos XML a diccionario
-	field_mapping = {
-		# Campos estándar Hikvision
-		"eventType": ["eventType", "eventtype"],
-		"dateTime": ["dateTime", "datetime", "timeStamp"],
-		"ipAddress": ["ipAddress", "ipaddress", "deviceIP", "deviceIp"],
-		"employeeNo": ["employeeNo", "employeeno", "employeeID", "employeeId"],
-		"name": ["name", "employeeName"],
-		"cardNo": ["cardNo", "cardno", "cardNumber"],
-		"major": ["major", "majorEvent"],
-		"minor": ["minor", "minorEvent"],
-		"attendanceStatus": ["attendanceStatus", "attendancestatus"],
-		# Campos adicionales
-		"deviceName": ["deviceName"],
-		"serialNumber": ["serialNumber"],
-		"macAddress": ["macAddress"],
-		"channelID": ["channelID", "channelId"],
-		"regionID": ["regionID", "regionId"],
-	}
-	
-	# Buscar cada campo en el XML
-	for key, xpath_names in field_mapping.items():
-		for xpath_name in xpath_names:
-			# Buscar en cualquier nivel del XML
-			element = root.find(f".//{xpath_name}")
+	for key, tags in XML_FIELD_MAPPING.items():
+		for tag in tags:
+			element = first.get(tag)
 			if element is not None and element.text:
 				result[key] = element.text.strip()
 				break
 	
 	# Si hay un campo de verificación (face verify, fingerprint, etc.)
-	verify_result = root.find(".//FaceVerifyResult") or root.find(".//FingerprintVerifyResult")
+	face = first.get("FaceVerifyResult")
+	verify_result = face if face is not None and len(face) else first.get("FingerprintVerifyResult")
 	if verify_result is not None:
 		for child in verify_result:
-			if child.text:
-				result[child.tag] = child.text.strip()
+			if isinstance(child.tag, str) and child.text:
+				result[child.tag.rpartition("}")[2]] = child.text.strip()
 	
 	# Extraer atributos del root si existen
 	if root.attrib:
@@ -0,0 +1,199 @@
+# Copyright (c) 2026, Lidar Holding Group S. A. and contributors
+# For license information, please see license.txt
+
+"""
+Hikvision Attendance Day
+
+Resumen diario de marcajes (primer y último marcaje, cantidad de eventos)
+por empleado, usado por el Hikvision Attendance Report en lugar de agrupar
+todos los Hikvision Event en cada consulta.
+
+Cada inserción de eventos recalcula solo los pares (empleado, fecha) que
+tocó, con un INSERT ... SELECT ... GROUP BY. El nombre de cada fila se
+deriva de (empleado, employee_no, fecha), así que recalcular es
+idempotente.
+
+Los lotes (sam.api.hikvision.insert_events) recalculan en la misma
+transacción. Los eventos sueltos (modo Direct, borrados) solo anotan el
+par en un set de Redis después del commit; un job recalcula los pares
+pendientes, sin repetir los de pushes concurrentes del mismo empleado y
+día.
+
+Uso:
+    bench --site sam.mdf.lan hikvision-rebuild-attendance --from-date 2026-01-01
+"""
+
+from datetime import timedelta
+from functools import partial
+
+import frappe
+from frappe.utils import add_months, get_first_day, getdate
+
+REFRESH_CHUNK_SIZE = 200
+PENDING_DAYS_KEY = "hikvision:attendance_pending_days"
+REFRESH_JOB_ID = "hikvision_refresh_attendance_days"
+
+# Agrupa los eventos igual que el reporte: (empleado, employee_no, fecha)
+AGGREGATE_SQL = """
+	INSERT INTO `tabHikvision Attendance Day`
+		(name, owner, creation, modified, modified_by, docstatus,
+		employee, employee_no, attendance_date, first_in, last_out, event_count)
+	SELECT
+		CONCAT('HAD-', LEFT(SHA1(CONCAT_WS('|', h.name_field, IFNULL(h.employee_no, ''), DATE(h.event_time))), 20)),
+		'Administrator', NOW(6), NOW(6), 'Administrator', 0,
+		h.name_field,
+		h.employee_no,
+		DATE(h.event_time),
+		MIN(TIME(h.event_time)),
+		MAX(TIME(h.event_time)),
+		COUNT(*)
+	FROM `tabHikvision Event` h
+	WHERE
+		h.event_time IS NOT NULL
+		AND h.name_field IS NOT NULL
+		AND h.name_field != ''
+		AND ({conditions})
+	GROUP BY h.name_field, h.employee_no, DATE(h.event_time)
+	ON DUPLICATE KEY UPDATE
+		first_in = VALUES(first_in),
+		last_out = VALUES(last_out),
+		event_count = VALUES(event_count),
+		modified = VALUES(modified)
+"""
+
+
+def get_touched_days(rows):
+	"""
+	Pares (empleado, fecha) afectados por un lote de eventos.
+
+	Args:
+		rows (list): Filas de build_event_row (o documentos Hikvision Event)
+
+	Returns:
+		set: Tuplas (name_field, date)
+	"""
+	return {
+		(row.get("name_field"), getdate(row.get("event_time")))
+		for row in rows
+		if row.get("name_field") and row.get("event_time")
+	}
+
+
+def refresh_attendance_days(days):
+	"""
+	Recalcula las filas de Hikvision Attendance Day de los pares dados.
+
+	No hace commit; se confirma junto con los eventos que las originaron.
+
+	Args:
+		days (iterable): Tuplas (name_field, date), ver get_touched_days
+	"""
+	days = sorted(days)
+	for i in range(0, len(days), REFRESH_CHUNK_SIZE):
+		chunk = days[i : i + REFRESH_CHUNK_SIZE]
+		conditions = " OR ".join(
+			"(h.name_field = %s AND h.event_time >= %s AND h.event_time < %s)" for _ in chunk
+		)
+		values = []
+		for employee, day in chunk:
+			values.extend((employee, day, day + timedelta(days=1)))
+
+		# Borrar primero: un día cuyos eventos ya no existen no debe quedar
+		frappe.db.sql(
+			"DELETE FROM `tabHikvision Attendance Day` WHERE "
+			+ " OR ".join("(employee = %s AND attendance_date = %s)" for _ in chunk),
+			[value for key in chunk for value in key],
+		)
+		frappe.db.sql(AGGREGATE_SQL.format(conditions=conditions), values)
+
+
+def queue_attendance_refresh(days):
+	"""
+	Deja los pares para refresh_pending_attendance_days después del commit,
+	fuera de la petición del dispositivo.
+
+	Args:
+		days (iterable): Tuplas (name_field, date), ver get_touched_days
+	"""
+	members = [f"{employee}|{day.isoformat()}" for employee, day in days]
+	if members:
+		frappe.db.after_commit.add(partial(_enqueue_pending_days, members))
+
+
+def _enqueue_pending_days(members):
+	frappe.cache().sadd(PENDING_DAYS_KEY, *members)
+	frappe.enqueue(
+		"sam.api.hikvision_attendance.refresh_pending_attendance_days",
+		queue="short",
+		job_id=REFRESH_JOB_ID,
+		deduplicate=True,
+	)
+
+
+def refresh_pending_attendance_days():
+	"""
+	Recalcula los pares anotados por queue_attendance_refresh, con un
+	commit por bloque. También corre cada minuto desde el scheduler, por si
+	un par llegó mientras el job ya terminaba.
+
+	Returns:
+		int: Pares recalculados
+	"""
+	cache = frappe.cache()
+	key = cache.make_key(PENDING_DAYS_KEY)
+	total = 0
+	while members := cache.execute_command("SPOP", key, REFRESH_CHUNK_SIZE):
+		days = set()
+		for member in members:
+			employee, day = frappe.safe_decode(member).rsplit("|", 1)
+			days.add((employee, getdate(day)))
+		refresh_attendance_days(days)
+		frappe.db.commit()
+		total += len(days)
+	return total
+
+
+def rebuild_attendance_days(from_date=None, to_date=None):
+	"""
+	Reconstruye Hikvision Attendance Day desde los eventos, un mes por
+	transacción.
+
+	Args:
+		from_date (str): Fecha inicial (default: primer evento)
+		to_date (str): Fecha final, inclusive (default: último evento)
+
+	Returns:
+		int: Filas de resumen generadas
+	"""
+	bounds = frappe.db.sql(
+		"SELECT MIN(event_time), MAX(event_time) FROM `tabHikvision Event` WHERE event_time IS NOT NULL"
+	)[0]
+	if not bounds[0]:
+		return 0
+
+	start = getdate(from_date or bounds[0])
+	end = getdate(to_date or bounds[1]) + timedelta(days=1)
+	total = 0
+
+	month_start = start
+	while month_start < end:
+		month_end = min(getdate(add_months(get_first_day(month_start), 1)), end)
+
+		frappe.db.sql(
+			"""DELETE FROM `tabHikvision Attendance Day`
+			WHERE attendance_date >= %s AND attendance_date < %s""",
+			(month_start, month_end),
+		)
+		frappe.db.sql(
+			AGGREGATE_SQL.format(conditions="h.event_time >= %s AND h.event_time < %s"),
+			(month_start, month_end),
+		)
+		frappe.db.commit()
+
+		total += frappe.db.count(
+			"Hikvision Attendance Day",
+			{"attendance_date": ["between", [month_start, month_end - timedelta(days=1)]]},
+		)
+		month_start = month_end
+
+	return total
@@ -0,0 +1,156 @@
+# Copyright (c) 2026, Lidar Holding Group S. A. and contributors
+# For license information, please see license.txt
+
+"""
+Hikvision Event Payload Storage
+
+Política de almacenamiento del payload crudo de Hikvision Event,
+configurable en "Hikvision Settings":
+
+- Inline: raw_body y parsed_json se guardan en la fila del evento.
+- Compressed: la fila solo lleva las columnas extraídas; el raw_body se
+  guarda comprimido (zlib + base64) en Hikvision Event Payload, con el
+  mismo nombre del evento. parsed_json se vuelve a generar al consultarlo.
+
+Los payloads con más de payload_retention_days días se eliminan cada
+noche (prune_event_payloads).
+
+Uso:
+    >>> from sam.api.hikvision_payload import get_event_payload
+    >>> get_event_payload("HE-...")
+"""
+
+import base64
+import zlib
+
+import frappe
+from frappe.utils import add_days, now_datetime
+
+PAYLOAD_DOCTYPE = "Hikvision Event Payload"
+PAYLOAD_FIELDS = ["content_type", "raw_size", "payload"]
+PRUNE_CHUNK_SIZE = 5000
+
+
+def is_compressed_storage():
+	"""True si los payloads van comprimidos a Hikvision Event Payload."""
+	return frappe.get_cached_doc("Hikvision Settings").payload_storage == "Compressed"
+
+
+def compress_payload(raw_body):
+	"""Comprime un payload a texto (zlib + base64)."""
+	return base64.b64encode(zlib.compress(raw_body.encode("utf-8"), 6)).decode("ascii")
+
+
+def decompress_payload(payload):
+	"""Inverso de compress_payload."""
+	return zlib.decompress(base64.b64decode(payload)).decode("utf-8")
+
+
+def lean_row(row):
+	"""Copia de la fila sin las columnas de payload (la fila original no se modifica)."""
+	return {**row, "raw_body": None, "parsed_json": None}
+
+
+def insert_payloads(events):
+	"""
+	Guarda los payloads comprimidos de un lote de eventos con un solo INSERT.
+
+	No hace commit; se confirma junto con los eventos.
+
+	Args:
+		events (list): Tuplas (nombre del Hikvision Event, fila de build_event_row)
+	"""
+	now = frappe.utils.now()
+	owner = "Administrator"
+	values = [
+		(
+			name, owner, now, now, owner, 0,
+			row.get("content_type"),
+			len(row["raw_body"].encode("utf-8")),
+			compress_payload(row["raw_body"]),
+		)
+		for name, row in events
+		if row.get("raw_body")
+	]
+	if values:
+		frappe.db.bulk_insert(
+			PAYLOAD_DOCTYPE,
+			["name", "owner", "creation", "modified", "modified_by", "docstatus", *PAYLOAD_FIELDS],
+			values,
+			ignore_duplicates=True,
+		)
+
+
+@frappe.whitelist()
+def get_event_payload(event):
+	"""
+	Payload crudo de un evento, esté guardado inline o comprimido.
+
+	Args:
+		event (str): Nombre del Hikvision Event
+
+	Returns:
+		dict: content_type, raw_body y parsed_json (None si ya fue eliminado)
+	"""
+	from sam.api.hikvision import parse_hikvision_event
+
+	frappe.only_for("System Manager")
+
+	inline = frappe.db.get_value(
+		"Hikvision Event", event, ["content_type", "raw_body", "parsed_json"], as_dict=True
+	)
+	if not inline:
+		frappe.throw(f"Hikvision Event {event} not found", frappe.DoesNotExistError)
+	if inline.raw_body:
+		return inline
+
+	stored = frappe.db.get_value(PAYLOAD_DOCTYPE, event, ["content_type", "payload"], as_dict=True)
+	if not stored:
+		return frappe._dict(content_type=inline.content_type, raw_body=None, parsed_json=None)
+
+	raw_body = decompress_payload(stored.payload)
+	parsed = parse_hikvision_event(raw_body, stored.content_type)
+	return frappe._dict(
+		content_type=stored.content_type,
+		raw_body=raw_body,
+		parsed_json=frappe.as_json(parsed) if parsed else None,
+	)
+
+
+def prune_event_payloads():
+	"""
+	Job diario: elimina los payloads con más de payload_retention_days días,
+	tanto los comprimidos como los que quedaron inline en Hikvision Event.
+	Las columnas extraídas del evento se conservan.
+	"""
+	retention_days = frappe.db.get_single_value("Hikvision Settings", "payload_retention_days")
+	if not retention_days:
+		return
+
+	cutoff = add_days(now_datetime(), -retention_days)
+	deleted = _run_in_chunks(
+		f"DELETE FROM `tab{PAYLOAD_DOCTYPE}` WHERE creation < %(cutoff)s LIMIT {PRUNE_CHUNK_SIZE}",
+		cutoff,
+	)
+	cleared = _run_in_chunks(
+		f"""UPDATE `tabHikvision Event` SET raw_body = NULL, parsed_json = NULL
+		WHERE creation < %(cutoff)s AND (raw_body IS NOT NULL OR parsed_json IS NOT NULL)
+		LIMIT {PRUNE_CHUNK_SIZE}""",
+		cutoff,
+	)
+
+	frappe.logger("hikvision", allow_site=True).info(
+		f"Payloads pruned: {deleted} compressed, {cleared} inline | Older than {cutoff}"
+	)
+
+
+def _run_in_chunks(query, cutoff):
+	"""Ejecuta query (con LIMIT) hasta que no afecte filas, con un commit por bloque."""
+	total = 0
+	while True:
+		frappe.db.sql(query, {"cutoff": cutoff})
+		affected = frappe.db._cursor.rowcount
+		frappe.db.commit()
+		total += affected
+		if affected < PRUNE_CHUNK_SIZE:
+			return total
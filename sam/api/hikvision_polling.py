@@ -16,6 +16,7 @@ Uso:
 import frappe
 import json
 import requests
+import uuid
 from datetime import datetime
 from requests.auth import HTTPDigestAuth
 
@@ -44,10 +45,33 @@ def get_device_config(device_name=None):
 	if not device:
 		return None
 	
+	return _build_device_config(device)
+
+
+def get_active_devices():
+	"""
+	Obtiene la configuración de todos los dispositivos activos.
+
+	Returns:
+		list: Configuraciones (mismo formato que get_device_config)
+	"""
+	devices = frappe.get_all(
+		"Hikvision Device",
+		filters={"is_active": 1},
+		fields=["name", "device_name", "device_ip", "port", "username"],
+		order_by="name asc",
+	)
+	return [_build_device_config(device) for device in devices]
+
+
+def _build_device_config(device):
+	"""Arma el dict de configuración, descifrando la contraseña una sola vez."""
 	# Obtener la contraseña (campo Password)
 	password = frappe.get_decrypted_password("Hikvision Device", device.name, "password")
 	
 	return {
+		"name": device.name,
+		"device_name": device.device_name,
 		"host": device.device_ip,
 		"port": device.port or 80,
 		"username": device.username,
@@ -80,6 +104,10 @@ def poll_alert_stream(duration_seconds=60, device_name=None):
     """
     Lee el stream de alertas del Hikvision por un tiempo determinado.
     
+    Útil para pruebas desde consola. En producción usar el consumidor
+    continuo (bench hikvision-stream, ver sam.api.hikvision_stream), que no
+    pierde los eventos enviados entre corridas.
+
     Args:
         duration_seconds (int): Segundos a escuchar el stream
         device_name (str): Nombre del dispositivo (opcional)
@@ -212,6 +240,7 @@ def save_event_from_stream(event_data, device_name=None):
             "major_event": acs_event.get("majorEventType"),
             "minor_event": acs_event.get("subEventType"),
             "attendance_status": acs_event.get("attendanceStatus"),
+            "serial_no": acs_event.get("serialNo"),
         })
         
         event_doc.insert(ignore_permissions=True)
@@ -258,14 +287,15 @@ def parse_hikvision_datetime(datetime_str):
     return None
 
 
-def search_acs_events(start_time=None, end_time=None, max_results=30):
+def search_acs_events(start_time=None, end_time=None, max_results=None, device_name=None):
     """
     Busca eventos de control de acceso en el Hikvision.
     
     Args:
         start_time (str): Tiempo inicio (formato: 2026-03-01T00:00:00)
         end_time (str): Tiempo fin (formato: 2026-03-13T23:59:59)
-        max_results (int): Máximo de resultados
+        max_results (int): Máximo de resultados (None = todas las páginas)
+        device_name (str): Nombre del dispositivo (opcional)
     
     Returns:
         list: Lista de eventos
@@ -277,41 +307,59 @@ def search_acs_events(start_time=None, end_time=None, max_results=30):
     if not end_time:
         end_time = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
     
-    config = get_device_config()
+    config = get_device_config(device_name)
     if not config:
         raise ValueError("No active Hikvision device found in configuration")
     
-    url = get_hikvision_url("/ISAPI/AccessControl/AcsEvent")
-    auth = get_hikvision_auth()
+    try:
+        events = []
+        for infos in iter_acs_event_pages(config, start_time, end_time):
+            events.extend(infos)
+            if max_results and len(events) >= max_results:
+                return events[:max_results]
+        return events
+    except Exception as e:
+        frappe.logger("hikvision").error(f"AcsEvent search error: {e!s}")
+        return None
+
+
+def fetch_acs_events(config, start_time, end_time, position=0, max_results=30, search_id="001"):
+    """
+    POST a /ISAPI/AccessControl/AcsEvent para un dispositivo.
+
+    Solo usa requests (no la API de frappe), por lo que puede ejecutarse
+    desde hilos del pool de polling.
     
-    # El endpoint requiere POST con JSON
+    Args:
+        config (dict): Configuración del dispositivo (get_device_config)
+        start_time (str): Tiempo inicio (formato: 2026-03-01T00:00:00)
+        end_time (str): Tiempo fin
+        position (int): searchResultPosition
+        max_results (int): Máximo de resultados por página
+        search_id (str): Identificador de la búsqueda
+
+    Returns:
+        dict: Respuesta JSON del dispositivo
+    """
+    url = f"http://{config['host']}:{config['port']}/ISAPI/AccessControl/AcsEvent"
     payload = {
         "AcsEventCond": {
-            "searchID": "001",
-            "searchResultPosition": 0,
+            "searchID": search_id,
+            "searchResultPosition": position,
             "maxResults": max_results,
             "startTime": start_time,
             "endTime": end_time
         }
     }
-    
-    try:
-        response = requests.post(
-            url,
-            auth=auth,
-            json=payload,
-            timeout=config["timeout"]
-        )
-        
-        if response.status_code == 200:
-            return response.json()
-        else:
-            frappe.logger("hikvision").error(f"AcsEvent search failed: {response.status_code}")
-            return None
-            
-    except Exception as e:
-        frappe.logger("hikvision").error(f"AcsEvent search error: {str(e)}")
-        return None
+    response = requests.post(
+        url,
+        auth=HTTPDigestAuth(config["username"], config["password"]),
+        json=payload,
+        timeout=config["timeout"]
+    )
+    if response.status_code != 200:
+        raise ConnectionError(f"AcsEvent search failed: HTTP {response.status_code}")
+    return response.json()
 
 
 def get_device_info(device_name=None):
@@ -392,6 +440,213 @@ def poll_events(duration=60, device_name=None):
     return events
 
 
+ACS_POLL_LOOKBACK_HOURS = 24
+ACS_POLL_MAX_EVENTS = 5000
+
+
+def acs_event_to_row(info, config):
+    """
+    Convierte un elemento de AcsEvent.InfoList en una fila de Hikvision Event.
+
+    Args:
+        info (dict): Evento devuelto por /ISAPI/AccessControl/AcsEvent
+        config (dict): Configuración del dispositivo
+
+    Returns:
+        dict: Fila compatible con sam.api.hikvision.insert_events
+    """
+    from sam.api.hikvision import build_event_row
+
+    parsed = {
+        "eventType": "AccessControllerEvent",
+        "dateTime": info.get("time"),
+        "ipAddress": config["host"],
+        "AccessControllerEvent": {
+            "name": info.get("name"),
+            "employeeNoString": info.get("employeeNoString"),
+            "cardNo": info.get("cardNo"),
+            "majorEventType": info.get("major"),
+            "subEventType": info.get("minor"),
+            "attendanceStatus": info.get("attendanceStatus"),
+            "serialNo": info.get("serialNo"),
+        },
+    }
+    return build_event_row(parsed, json.dumps(info), "application/json", config["host"])
+
+
+def iter_acs_event_pages(config, start_time, end_time, page_size=30):
+    """
+    Recorre todas las páginas de una búsqueda AcsEvent.
+
+    Usa un searchID único por búsqueda y avanza searchResultPosition hasta
+    que el dispositivo deja de responder responseStatusStrg = "MORE".
+
+    Args:
+        config (dict): Configuración del dispositivo
+        start_time (str): Tiempo inicio (formato: 2026-03-01T00:00:00)
+        end_time (str): Tiempo fin
+        page_size (int): maxResults por página
+
+    Yields:
+        list: Elementos de InfoList de cada página
+    """
+    search_id = uuid.uuid4().hex
+    position = 0
+
+    while True:
+        response = fetch_acs_events(
+            config,
+            start_time,
+            end_time,
+            position=position,
+            max_results=page_size,
+            search_id=search_id,
+        )
+        acs_event = response.get("AcsEvent") or {}
+        infos = acs_event.get("InfoList") or []
+        if infos:
+            yield infos
+
+        matches = acs_event.get("numOfMatches") or len(infos)
+        if acs_event.get("responseStatusStrg") != "MORE" or not matches:
+            break
+        position += matches
+
+
+def poll_device(config, state, page_size=30, max_events=ACS_POLL_MAX_EVENTS):
+    """
+    Consulta los eventos nuevos de un dispositivo desde su último sync.
+
+    La búsqueda empieza en last_sync (inclusive, resolución de segundos);
+    de los eventos de ese mismo segundo, last_cursor (serialNo) descarta
+    los que ya se guardaron, de modo que cada corrida solo trae eventos
+    nuevos.
+
+    Se ejecuta dentro del pool de hilos: solo hace I/O HTTP y devuelve los
+    eventos; la escritura en base de datos la hace el hilo principal.
+
+    Args:
+        config (dict): Configuración del dispositivo
+        state (dict): Estado del dispositivo (last_sync, last_cursor)
+        page_size (int): maxResults por página
+        max_events (int): Máximo de eventos por corrida; el resto se trae en
+            la siguiente a partir de la nueva marca
+
+    Returns:
+        list: Elementos de InfoList posteriores a la marca
+    """
+    from datetime import timedelta
+
+    from sam.api.hikvision import parse_datetime
+
+    since = state.get("last_sync") or datetime.now() - timedelta(hours=ACS_POLL_LOOKBACK_HOURS)
+    cursor = state.get("last_cursor") or 0
+
+    events = []
+    for infos in iter_acs_event_pages(
+        config,
+        since.strftime("%Y-%m-%dT%H:%M:%S"),
+        datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+        page_size=page_size,
+    ):
+        for info in infos:
+            event_time = parse_datetime(info.get("time"))
+            if event_time is None or event_time < since:
+                continue
+            if event_time == since and (info.get("serialNo") or 0) <= cursor:
+                continue
+            events.append(info)
+        if len(events) >= max_events:
+            break
+
+    return events
+
+
+def poll_all_devices(max_workers=None):
+    """
+    Consulta en paralelo todos los Hikvision Device activos.
+
+    Cada dispositivo corre en su propio hilo con su propio timeout, y sus
+    eventos se guardan en cuanto termina; un dispositivo lento o apagado
+    no retrasa a los demás. El estado por dispositivo (last_sync,
+    last_cursor, error_count, last_error) se guarda en Hikvision Device.
+
+    Args:
+        max_workers (int): Hilos del pool (default: Hikvision Settings.polling_workers)
+
+    Returns:
+        dict: Eventos guardados por dispositivo (None si falló)
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    from sam.api.hikvision import store_event_batch
+
+    configs = get_active_devices()
+    if not configs:
+        return {}
+
+    states = {
+        d.name: d
+        for d in frappe.get_all(
+            "Hikvision Device",
+            filters={"is_active": 1},
+            fields=["name", "last_sync", "last_cursor", "error_count"],
+        )
+    }
+    max_workers = int(max_workers or frappe.db.get_single_value("Hikvision Settings", "polling_workers") or 8)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(configs))) as pool:
+        futures = {
+            pool.submit(poll_device, config, states[config["name"]]): config
+            for config in configs
+        }
+        for future in as_completed(futures):
+            config = futures[future]
+            device = config["name"]
+            state = states[device]
+            try:
+                infos = future.result()
+            except Exception as e:
+                results[device] = None
+                frappe.db.set_value(
+                    "Hikvision Device",
+                    device,
+                    {"error_count": (state.error_count or 0) + 1, "last_error": str(e)[:1000]},
+                    update_modified=False,
+                )
+                frappe.db.commit()
+                frappe.logger("hikvision").error(f"AcsEvent polling failed for {device}: {e!s}")
+                continue
+
+            rows = [acs_event_to_row(info, config) for info in infos]
+            stored = store_event_batch([row for row in rows if row["name_field"]])
+
+            update = {"error_count": 0, "last_error": None}
+            # Marca = (hora del último evento, mayor serialNo en ese segundo)
+            event_times = [row["event_time"] for row in rows if row["event_time"]]
+            if event_times:
+                watermark = max(event_times)
+                update["last_sync"] = watermark
+                update["last_cursor"] = max(
+                    info.get("serialNo") or 0
+                    for info, row in zip(infos, rows, strict=True)
+                    if row["event_time"] == watermark
+                )
+            frappe.db.set_value("Hikvision Device", device, update, update_modified=False)
+            frappe.db.commit()
+            results[device] = stored
+
+    return results
+
+
+def poll_all_devices_job():
+    """Job del scheduler: polling de AcsEvent si está habilitado en Hikvision Settings."""
+    if not frappe.db.get_single_value("Hikvision Settings", "enable_acs_polling"):
+        return
+    poll_all_devices()
+
+
 # Para uso desde consola
 if __name__ == "__main__":
     poll_events(60)
@@ -0,0 +1,242 @@
+# Copyright (c) 2026, Lidar Holding Group S. A. and contributors
+# For license information, please see license.txt
+
+"""
+Hikvision Event Spool
+
+Ingesta por lotes para sam.api.hikvision.receive_event.
+
+Con "Hikvision Settings" en modo Buffered, el endpoint solo valida el
+payload y agrega la fila ya extraída a una lista de Redis. Un worker
+vacía la lista y escribe los Hikvision Event con frappe.db.bulk_insert,
+haciendo un commit por lote.
+
+Cada lote se mueve atómicamente a una lista de procesamiento y se borra
+de ella solo después del commit; si el proceso muere antes, el siguiente
+vaciado devuelve esos eventos al inicio del spool (event_key evita
+duplicarlos si ya se habían guardado). Un lock en Redis asegura un solo
+vaciado a la vez.
+
+Uso:
+    bench --site sam.mdf.lan hikvision-spool-worker
+    >>> from sam.api.hikvision_spool import flush_spool
+    >>> flush_spool()
+"""
+
+import time
+
+import frappe
+
+SPOOL_KEY = "hikvision:event_spool"
+PROCESSING_KEY = "hikvision:event_spool:processing"
+FLUSH_LOCK_KEY = "hikvision:event_spool:lock"
+FLUSH_LOCK_TTL = 300
+FLUSH_JOB_ID = "hikvision_flush_spool"
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 5
+
+
+def get_spool_settings(cached=True):
+	"""
+	Retorna la configuración de ingesta.
+
+	Args:
+		cached (bool): Usar el documento cacheado (False en procesos de larga duración)
+
+	Returns:
+		frappe._dict: ingestion_mode, batch_size, flush_interval
+	"""
+	if cached:
+		settings = frappe.get_cached_doc("Hikvision Settings")
+	else:
+		settings = frappe.get_doc("Hikvision Settings")
+	return frappe._dict(
+		ingestion_mode=settings.ingestion_mode or "Direct",
+		batch_size=settings.batch_size or DEFAULT_BATCH_SIZE,
+		flush_interval=settings.flush_interval or DEFAULT_FLUSH_INTERVAL,
+	)
+
+
+def is_buffered_ingestion():
+	"""True si receive_event debe encolar en lugar de insertar."""
+	return get_spool_settings().ingestion_mode == "Buffered"
+
+
+def get_spool_depth():
+	"""Cantidad de eventos pendientes en el spool."""
+	return frappe.cache().llen(SPOOL_KEY) or 0
+
+
+def spool_event(row):
+	"""
+	Agrega un evento al spool.
+
+	Cuando el spool alcanza batch_size se encola un vaciado inmediato
+	(un solo job a la vez gracias al job_id).
+
+	Args:
+		row (dict): Fila generada por sam.api.hikvision.build_event_row
+	"""
+	frappe.cache().rpush(SPOOL_KEY, frappe.as_json(row, indent=None))
+
+	if get_spool_depth() >= get_spool_settings().batch_size:
+		frappe.enqueue(
+			"sam.api.hikvision_spool.flush_spool",
+			queue="short",
+			job_id=FLUSH_JOB_ID,
+			deduplicate=True,
+		)
+
+
+# Mueve hasta ARGV[1] eventos del inicio del spool a la lista de procesamiento
+MOVE_BATCH_SCRIPT = """
+local items = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #items > 0 then
+	redis.call('LTRIM', KEYS[1], #items, -1)
+	redis.call('RPUSH', KEYS[2], unpack(items))
+end
+return items
+"""
+
+# Devuelve la lista de procesamiento al inicio del spool, en el mismo orden
+REQUEUE_SCRIPT = """
+local items = redis.call('LRANGE', KEYS[2], 0, -1)
+for i = #items, 1, -1 do
+	redis.call('LPUSH', KEYS[1], items[i])
+end
+redis.call('DEL', KEYS[2])
+return #items
+"""
+
+
+def _spool_keys(cache):
+	return cache.make_key(SPOOL_KEY), cache.make_key(PROCESSING_KEY)
+
+
+def _pop_batch(batch_size):
+	"""
+	Mueve atómicamente hasta batch_size eventos del inicio del spool a la
+	lista de procesamiento; _ack_batch los borra después del commit.
+	"""
+	cache = frappe.cache()
+	items = cache.eval(MOVE_BATCH_SCRIPT, 2, *_spool_keys(cache), batch_size)
+	return [frappe.parse_json(item) for item in items]
+
+
+def _ack_batch():
+	frappe.cache().delete_value(PROCESSING_KEY)
+
+
+def requeue_processing():
+	"""
+	Devuelve al spool los eventos de un vaciado que no llegó a confirmar
+	su lote. Solo es seguro con el lock de vaciado tomado.
+
+	Returns:
+		int: Eventos devueltos al spool
+	"""
+	cache = frappe.cache()
+	return cache.eval(REQUEUE_SCRIPT, 2, *_spool_keys(cache))
+
+
+def _acquire_flush_lock():
+	cache = frappe.cache()
+	return bool(cache.set(cache.make_key(FLUSH_LOCK_KEY), 1, nx=True, ex=FLUSH_LOCK_TTL))
+
+
+def _refresh_flush_lock():
+	cache = frappe.cache()
+	cache.expire(cache.make_key(FLUSH_LOCK_KEY), FLUSH_LOCK_TTL)
+
+
+def _release_flush_lock():
+	frappe.cache().delete_value(FLUSH_LOCK_KEY)
+
+
+def flush_spool(max_batches=None):
+	"""
+	Vacía el spool en lotes de batch_size, con un commit por lote.
+
+	Se ejecuta desde el scheduler (cada minuto), desde el job encolado al
+	llenarse un lote y desde el worker de larga duración. Si otro vaciado
+	tiene el lock, no hace nada.
+
+	Args:
+		max_batches (int): Límite de lotes por llamada (None = hasta vaciar)
+
+	Returns:
+		int: Eventos guardados
+	"""
+	from sam.api.hikvision import store_event_batch
+
+	if not _acquire_flush_lock():
+		return 0
+
+	batch_size = get_spool_settings().batch_size
+	stored = 0
+	batches = 0
+
+	try:
+		requeued = requeue_processing()
+		if requeued:
+			frappe.logger("hikvision", allow_site=True).warning(
+				f"Requeued {requeued} events from an interrupted flush"
+			)
+
+		while max_batches is None or batches < max_batches:
+			rows = _pop_batch(batch_size)
+			if not rows:
+				break
+			stored += store_event_batch(rows)
+			_ack_batch()
+			batches += 1
+			_refresh_flush_lock()
+	finally:
+		_release_flush_lock()
+
+	if stored:
+		frappe.logger("hikvision", allow_site=True).info(
+			f"Spool flushed: {stored} events in {batches} batches | Depth: {get_spool_depth()}"
+		)
+
+	return stored
+
+
+def run_spool_worker():
+	"""
+	Loop de larga duración: vacía el spool cada flush_interval segundos,
+	o antes si ya hay un lote completo esperando. El primer vaciado, al
+	arrancar, devuelve al spool los lotes que quedaron sin confirmar.
+	"""
+	frappe.logger("hikvision", allow_site=True).info("Spool worker started")
+	settings = get_spool_settings(cached=False)
+	last_flush = 0.0
+
+	while True:
+		due = time.monotonic() - last_flush >= settings.flush_interval
+
+		if due or get_spool_depth() >= settings.batch_size:
+			flush_spool()
+			last_flush = time.monotonic()
+			# Tomar cambios de configuración hechos mientras corre el worker
+			settings = get_spool_settings(cached=False)
+
+		time.sleep(min(1, settings.flush_interval))
+
+
+@frappe.whitelist()
+def get_spool_status():
+	"""
+	Estado del spool para monitoreo.
+
+	Returns:
+		dict: Modo de ingesta, profundidad del spool y parámetros de lote
+	"""
+	frappe.only_for("System Manager")
+	settings = get_spool_settings()
+	return {
+		"ingestion_mode": settings.ingestion_mode,
+		"spool_depth": get_spool_depth(),
+		"batch_size": settings.batch_size,
+		"flush_interval": settings.flush_interval,
+	}
@@ -0,0 +1,297 @@
+# Copyright (c) 2026, Lidar Holding Group S. A. and contributors
+# For license information, please see license.txt
+
+"""
+Hikvision alertStream Consumer
+
+Consumidor de larga duración para /ISAPI/Event/notification/alertStream.
+Reemplaza a poll_alert_stream, que escucha por un tiempo fijo y pierde
+los eventos enviados entre corridas.
+
+- Una conexión (hilo) por cada Hikvision Device activo.
+- La configuración y la contraseña se resuelven una sola vez al iniciar.
+- Reconexión con backoff exponencial por dispositivo.
+- Los hilos solo leen el stream; el hilo principal parsea y escribe los
+  eventos en micro-lotes (un INSERT y un commit por lote).
+- Métricas por dispositivo (eventos, lotes, eventos/s, lag, reconexiones)
+  en Redis, consultables con get_stream_metrics.
+
+Uso:
+    bench --site sam.mdf.lan hikvision-stream
+"""
+
+import queue
+import random
+import signal
+import threading
+import time
+from datetime import datetime
+
+import frappe
+import requests
+from requests.auth import HTTPDigestAuth
+
+from sam.api.hikvision import build_event_row, parse_hikvision_event, store_event_batch
+from sam.api.hikvision_polling import get_active_devices
+
+ALERT_STREAM_ENDPOINT = "/ISAPI/Event/notification/alertStream"
+METRICS_KEY = "hikvision:stream_metrics"
+
+BACKOFF_INITIAL = 1
+BACKOFF_MAX = 60
+READ_TIMEOUT = 90  # El dispositivo envía heartbeats; sin datos en 90s se reconecta
+
+
+class DeviceStream(threading.Thread):
+	"""
+	Lee el stream multipart de un dispositivo y publica cada parte en la cola.
+
+	No usa la API de frappe (frappe.local no existe en este hilo): solo
+	entrega tuplas (tipo, dispositivo, datos, recibido_en) al hilo principal.
+	"""
+
+	def __init__(self, config, out_queue, stop_event):
+		super().__init__(name=f"hikvision-stream-{config['name']}", daemon=True)
+		self.config = config
+		self.out_queue = out_queue
+		self.stop_event = stop_event
+		self.url = f"http://{config['host']}:{config['port']}{ALERT_STREAM_ENDPOINT}"
+		self.auth = HTTPDigestAuth(config["username"], config["password"])
+
+	def run(self):
+		backoff = BACKOFF_INITIAL
+		while not self.stop_event.is_set():
+			try:
+				received_any = self._consume()
+				if received_any:
+					backoff = BACKOFF_INITIAL
+				self._publish("disconnected", "Stream closed by device")
+			except Exception as e:
+				self._publish("disconnected", str(e))
+
+			if self.stop_event.is_set():
+				break
+
+			# Backoff exponencial con jitter para no reconectar todos a la vez
+			delay = backoff + random.uniform(0, backoff / 4)
+			self.stop_event.wait(delay)
+			backoff = min(backoff * 2, BACKOFF_MAX)
+
+	def _consume(self):
+		received_any = False
+		with requests.get(
+			self.url,
+			auth=self.auth,
+			headers={"Accept": "multipart/x-mixed-replace"},
+			stream=True,
+			timeout=(5, READ_TIMEOUT),
+		) as response:
+			if response.status_code != 200:
+				raise ConnectionError(f"HTTP {response.status_code}")
+
+			self._publish("connected", None)
+
+			for content_type, body in iter_multipart_parts(response.iter_lines()):
+				if self.stop_event.is_set():
+					break
+				received_any = True
+				self._publish("part", (content_type, body))
+
+		return received_any
+
+	def _publish(self, kind, data):
+		self.out_queue.put((kind, self.config["name"], data, datetime.now()))
+
+
+def iter_multipart_parts(lines):
+	"""
+	Separa un stream multipart/x-mixed-replace en partes.
+
+	Args:
+		lines (iterable): Líneas en bytes (response.iter_lines())
+
+	Yields:
+		tuple: (content_type, body) de cada parte de texto (JSON o XML);
+		las imágenes adjuntas se descartan.
+	"""
+	boundary = None
+	content_type = ""
+	in_headers = False
+	body = []
+
+	for line in lines:
+		stripped = line.strip()
+
+		if stripped.startswith(b"--") and (boundary is None or stripped.startswith(boundary)):
+			boundary = boundary or stripped.rstrip(b"-")
+			if body and not content_type.startswith("image"):
+				yield content_type, b"\n".join(body).decode("utf-8", errors="replace")
+			content_type = ""
+			in_headers = True
+			body = []
+			continue
+
+		if in_headers:
+			if not stripped:
+				in_headers = False
+			elif stripped.lower().startswith(b"content-type:"):
+				content_type = stripped.split(b":", 1)[1].strip().decode("latin-1").lower()
+			continue
+
+		if boundary is not None and not content_type.startswith("image"):
+			body.append(line)
+
+	if body and not content_type.startswith("image"):
+		yield content_type, b"\n".join(body).decode("utf-8", errors="replace")
+
+
+class StreamMetrics:
+	"""Contadores de un dispositivo, publicados en Redis tras cada lote."""
+
+	def __init__(self, config):
+		self.device = config["name"]
+		self.device_name = config.get("device_name")
+		self.host = config["host"]
+		self.connected = False
+		self.connected_since = None
+		self.reconnects = 0
+		self.events_total = 0
+		self.batches_total = 0
+		self.window_events = 0
+		self.window_started = time.monotonic()
+		self.events_per_second = 0.0
+		self.last_event_time = None
+		self.lag_seconds = None
+		self.last_error = None
+
+	def record_batch(self, rows):
+		now = datetime.now()
+		self.events_total += len(rows)
+		self.batches_total += 1
+		self.window_events += len(rows)
+
+		event_times = [row["event_time"] for row in rows if row.get("event_time")]
+		if event_times:
+			self.last_event_time = max(event_times)
+			lags = [(now - t).total_seconds() for t in event_times]
+			self.lag_seconds = round(sum(lags) / len(lags), 3)
+
+		elapsed = time.monotonic() - self.window_started
+		if elapsed >= 10:
+			self.events_per_second = round(self.window_events / elapsed, 2)
+			self.window_events = 0
+			self.window_started = time.monotonic()
+
+	def as_dict(self):
+		return {
+			"device": self.device,
+			"device_name": self.device_name,
+			"host": self.host,
+			"connected": self.connected,
+			"connected_since": self.connected_since,
+			"reconnects": self.reconnects,
+			"events_total": self.events_total,
+			"batches_total": self.batches_total,
+			"events_per_second": self.events_per_second,
+			"last_event_time": self.last_event_time,
+			"lag_seconds": self.lag_seconds,
+			"last_error": self.last_error,
+			"updated_at": datetime.now(),
+		}
+
+	def publish(self):
+		frappe.cache().hset(METRICS_KEY, self.device, self.as_dict())
+
+
+def run_stream_consumers(batch_size=100, flush_seconds=2):
+	"""
+	Inicia un consumidor por dispositivo activo y escribe los eventos en
+	micro-lotes hasta recibir SIGTERM/SIGINT.
+
+	Args:
+		batch_size (int): Máximo de eventos por INSERT/commit
+		flush_seconds (float): Tiempo máximo que un evento espera en memoria
+	"""
+	logger = frappe.logger("hikvision", allow_site=True)
+	configs = get_active_devices()
+	if not configs:
+		raise ValueError("No active Hikvision device found in configuration")
+
+	stop_event = threading.Event()
+	for sig in (signal.SIGTERM, signal.SIGINT):
+		signal.signal(sig, lambda *args: stop_event.set())
+
+	parts = queue.Queue(maxsize=batch_size * 50)
+	metrics = {config["name"]: StreamMetrics(config) for config in configs}
+	sources = {config["name"]: config["host"] for config in configs}
+	threads = [DeviceStream(config, parts, stop_event) for config in configs]
+	for thread in threads:
+		thread.start()
+
+	logger.info(f"Alert stream consumer started for {len(threads)} devices")
+
+	pending = {}
+	last_flush = time.monotonic()
+
+	while not stop_event.is_set():
+		try:
+			kind, device, data, received_at = parts.get(timeout=flush_seconds)
+		except queue.Empty:
+			kind = None
+
+		if kind == "part":
+			content_type, body = data
+			parsed = parse_hikvision_event(body, content_type)
+			row = build_event_row(parsed, body, content_type or "application/json", sources[device])
+			# Igual que receive_event: solo marcajes con persona identificada
+			if row["name_field"]:
+				row["received_at"] = received_at
+				pending.setdefault(device, []).append(row)
+		elif kind == "connected":
+			metrics[device].connected = True
+			metrics[device].connected_since = received_at
+			metrics[device].publish()
+		elif kind == "disconnected":
+			metrics[device].connected = False
+			metrics[device].reconnects += 1
+			metrics[device].last_error = data
+			metrics[device].publish()
+			logger.warning(f"Alert stream {device} disconnected: {data}")
+
+		pending_count = sum(len(rows) for rows in pending.values())
+		if pending_count >= batch_size or (pending_count and time.monotonic() - last_flush >= flush_seconds):
+			_flush_pending(pending, metrics, logger)
+			last_flush = time.monotonic()
+
+	_flush_pending(pending, metrics, logger)
+	for thread in threads:
+		thread.join(timeout=5)
+	logger.info("Alert stream consumer stopped")
+
+
+def _flush_pending(pending, metrics, logger):
+	"""Escribe los eventos acumulados de todos los dispositivos con un commit."""
+	rows = [row for device_rows in pending.values() for row in device_rows]
+	if not rows:
+		return
+
+	store_event_batch(rows)
+
+	for device, device_rows in pending.items():
+		if device_rows:
+			metrics[device].record_batch(device_rows)
+			metrics[device].publish()
+	pending.clear()
+
+
+@frappe.whitelist()
+def get_stream_metrics():
+	"""
+	Métricas por dispositivo del consumidor de alertStream.
+
+	Returns:
+		list: Un dict por dispositivo (conexión, eventos, eventos/s, lag, errores)
+	"""
+	frappe.only_for("System Manager")
+	metrics = frappe.cache().hgetall(METRICS_KEY) or {}
+	return sorted(metrics.values(), key=lambda m: m["device"])
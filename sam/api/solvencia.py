@@ -0,0 +1,346 @@
+import csv
+import io
+import json
+from functools import partial
+
+import frappe
+from frappe.utils import flt, now_datetime
+
+# Estados que dejan a un vehículo insolvente
+PENDING_STATES = ("PENDIENTE-PAGO", "VERIFICACION")
+MAX_BOLETAS = 500
+
+# Resumen por placa en Redis; se invalida al cambiar boletas o pagos y
+# después del cálculo nocturno de saldos. El TTL es solo un respaldo.
+CACHE_PREFIX = "sam_solvencia"
+CACHE_TTL = 6 * 60 * 60
+STATS_KEY = "sam_solvencia_stats"
+
+# Verificación masiva: hasta MAX_BULK_PLACAS en la respuesta; listas más
+# largas (hasta MAX_BACKGROUND_PLACAS) solo como job en segundo plano
+MAX_BULK_PLACAS = 500
+MAX_BACKGROUND_PLACAS = 50000
+BULK_QUERY_CHUNK = 1000
+BULK_CSV_HEADER = ["placa", "estado", "cantidad", "total_saldo"]
+
+BOLETA_FIELDS = (
+	"name",
+	"boleta_id",
+	"vehiculo_id",
+	"fecha_infraccion",
+	"articulo_codigo",
+	"articulo_valor",
+	"infraccion_saldo",
+	"estado_boleta",
+	"marca_vehiculo",
+	"nombre_infractor",
+	"ubicacion_infraccion",
+	"observaciones",
+)
+
+
+def normalize_placa(placa):
+	return (placa or "").strip().upper()
+
+
+def get_solvencia(placa, limit=100):
+	"""
+	Boletas pendientes de una placa, con la descripción del artículo, el
+	saldo total y la solvencia.
+
+	El resumen (hasta MAX_BOLETAS boletas) se guarda en Redis por placa;
+	limit solo recorta la lista devuelta.
+
+	Args:
+		placa (str): vehiculo_id de PMT Boleta
+		limit (int): máximo de boletas devueltas (MAX_BOLETAS como tope)
+
+	Returns:
+		dict: placa, boletas, cantidad, total_saldo, es_solvente
+	"""
+	placa = normalize_placa(placa)
+	limit = max(1, min(int(limit or 100), MAX_BOLETAS))
+	if not placa:
+		return {"placa": "", "boletas": [], "cantidad": 0, "total_saldo": 0, "es_solvente": None}
+
+	key = _cache_key(placa)
+	result = frappe.cache().get_value(key)
+	if result is None:
+		_count("misses")
+		result = query_solvencia(placa)
+		frappe.cache().set_value(key, result, expires_in_sec=CACHE_TTL)
+	else:
+		_count("hits")
+
+	return {**result, "boletas": result["boletas"][:limit]}
+
+
+def query_solvencia(placa):
+	"""
+	Resumen de solvencia de una placa desde la base, en una sola consulta.
+
+	El total y la cantidad se calculan con funciones de ventana antes del
+	LIMIT, así que cubren todas las boletas pendientes y no solo las
+	devueltas. Usa el índice (vehiculo_id, estado_boleta, fecha_infraccion).
+	"""
+	columns = ", ".join(f"b.`{fieldname}`" for fieldname in BOLETA_FIELDS)
+	rows = frappe.db.sql(
+		f"""
+		SELECT
+			{columns},
+			a.articulo_descripcion,
+			COUNT(*) OVER () AS cantidad,
+			SUM(COALESCE(b.infraccion_saldo, b.articulo_valor, 0)) OVER () AS total_saldo
+		FROM `tabPMT Boleta` b
+		LEFT JOIN `tabPMT Articulo` a ON a.name = b.articulo_codigo
+		WHERE b.vehiculo_id = %(placa)s AND b.estado_boleta IN %(estados)s
+		ORDER BY b.fecha_infraccion DESC
+		LIMIT {MAX_BOLETAS}
+		""",
+		{"placa": placa, "estados": PENDING_STATES},
+		as_dict=True,
+	)
+
+	cantidad = rows[0].pop("cantidad") if rows else 0
+	total_saldo = flt(rows[0].pop("total_saldo"), 2) if rows else 0
+	for row in rows[1:]:
+		row.pop("cantidad")
+		row.pop("total_saldo")
+
+	return {
+		"placa": placa,
+		"boletas": rows,
+		"cantidad": cantidad,
+		"total_saldo": total_saldo,
+		"es_solvente": not cantidad,
+	}
+
+
+def _cache_key(placa):
+	return f"{CACHE_PREFIX}|{placa}"
+
+
+def _count(counter):
+	cache = frappe.cache()
+	cache.hincrby(cache.make_key(STATS_KEY), counter, 1)
+
+
+def invalidate_solvencia(placas):
+	"""
+	Descarta el resumen en cache de cada placa, ahora y otra vez después
+	del commit: una consulta concurrente podría volver a guardar los datos
+	anteriores mientras la transacción sigue abierta.
+	"""
+	keys = list({_cache_key(placa) for placa in map(normalize_placa, placas) if placa})
+	if keys:
+		frappe.cache().delete_value(keys)
+		frappe.db.after_commit.add(partial(frappe.cache().delete_value, keys))
+
+
+def get_cache_stats():
+	cache = frappe.cache()
+	stats = cache.hgetall(cache.make_key(STATS_KEY)) or {}
+	hits = int(stats.get(b"hits") or 0)
+	misses = int(stats.get(b"misses") or 0)
+	return {
+		"hits": hits,
+		"misses": misses,
+		"hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+	}
+
+
+def on_boleta_change(doc, method=None):
+	"""doc_events de PMT Boleta: alta, cambios (estado, saldo, placa) y borrado."""
+	before = doc.get_doc_before_save() if method == "on_update" else None
+	invalidate_solvencia([doc.vehiculo_id, before.vehiculo_id if before else None])
+
+
+def on_pago_change(doc, method=None):
+	"""doc_events de PMT Boleta Pago: la placa del pago y la de su boleta."""
+	vehiculo_id = frappe.db.get_value("PMT Boleta", doc.boleta_id, "vehiculo_id") if doc.boleta_id else None
+	invalidate_solvencia([doc.placa_id, vehiculo_id])
+
+
+def parse_placas(placas=None, file_url=None):
+	"""
+	Placas normalizadas y sin repetir, en el orden recibido.
+
+	placas puede ser una lista, una lista JSON o texto separado por comas o
+	saltos de línea; file_url es un CSV subido con la placa en la primera
+	columna (con o sin encabezado "placa").
+	"""
+	values = []
+	if placas:
+		if isinstance(placas, str):
+			try:
+				placas = json.loads(placas)
+			except ValueError:
+				placas = placas.replace(",", "\n").splitlines()
+		if not isinstance(placas, list | tuple):
+			placas = [str(placas)]
+		values.extend(str(placa) for placa in placas if placa is not None)
+
+	if file_url:
+		file = frappe.get_doc("File", {"file_url": file_url})
+		if not frappe.has_permission("File", ptype="read", doc=file):
+			frappe.throw("No tiene permisos para leer el archivo", frappe.PermissionError)
+		content = file.get_content()
+		if isinstance(content, bytes):
+			content = content.decode("utf-8-sig", errors="replace")
+		rows = [row for row in csv.reader(io.StringIO(content)) if row]
+		if rows and normalize_placa(rows[0][0]) == "PLACA":
+			rows = rows[1:]
+		values.extend(row[0] for row in rows)
+
+	return list(dict.fromkeys(placa for placa in map(normalize_placa, values) if placa))
+
+
+def query_solvencia_bulk(placas):
+	"""
+	Solvencia de varias placas con una consulta IN (...) por cada
+	BULK_QUERY_CHUNK placas, con el artículo de cada boleta.
+
+	Returns:
+		dict: placa -> {placa, boletas, cantidad, total_saldo, es_solvente}
+	"""
+	results = {
+		placa: {"placa": placa, "boletas": [], "cantidad": 0, "total_saldo": 0, "es_solvente": True}
+		for placa in placas
+	}
+	columns = ", ".join(f"b.`{fieldname}`" for fieldname in BOLETA_FIELDS)
+	for i in range(0, len(placas), BULK_QUERY_CHUNK):
+		rows = frappe.db.sql(
+			f"""
+			SELECT {columns}, a.articulo_descripcion
+			FROM `tabPMT Boleta` b
+			LEFT JOIN `tabPMT Articulo` a ON a.name = b.articulo_codigo
+			WHERE b.vehiculo_id IN %(placas)s AND b.estado_boleta IN %(estados)s
+			ORDER BY b.vehiculo_id, b.fecha_infraccion DESC
+			""",
+			{"placas": tuple(placas[i : i + BULK_QUERY_CHUNK]), "estados": PENDING_STATES},
+			as_dict=True,
+		)
+		for row in rows:
+			# MariaDB compara sin distinguir mayúsculas
+			result = results.get(normalize_placa(row.vehiculo_id))
+			if result is None:
+				continue
+			result["boletas"].append(row)
+			result["cantidad"] += 1
+			result["total_saldo"] += flt(row.infraccion_saldo if row.infraccion_saldo is not None else row.articulo_valor)
+
+	for result in results.values():
+		result["total_saldo"] = flt(result["total_saldo"], 2)
+		result["es_solvente"] = not result["cantidad"]
+	return results
+
+
+def build_bulk_csv(results):
+	output = io.StringIO()
+	writer = csv.writer(output)
+	writer.writerow(BULK_CSV_HEADER)
+	for result in results:
+		writer.writerow([
+			result["placa"],
+			"SOLVENTE" if result["es_solvente"] else "INSOLVENTE",
+			result["cantidad"],
+			result["total_saldo"],
+		])
+	return output.getvalue()
+
+
+def run_bulk_job(placas, user):
+	"""Job de lookup_bulk: guarda el resultado como CSV privado y avisa al usuario."""
+	results = query_solvencia_bulk(placas)
+	file = frappe.get_doc(
+		{
+			"doctype": "File",
+			"file_name": f"solvencia_{now_datetime().strftime('%Y%m%d_%H%M%S')}.csv",
+			"is_private": 1,
+			"content": build_bulk_csv(results[placa] for placa in placas),
+		}
+	)
+	file.owner = user
+	file.insert(ignore_permissions=True)
+	frappe.db.commit()
+
+	frappe.publish_realtime(
+		"sam_solvencia_bulk",
+		{"file_url": file.file_url, "placas": len(placas)},
+		user=user,
+	)
+	return file.file_url
+
+
+@frappe.whitelist()
+def lookup(placa: str | None = None, limit: int = 100):
+	"""Solvencia de una placa para PMT Vehiculo Solvencia, PMT Desplegado y la PWA."""
+	if frappe.session.user == "Guest":
+		frappe.throw("No autorizado", frappe.PermissionError)
+
+	if not frappe.has_permission("PMT Boleta", ptype="read"):
+		frappe.throw("No tiene permisos para consultar boletas", frappe.PermissionError)
+
+	return get_solvencia(placa, limit)
+
+
+@frappe.whitelist()
+def lookup_bulk(placas=None, file_url: str | None = None, background: int = 0, include_boletas: int = 0):
+	"""
+	Verificación de solvencia de una lista de placas (flotas, otras
+	dependencias).
+
+	Hasta MAX_BULK_PLACAS se responde en la misma llamada. Con background=1
+	(obligatorio para listas más largas) se encola un job que genera un CSV
+	privado y lo avisa por realtime (evento sam_solvencia_bulk).
+
+	Args:
+		placas: lista JSON o texto separado por comas/saltos de línea
+		file_url: CSV subido con las placas en la primera columna
+		background: encolar como job
+		include_boletas: incluir el detalle de boletas en la respuesta
+
+	Returns:
+		dict: resultados por placa, o el job encolado
+	"""
+	if frappe.session.user == "Guest":
+		frappe.throw("No autorizado", frappe.PermissionError)
+
+	if not frappe.has_permission("PMT Boleta", ptype="read"):
+		frappe.throw("No tiene permisos para consultar boletas", frappe.PermissionError)
+
+	placas = parse_placas(placas, file_url)
+	if not placas:
+		frappe.throw("Debe enviar al menos una placa")
+
+	if int(background or 0):
+		if len(placas) > MAX_BACKGROUND_PLACAS:
+			frappe.throw(f"Máximo {MAX_BACKGROUND_PLACAS} placas por verificación")
+		job = frappe.enqueue(
+			"sam.api.solvencia.run_bulk_job",
+			queue="long",
+			placas=placas,
+			user=frappe.session.user,
+		)
+		return {"queued": True, "job_id": job.id if job else None, "placas": len(placas)}
+
+	if len(placas) > MAX_BULK_PLACAS:
+		frappe.throw(f"Máximo {MAX_BULK_PLACAS} placas por consulta; use background=1 para listas más largas")
+
+	results = query_solvencia_bulk(placas)
+	if not int(include_boletas or 0):
+		for result in results.values():
+			result.pop("boletas")
+
+	return {
+		"placas": len(placas),
+		"insolventes": sum(1 for result in results.values() if not result["es_solvente"]),
+		"resultados": [results[placa] for placa in placas],
+	}
+
+
+@frappe.whitelist()
+def cache_stats():
+	"""Aciertos y fallos del cache de solvencia."""
+	frappe.only_for("System Manager")
+	return get_cache_stats()
@@ -0,0 +1,111 @@
+# Copyright (c) 2026, Lidar Holding Group S. A. and contributors
+# For license information, please see license.txt
+
+"""Comandos bench de SAM (cargados por bench desde sam.commands)."""
+
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+@click.command("hikvision-spool-worker")
+@pass_context
+def hikvision_spool_worker(context):
+	"""Vacía el spool de eventos Hikvision de forma continua (para supervisor)."""
+	from sam.api.hikvision_spool import run_spool_worker
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		run_spool_worker()
+	finally:
+		frappe.destroy()
+
+
+@click.command("hikvision-stream")
+@click.option("--batch-size", default=100, type=int, help="Máximo de eventos por INSERT/commit")
+@click.option("--flush-seconds", default=2.0, type=float, help="Espera máxima de un evento en memoria")
+@pass_context
+def hikvision_stream(context, batch_size, flush_seconds):
+	"""Mantiene una conexión alertStream por cada Hikvision Device activo."""
+	from sam.api.hikvision_stream import run_stream_consumers
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		run_stream_consumers(batch_size=batch_size, flush_seconds=flush_seconds)
+	finally:
+		frappe.destroy()
+
+
+@click.command("hikvision-rebuild-attendance")
+@click.option("--from-date", help="Fecha inicial (default: primer evento)")
+@click.option("--to-date", help="Fecha final, inclusive (default: último evento)")
+@pass_context
+def hikvision_rebuild_attendance(context, from_date, to_date):
+	"""Reconstruye Hikvision Attendance Day desde los Hikvision Event."""
+	from sam.api.hikvision_attendance import rebuild_attendance_days
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		total = rebuild_attendance_days(from_date=from_date, to_date=to_date)
+		click.echo(f"Hikvision Attendance Day: {total} rows")
+	finally:
+		frappe.destroy()
+
+
+@click.command("pmt-historico-import")
+@click.argument("csv_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--batch-size", default=2000, type=int, help="Filas por INSERT/commit")
+@click.option("--workers", type=int, help="Procesos para transformar filas (default: núcleos - 1)")
+@click.option("--no-truncate", is_flag=True, help="No vaciar PMT Historico antes de importar")
+@click.option("--restart", is_flag=True, help="Ignorar el checkpoint e importar desde el inicio")
+@click.option("--checkpoint", "checkpoint_path", help="Ruta del checkpoint (default: <csv>.checkpoint.json)")
+@pass_context
+def pmt_historico_import(context, csv_path, batch_size, workers, no_truncate, restart, checkpoint_path):
+	"""Importa el CSV histórico a PMT Historico (reanudable)."""
+	from sam.scripts.pmt_historico_import import import_data
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		import_data(
+			batch_size=batch_size,
+			truncate=not no_truncate,
+			csv_path=csv_path,
+			workers=workers,
+			resume=not restart,
+			checkpoint_path=checkpoint_path,
+		)
+	finally:
+		frappe.destroy()
+
+
+@click.command("pmt-historico-rederive")
+@click.option("--chunk-size", default=5000, type=int, help="Filas revisadas por bloque/commit")
+@pass_context
+def pmt_historico_rederive(context, chunk_size):
+	"""Recalcula los campos derivados de PMT Historico en las filas que cambiaron."""
+	from sam.scripts.pmt_historico_derive import rederive
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		rederive(chunk_size=chunk_size)
+	finally:
+		frappe.destroy()
+
+
+commands = [
+	hikvision_spool_worker,
+	hikvision_stream,
+	hikvision_rebuild_attendance,
+	pmt_historico_import,
+	pmt_historico_rederive,
+]
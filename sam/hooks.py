@@ -155,14 +155,35 @@ doctype_list_js = {
 # 	}
 # }
 
+doc_events = {
+	"PMT Boleta": {
+		"on_update": "sam.api.solvencia.on_boleta_change",
+		"on_trash": "sam.api.solvencia.on_boleta_change",
+	},
+	"PMT Boleta Pago": {
+		"on_update": "sam.api.solvencia.on_pago_change",
+		"on_trash": "sam.api.solvencia.on_pago_change",
+	},
+}
+
 # Scheduled Tasks
 # ---------------
 
 scheduler_events = {
 	"cron": {
+		"* * * * *": [
+			"sam.api.hikvision_spool.flush_spool",
+			"sam.api.hikvision_attendance.refresh_pending_attendance_days",
+		],
+		"*/5 * * * *": [
+			"sam.api.hikvision_polling.poll_all_devices_job",
+		],
 		"0 1 * * *": [
 			"sam.sam.tasks.pmt_boleta.update_infraccion_saldos",
 		],
+		"30 1 * * *": [
+			"sam.api.hikvision_payload.prune_event_payloads",
+		],
 	},
 }
 
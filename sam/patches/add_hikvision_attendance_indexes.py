@@ -0,0 +1,10 @@
+from sam.sam.doctype.hikvision_attendance_day.hikvision_attendance_day import (
+    on_doctype_update as add_attendance_day_indexes,
+)
+from sam.sam.doctype.hikvision_event.hikvision_event import on_doctype_update as add_event_indexes
+
+
+def execute():
+    # Sitios existentes: on_doctype_update solo corre cuando cambia el DocType
+    add_event_indexes()
+    add_attendance_day_indexes()
@@ -0,0 +1,6 @@
+from sam.sam.doctype.pmt_boleta.pmt_boleta import on_doctype_update
+
+
+def execute():
+    # Sitios existentes: on_doctype_update solo corre cuando cambia el DocType
+    on_doctype_update()
@@ -0,0 +1,58 @@
+import json
+
+import frappe
+
+from sam.sam.doctype.hikvision_event.hikvision_event import make_event_key
+from sam.scripts.streaming import iter_chunks
+
+CHUNK_SIZE = 5000
+
+
+def execute():
+    """
+    Calcula serial_no y event_key de los Hikvision Event existentes y
+    elimina los marcajes duplicados (se conserva el primero recibido).
+    """
+    if not frappe.db.has_column("Hikvision Event", "event_key"):
+        return
+
+    seen = set(
+        frappe.db.sql_list("SELECT event_key FROM `tabHikvision Event` WHERE event_key IS NOT NULL")
+    )
+    duplicates = []
+    fields = ["name", "device_ip", "source_ip", "employee_no", "event_time", "parsed_json"]
+
+    for rows in iter_chunks(
+        "Hikvision Event",
+        fields,
+        conditions="event_key IS NULL",
+        order_by=("creation", "name"),
+        chunk_size=CHUNK_SIZE,
+    ):
+        rows = [frappe._dict(zip(fields, row, strict=True)) for row in rows]
+        updates = {}
+        for row in rows:
+            row.serial_no = _serial_no(row.parsed_json)
+            event_key = make_event_key(row)
+            if event_key and event_key in seen:
+                duplicates.append(row.name)
+                continue
+            if event_key:
+                seen.add(event_key)
+            updates[row.name] = {"serial_no": row.serial_no, "event_key": event_key}
+
+        frappe.db.bulk_update("Hikvision Event", updates, update_modified=False)
+        frappe.db.commit()
+
+    for i in range(0, len(duplicates), CHUNK_SIZE):
+        frappe.db.delete("Hikvision Event", {"name": ("in", duplicates[i : i + CHUNK_SIZE])})
+        frappe.db.commit()
+
+
+def _serial_no(parsed_json):
+    try:
+        parsed = json.loads(parsed_json or "{}")
+    except ValueError:
+        return None
+    acs_event = parsed.get("AccessControllerEvent") or {}
+    return acs_event.get("serialNo") or parsed.get("serialNo")
@@ -0,0 +1,33 @@
+import frappe
+
+from sam.sam.pmt_utils import ESTADO_DISPONIBLE, clear_talonario_ranges
+
+
+def execute():
+    # Las boletas DISPONIBLE se resuelven por el rango del talonario
+    # (sam.sam.pmt_utils.obtener_datos_boleta); solo se conservan las filas
+    # que difieren de lo que daría el rango. Los talonarios que se traslapan
+    # con otro (anteriores a la validación de rangos) conservan todas sus
+    # filas: el rango no basta para saber a cuál pertenece la boleta.
+    frappe.db.sql(
+        """
+        DELETE d
+        FROM `tabPMT Talonario Detalle` d
+        JOIN `tabPMT Talonario` t
+            ON t.name = d.parent AND d.parenttype = 'PMT Talonario' AND d.parentfield = 'talonario_detalle'
+        WHERE t.boleta_inicial > 0
+            AND NOT EXISTS (
+                SELECT 1 FROM `tabPMT Talonario` o
+                WHERE o.name != t.name
+                    AND o.boleta_inicial <= t.boleta_final
+                    AND o.boleta_final >= t.boleta_inicial
+            )
+            AND COALESCE(d.estado_boleta, '') IN ('', %(disponible)s)
+            AND d.boleta_id_detalle BETWEEN t.boleta_inicial AND t.boleta_final
+            AND COALESCE(d.agente_asignado_detalle, '') = COALESCE(t.agente_asignado, '')
+            AND COALESCE(d.talonario_id, '') = COALESCE(t.talonario_id, '')
+        """,
+        {"disponible": ESTADO_DISPONIBLE},
+    )
+    frappe.db.commit()
+    clear_talonario_ranges()
@@ -0,0 +1,10 @@
+import frappe
+
+from sam.api.hikvision_attendance import rebuild_attendance_days
+
+
+def execute():
+    if not frappe.db.table_exists("Hikvision Event"):
+        return
+
+    rebuild_attendance_days()
@@ -0,0 +1,11 @@
+from __future__ import annotations
+
+from sam.scripts.pmt_historico_derive import rederive
+
+
+def execute():
+    # Un solo recorrido de PMT Historico para todos los campos derivados
+    # (tipo_placa, tipo_placa_id, placa_unificada, marca, situación, tipo
+    # de licencia y consolidado); solo se escriben las filas que cambiaron.
+    # Reemplaza a los update_pmt_historico_* de cada campo.
+    rederive(verbose=False)
@@ -2,27 +2,10 @@ from __future__ import annotations
 
 import frappe
 
+from sam.scripts.pmt_historico_derive import load_articulo_codigos, make_articulo_resolver
 
-def _normalize_codigo(value: str) -> str:
-    value = (value or "").strip()
-    if not value:
-        return ""
-    cleaned = value.replace("-", ".").replace(" ", "").lower()
-    parts = cleaned.split(".")
-    normalized_parts: list[str] = []
-    for part in parts:
-        if part.isdigit():
-            # remove leading zeros from purely numeric segments
-            normalized_parts.append(str(int(part)))
-        else:
-            normalized_parts.append(part)
-    return ".".join(normalized_parts)
-
-
-SPECIAL_MAP = {
-    "181.14": "181.14a",
-    "180.2": "180.2a",
-}
+# Valores de blegal por UPDATE; en la práctica hay unos cientos
+MAPPING_CHUNK_SIZE = 1000
 
 
 def execute():
@@ -33,62 +16,31 @@ def execute():
     if not frappe.db.has_column(doctype_name, "articulo_valido"):
         return
 
-    codigos = frappe.db.get_all("PMT Articulo", pluck="articulo_codigo")
-    codigos = [c for c in codigos if c]
-    codigo_set = set(codigos)
-    codigo_lower_map: dict[str, str | None] = {}
-    for codigo in codigos:
-        key = codigo.lower()
-        if key in codigo_lower_map:
-            codigo_lower_map[key] = None
-        else:
-            codigo_lower_map[key] = codigo
+    resolve = make_articulo_resolver(load_articulo_codigos())
 
-    rows = frappe.db.sql(
+    # Cada valor distinto de blegal se resuelve una sola vez. GROUP BY BINARY
+    # para no juntar valores que solo difieren en mayúsculas o espacios.
+    blegales = frappe.db.sql_list(
         f"""
-        SELECT name, blegal, articulo_valido
+        SELECT blegal
         FROM `tab{doctype_name}`
         WHERE blegal IS NOT NULL AND blegal != ''
-        """,
-        as_dict=True,
+        GROUP BY BINARY blegal
+        """
     )
-
-    updates: list[tuple[str, str]] = []
-    for row in rows:
-        raw = (row.get("blegal") or "").strip()
-        if not raw:
-            continue
-
-        target = ""
-        if raw in codigo_set:
-            target = raw
-        else:
-            raw_key = raw.lower()
-            mapped = codigo_lower_map.get(raw_key)
-            if mapped:
-                target = mapped
-            else:
-                normalized = _normalize_codigo(raw)
-                special = SPECIAL_MAP.get(normalized)
-                if special:
-                    if special in codigo_set:
-                        target = special
-                    else:
-                        mapped = codigo_lower_map.get(special.lower())
-                        if mapped:
-                            target = mapped
-                elif normalized in codigo_set:
-                    target = normalized
-                else:
-                    mapped = codigo_lower_map.get(normalized)
-                    if mapped:
-                        target = mapped
-
-        if (row.get("articulo_valido") or "") != target:
-            updates.append((target, row["name"]))
-
-    if updates:
-        query = f"UPDATE `tab{doctype_name}` SET articulo_valido = %s WHERE name = %s"
-        for target, name in updates:
-            frappe.db.sql(query, (target, name))
-        frappe.db.commit()
+    mapping = [(blegal, resolve(blegal.strip())) for blegal in blegales if blegal.strip()]
+
+    for i in range(0, len(mapping), MAPPING_CHUNK_SIZE):
+        chunk = mapping[i : i + MAPPING_CHUNK_SIZE]
+        values = " UNION ALL ".join("SELECT %s AS blegal, %s AS articulo" for _ in chunk)
+        frappe.db.sql(
+            f"""
+            UPDATE `tab{doctype_name}` h
+            JOIN ({values}) m ON BINARY h.blegal = BINARY m.blegal
+            SET h.articulo_valido = m.articulo
+            WHERE BINARY COALESCE(h.articulo_valido, '') != BINARY m.articulo
+            """,
+            [value for pair in chunk for value in pair],
+        )
+
+    frappe.db.commit()
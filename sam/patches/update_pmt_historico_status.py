@@ -2,11 +2,7 @@ from __future__ import annotations
 
 import frappe
 
-
-TIPO_STATUS_MAP = {
-    1: "PENDIENTE-PAGO",
-    2: "PAGADA",
-}
+from sam.scripts.pmt_historico_derive import rederive
 
 
 def execute():
@@ -21,17 +17,6 @@ def execute():
         table = f"`tab{doctype_name}`"
         frappe.db.sql(f"ALTER TABLE {table} MODIFY COLUMN status VARCHAR(140)")
 
-    table = f"`tab{doctype_name}`"
-    cases = " ".join(
-        f"WHEN {key} THEN '{value}' WHEN '{key}' THEN '{value}'"
-        for key, value in TIPO_STATUS_MAP.items()
-    )
-    sql = f"""
-        UPDATE {table}
-        SET status = CASE status
-            {cases}
-            ELSE ''
-        END
-    """
-    frappe.db.sql(sql)
-    frappe.db.commit()
+    # Todos los campos derivados se recalculan juntos y solo en las filas
+    # que cambiaron (ver sam.scripts.pmt_historico_derive)
+    rederive(verbose=False)
@@ -0,0 +1,8 @@
+// Copyright (c) 2026, Lidar Holding Group S. A. and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("Hikvision Attendance Day", {
+// 	refresh(frm) {
+
+// 	},
+// });
@@ -0,0 +1,29 @@
+# Copyright (c) 2026, Lidar Holding Group S. A. and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+def on_doctype_update():
+	frappe.db.add_index("Hikvision Attendance Day", ["employee", "attendance_date"], "employee_attendance_date_index")
+
+
+class HikvisionAttendanceDay(Document):
+	# begin: auto-generated types
+	# This code is auto-generated. Do not modify anything in this block.
+
+	from typing import TYPE_CHECKING
+
+	if TYPE_CHECKING:
+		from frappe.types import DF
+
+		attendance_date: DF.Date | None
+		employee: DF.Link | None
+		employee_no: DF.Data | None
+		event_count: DF.Int
+		first_in: DF.Time | None
+		last_out: DF.Time | None
+	# end: auto-generated types
+
+	pass
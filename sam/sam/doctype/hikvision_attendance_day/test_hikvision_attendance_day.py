@@ -0,0 +1,51 @@
+# Copyright (c) 2026, Lidar Holding Group S. A. and Contributors
+# See license.txt
+
+from datetime import timedelta
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from sam.api.hikvision import build_event_row, store_event_batch
+from sam.api.hikvision_attendance import refresh_pending_attendance_days
+
+
+def make_row(serial_no, date_time):
+	parsed = {
+		"eventType": "AccessControllerEvent",
+		"dateTime": date_time,
+		"AccessControllerEvent": {"name": "HR-EMP-DAY", "employeeNoString": "9100", "serialNo": serial_no},
+	}
+	return build_event_row(parsed, "{}", "application/json", "127.0.0.1")
+
+
+class TestHikvisionAttendanceDay(FrappeTestCase):
+	def test_batches_keep_daily_summary_up_to_date(self):
+		store_event_batch([make_row(1, "2026-03-12T07:58:00-06:00"), make_row(2, "2026-03-12T12:00:00-06:00")])
+		store_event_batch([make_row(3, "2026-03-12T17:05:30-06:00"), make_row(4, "2026-03-13T08:01:00-06:00")])
+
+		days = frappe.get_all(
+			"Hikvision Attendance Day",
+			filters={"employee": "HR-EMP-DAY"},
+			fields=["attendance_date", "first_in", "last_out", "event_count"],
+			order_by="attendance_date asc",
+		)
+
+		self.assertEqual(len(days), 2)
+		self.assertEqual(str(days[0].attendance_date), "2026-03-12")
+		self.assertEqual(days[0].first_in, timedelta(hours=7, minutes=58))
+		self.assertEqual(days[0].last_out, timedelta(hours=17, minutes=5, seconds=30))
+		self.assertEqual(days[0].event_count, 3)
+		self.assertEqual(days[1].event_count, 1)
+
+	def test_single_events_refresh_after_commit(self):
+		row = make_row(5, "2026-03-14T09:15:00-06:00")
+		frappe.get_doc({"doctype": "Hikvision Event", **row}).insert(ignore_permissions=True)
+		filters = {"employee": "HR-EMP-DAY", "attendance_date": "2026-03-14"}
+
+		# El resumen no se recalcula dentro de la petición
+		self.assertFalse(frappe.db.exists("Hikvision Attendance Day", filters))
+
+		frappe.db.commit()
+		refresh_pending_attendance_days()
+		self.assertEqual(frappe.db.get_value("Hikvision Attendance Day", filters, "event_count"), 1)
@@ -16,7 +16,10 @@ class HikvisionDevice(Document):
 
 		device_name: DF.Data
 		device_ip: DF.Data
+		error_count: DF.Int
 		is_active: DF.Check
+		last_cursor: DF.Int
+		last_error: DF.SmallText | None
 		last_sync: DF.Datetime | None
 		password: DF.Password | None
 		port: DF.Int
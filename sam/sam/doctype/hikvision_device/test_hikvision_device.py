@@ -0,0 +1,38 @@
+# Copyright (c) 2026, Lidar Holding Group S. A. and Contributors
+# See license.txt
+
+from datetime import datetime
+from unittest.mock import patch
+
+# import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from sam.api.hikvision_polling import poll_device
+
+CONFIG = {"name": "HIK-TEST", "host": "10.0.0.1", "port": 80, "username": "admin", "password": "x", "timeout": 5}
+
+
+def _page(infos, status):
+	return {"AcsEvent": {"responseStatusStrg": status, "numOfMatches": len(infos), "InfoList": infos}}
+
+
+class TestHikvisionDevice(FrappeTestCase):
+	def test_poll_device_pages_and_skips_seen_events(self):
+		pages = [
+			_page(
+				[
+					{"serialNo": 10, "time": "2026-03-01T08:00:00-06:00"},
+					{"serialNo": 11, "time": "2026-03-01T08:00:00-06:00"},
+				],
+				"MORE",
+			),
+			_page([{"serialNo": 12, "time": "2026-03-01T08:00:05-06:00"}], "OK"),
+		]
+		state = {"last_sync": datetime(2026, 3, 1, 8, 0, 0), "last_cursor": 10}
+
+		with patch("sam.api.hikvision_polling.fetch_acs_events", side_effect=pages) as fetch:
+			events = poll_device(CONFIG, state)
+
+		self.assertEqual([e["serialNo"] for e in events], [11, 12])
+		self.assertEqual([c.kwargs["position"] for c in fetch.call_args_list], [0, 2])
+		self.assertEqual(len({c.kwargs["search_id"] for c in fetch.call_args_list}), 1)
@@ -1,8 +1,28 @@
 // Copyright (c) 2026, Lidar Holding Group S. A. and contributors
 // For license information, please see license.txt
 
-// frappe.ui.form.on("Hikvision Event", {
-// 	refresh(frm) {
-
-// 	},
-// });
+frappe.ui.form.on("Hikvision Event", {
+	refresh(frm) {
+		// En modo Compressed el payload no está en el documento
+		if (!frm.doc.raw_body) {
+			frm.add_custom_button(__("Ver payload"), () => {
+				frappe.call({
+					method: "sam.api.hikvision_payload.get_event_payload",
+					args: { event: frm.doc.name },
+					callback(r) {
+						const data = r.message || {};
+						if (!data.raw_body) {
+							frappe.msgprint(__("El payload de este evento ya fue eliminado."));
+							return;
+						}
+						frappe.msgprint({
+							title: data.content_type || __("Payload"),
+							message: `<pre>${frappe.utils.escape_html(data.parsed_json || data.raw_body)}</pre>`,
+							wide: true,
+						});
+					},
+				});
+			});
+		}
+	},
+});
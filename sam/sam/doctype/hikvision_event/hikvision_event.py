@@ -1,8 +1,60 @@
 # Copyright (c) 2026, Lidar Holding Group S. A. and contributors
 # For license information, please see license.txt
 
-# import frappe
+import hashlib
+
+import frappe
 from frappe.model.document import Document
+from frappe.utils import get_datetime
+
+from sam.api.hikvision_attendance import get_touched_days, queue_attendance_refresh
+
+
+def make_event_key(row):
+	"""
+	Clave determinística de un marcaje: el mismo evento recibido por push,
+	alertStream o búsqueda AcsEvent produce la misma clave.
+
+	Args:
+		row (dict): Fila con device_ip/source_ip, serial_no, event_time, employee_no
+
+	Returns:
+		str: sha1 en hexadecimal, o None si el evento no trae serialNo ni hora
+	"""
+	serial_no = row.get("serial_no")
+	event_time = row.get("event_time")
+	if serial_no in (None, "") and not event_time:
+		return None
+
+	if event_time:
+		event_time = get_datetime(event_time).replace(tzinfo=None).strftime("%Y-%m-%d %H:%M:%S")
+
+	parts = (
+		row.get("device_ip") or row.get("source_ip") or "",
+		"" if serial_no is None else str(serial_no),
+		event_time or "",
+		row.get("employee_no") or "",
+	)
+	return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+# Índices compuestos del reporte de asistencia y del resumen diario
+EVENT_TIME_INDEXES = {
+	"name_field_event_time_index": ["name_field", "event_time"],
+	"employee_no_event_time_index": ["employee_no", "event_time"],
+}
+
+
+def on_doctype_update():
+	for index_name, fields in EVENT_TIME_INDEXES.items():
+		frappe.db.add_index("Hikvision Event", fields, index_name)
+
+
+def make_event_name(event_key=None):
+	"""Nombre de un Hikvision Event: derivado de event_key, o aleatorio si no hay clave."""
+	if event_key:
+		return f"HE-{event_key[:20]}"
+	return f"HE-{frappe.generate_hash(length=12)}"
 
 
 class HikvisionEvent(Document):
@@ -11,11 +63,19 @@ class HikvisionEvent(Document):
 	# Do not modify this code
 
 	def autoname(self):
-		# Generate a unique name based on timestamp and random suffix
-		import time
-		import random
-		self.name = f"HE-{int(time.time())}-{random.randint(1000, 9999)}"
+		# El nombre sale de event_key: un duplicado choca con la llave primaria
+		self.event_key = self.event_key or make_event_key(self.as_dict())
+		self.name = make_event_name(self.event_key)
 
 	# end: Auto-generated methods
 
-	pass
+	def after_insert(self):
+		# Los lotes (insert_events) refrescan el resumen por su cuenta; aquí
+		# se difiere para no recalcular dentro de la petición del dispositivo
+		queue_attendance_refresh(get_touched_days([self]))
+
+	def on_trash(self):
+		frappe.db.delete("Hikvision Event Payload", self.name)
+
+	def after_delete(self):
+		queue_attendance_refresh(get_touched_days([self]))
@@ -1,9 +1,138 @@
 # Copyright (c) 2026, Lidar Holding Group S. A. and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from sam.api.hikvision import build_event_row, parse_hikvision_event, store_event_batch
+from sam.api.hikvision_stream import iter_multipart_parts
+from sam.sam.doctype.hikvision_event.hikvision_event import EVENT_TIME_INDEXES, on_doctype_update
+
 
 class TestHikvisionEvent(FrappeTestCase):
-	pass
+	def test_iter_multipart_parts_skips_images(self):
+		lines = [
+			b"--MIME_boundary",
+			b'Content-Type: application/json; charset="UTF-8"',
+			b"Content-Length: 40",
+			b"",
+			b"{",
+			b'"eventType": "AccessControllerEvent"',
+			b"}",
+			b"--MIME_boundary",
+			b"Content-Type: image/jpeg",
+			b"",
+			b"\xff\xd8\xff\xe0",
+			b"--MIME_boundary",
+			b"Content-Type: application/json",
+			b"",
+			b'{"eventType": "heartBeat"}',
+		]
+		parts = list(iter_multipart_parts(lines))
+
+		self.assertEqual(len(parts), 2)
+		self.assertTrue(parts[0][0].startswith("application/json"))
+		self.assertIn("AccessControllerEvent", parts[0][1])
+		self.assertEqual(parts[1][1], '{"eventType": "heartBeat"}')
+
+	def test_duplicate_events_are_stored_once(self):
+		parsed = {
+			"eventType": "AccessControllerEvent",
+			"dateTime": "2026-03-12T10:30:00-06:00",
+			"ipAddress": "10.0.0.9",
+			"AccessControllerEvent": {"name": "HR-EMP-DEDUP", "employeeNoString": "9002", "serialNo": 77},
+		}
+		push = build_event_row(parsed, "{}", "application/json", "10.0.0.9")
+		poll = build_event_row(parsed, "{}", "application/json", "10.0.0.9")
+		self.assertEqual(push["event_key"], poll["event_key"])
+
+		self.assertEqual(store_event_batch([push]), 1)
+		self.assertEqual(store_event_batch([poll, poll]), 0)
+
+		self.assertEqual(frappe.db.count("Hikvision Event", {"name_field": "HR-EMP-DEDUP"}), 1)
+
+	def test_event_stored_under_older_name_is_not_counted(self):
+		parsed = {
+			"eventType": "AccessControllerEvent",
+			"dateTime": "2026-03-12T11:45:00-06:00",
+			"ipAddress": "10.0.0.9",
+			"AccessControllerEvent": {"name": "HR-EMP-LEGACY", "employeeNoString": "9003", "serialNo": 78},
+		}
+		row = build_event_row(parsed, "{}", "application/json", "10.0.0.9")
+		# Evento guardado antes de que el nombre se derivara de event_key
+		frappe.get_doc({"doctype": "Hikvision Event", "name": "HE-legacy-78", **row}).db_insert()
+
+		self.assertEqual(store_event_batch([row]), 0)
+		self.assertEqual(frappe.db.count("Hikvision Event", {"name_field": "HR-EMP-LEGACY"}), 1)
+
+	def test_parse_multipart_push_with_picture(self):
+		raw_body = (
+			"--MIME_boundary\r\n"
+			'Content-Disposition: form-data; name="event_log"\r\n'
+			"Content-Type: application/json\r\n\r\n"
+			'{"eventType": "AccessControllerEvent", "AccessControllerEvent": {"name": "Ana {x}"}}\r\n'
+			"--MIME_boundary\r\n"
+			"Content-Type: image/jpeg\r\n\r\n"
+			"\xff\xd8{\r\n"
+			"--MIME_boundary--\r\n"
+		)
+		parsed = parse_hikvision_event(raw_body, "multipart/form-data; boundary=MIME_boundary")
+
+		self.assertEqual(parsed["AccessControllerEvent"]["name"], "Ana {x}")
+
+	def test_parse_xml_with_namespace_uses_candidate_order(self):
+		raw_body = (
+			'<EventNotificationAlert version="2.0" xmlns="http://www.hikvision.com/ver20/XMLSchema">'
+			"<dateTime>2026-03-12T10:30:00</dateTime>"
+			"<employeeID>ID-1</employeeID>"
+			"<employeeNo></employeeNo>"
+			"<AccessControllerEvent><employeeNo>EMP001</employeeNo><name>Juan Perez</name></AccessControllerEvent>"
+			"<FaceVerifyResult><similarity>92</similarity></FaceVerifyResult>"
+			"</EventNotificationAlert>"
+		)
+		parsed = parse_hikvision_event(raw_body, "application/xml")
+
+		self.assertEqual(parsed["dateTime"], "2026-03-12T10:30:00")
+		# El primer <employeeNo> está vacío: se pasa al siguiente tag candidato
+		self.assertEqual(parsed["employeeNo"], "ID-1")
+		self.assertEqual(parsed["name"], "Juan Perez")
+		self.assertEqual(parsed["similarity"], "92")
+		self.assertEqual(parsed["_attributes"], {"version": "2.0"})
+
+	def test_attendance_range_query_can_use_composite_index(self):
+		on_doctype_update()
+		for index_name, fields in EVENT_TIME_INDEXES.items():
+			columns = frappe.db.sql(
+				"SHOW INDEX FROM `tabHikvision Event` WHERE Key_name = %s", index_name, as_dict=True
+			)
+			self.assertEqual([c.Column_name for c in sorted(columns, key=lambda c: c.Seq_in_index)], fields)
+
+		# Con filas dentro y fuera del rango para que el plan no sea "Impossible WHERE"
+		rows = []
+		for day in (11, 12, 13):
+			for employee in range(3):
+				for hour in (7, 12, 17):
+					parsed = {
+						"eventType": "AccessControllerEvent",
+						"dateTime": f"2026-03-{day}T{hour:02d}:00:00-06:00",
+						"AccessControllerEvent": {
+							"name": f"HR-EMP-IDX-{employee}",
+							"employeeNoString": f"95{employee}",
+							"serialNo": day * 100 + employee * 10 + hour,
+						},
+					}
+					rows.append(build_event_row(parsed, "{}", "application/json", "10.0.0.10"))
+		store_event_batch(rows)
+
+		# Misma forma que refresh_attendance_days: empleado y rango semiabierto
+		plan = frappe.db.sql(
+			"""EXPLAIN SELECT h.name_field, MIN(h.event_time), MAX(h.event_time)
+			FROM `tabHikvision Event` h
+			WHERE h.name_field = %s AND h.event_time >= %s AND h.event_time < %s
+			GROUP BY h.name_field""",
+			("HR-EMP-IDX-1", "2026-03-12", "2026-03-13"),
+			as_dict=True,
+		)
+
+		# Solo possible_keys: la elección final depende del optimizador
+		self.assertIn("name_field_event_time_index", plan[0].possible_keys or "")
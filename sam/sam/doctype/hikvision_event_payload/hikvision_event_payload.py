@@ -0,0 +1,22 @@
+# Copyright (c) 2026, Lidar Holding Group S. A. and contributors
+# For license information, please see license.txt
+
+# import frappe
+from frappe.model.document import Document
+
+
+class HikvisionEventPayload(Document):
+	# begin: auto-generated types
+	# This code is auto-generated. Do not modify anything in this block.
+
+	from typing import TYPE_CHECKING
+
+	if TYPE_CHECKING:
+		from frappe.types import DF
+
+		content_type: DF.Data | None
+		payload: DF.LongText | None
+		raw_size: DF.Int
+	# end: auto-generated types
+
+	pass
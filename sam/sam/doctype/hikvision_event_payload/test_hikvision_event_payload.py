@@ -0,0 +1,16 @@
+# Copyright (c) 2026, Lidar Holding Group S. A. and Contributors
+# See license.txt
+
+# import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from sam.api.hikvision_payload import compress_payload, decompress_payload
+
+
+class TestHikvisionEventPayload(FrappeTestCase):
+	def test_compress_round_trip(self):
+		raw = '{"eventType": "AccessControllerEvent", "name": "Pérez"}' * 50
+		packed = compress_payload(raw)
+
+		self.assertLess(len(packed), len(raw))
+		self.assertEqual(decompress_payload(packed), raw)
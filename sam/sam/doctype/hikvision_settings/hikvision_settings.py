@@ -0,0 +1,31 @@
+# Copyright (c) 2026, Lidar Holding Group S. A. and contributors
+# For license information, please see license.txt
+
+# import frappe
+from frappe.model.document import Document
+
+
+class HikvisionSettings(Document):
+	# begin: auto-generated types
+	# This code is auto-generated. Do not modify anything in this block.
+
+	from typing import TYPE_CHECKING
+
+	if TYPE_CHECKING:
+		from frappe.types import DF
+
+		batch_size: DF.Int
+		enable_acs_polling: DF.Check
+		flush_interval: DF.Int
+		ingestion_mode: DF.Literal["Direct", "Buffered"]
+		payload_retention_days: DF.Int
+		payload_storage: DF.Literal["Inline", "Compressed"]
+		polling_workers: DF.Int
+		spool_depth: DF.Int
+	# end: auto-generated types
+
+	@property
+	def spool_depth(self):
+		from sam.api.hikvision_spool import get_spool_depth
+
+		return get_spool_depth()
@@ -0,0 +1,60 @@
+# Copyright (c) 2026, Lidar Holding Group S. A. and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from sam.api.hikvision import build_event_row
+from sam.api.hikvision_spool import (
+	FLUSH_LOCK_KEY,
+	PROCESSING_KEY,
+	SPOOL_KEY,
+	_pop_batch,
+	flush_spool,
+	get_spool_depth,
+	spool_event,
+)
+
+
+class TestHikvisionSettings(FrappeTestCase):
+	def setUp(self):
+		frappe.cache().delete_value([SPOOL_KEY, PROCESSING_KEY, FLUSH_LOCK_KEY])
+
+	def spool_events(self, name_field, count):
+		for serial_no in range(count):
+			parsed = {
+				"eventType": "AccessControllerEvent",
+				"dateTime": "2026-03-12T10:30:00-06:00",
+				"AccessControllerEvent": {
+					"name": name_field,
+					"employeeNoString": "9001",
+					"serialNo": serial_no,
+				},
+			}
+			spool_event(build_event_row(parsed, "{}", "application/json", "127.0.0.1"))
+
+	def test_flush_spool_writes_events_in_batches(self):
+		self.spool_events("HR-EMP-SPOOL", 3)
+
+		self.assertEqual(get_spool_depth(), 3)
+		self.assertEqual(flush_spool(), 3)
+		self.assertEqual(get_spool_depth(), 0)
+		self.assertEqual(frappe.db.count("Hikvision Event", {"name_field": "HR-EMP-SPOOL"}), 3)
+
+	def test_unacknowledged_batch_is_requeued(self):
+		self.spool_events("HR-EMP-SPOOL-REQUEUE", 3)
+
+		# Un vaciado que muere después de tomar el lote y antes del commit
+		self.assertEqual(len(_pop_batch(2)), 2)
+		self.assertEqual(get_spool_depth(), 1)
+
+		self.assertEqual(flush_spool(), 3)
+		self.assertEqual(frappe.cache().llen(PROCESSING_KEY), 0)
+		self.assertEqual(frappe.db.count("Hikvision Event", {"name_field": "HR-EMP-SPOOL-REQUEUE"}), 3)
+
+	def test_flush_spool_skips_while_locked(self):
+		self.spool_events("HR-EMP-SPOOL-LOCK", 1)
+		frappe.cache().set_value(FLUSH_LOCK_KEY, 1)
+
+		self.assertEqual(flush_spool(), 0)
+		self.assertEqual(get_spool_depth(), 1)
@@ -1,9 +1,19 @@
 # Copyright (c) 2025, Lidar Holding Group S. A. and contributors
 # For license information, please see license.txt
 
+import frappe
 from frappe.model.document import Document
 
 
+def on_doctype_update():
+	# Consulta de solvencia por placa (sam.api.solvencia)
+	frappe.db.add_index(
+		"PMT Boleta",
+		["vehiculo_id", "estado_boleta", "fecha_infraccion"],
+		"vehiculo_estado_fecha_index",
+	)
+
+
 class PMTBoleta(Document):
 	def before_insert(self):
 		# Every new record starts its lifecycle in VERIFICACION.
@@ -1,9 +1,95 @@
 # Copyright (c) 2025, Lidar Holding Group S. A. and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from sam.scripts.pmt_historico_to_boleta import (
+	AGENTE_FIJO,
+	CUI_FIJO,
+	_BoletaValidator,
+	_bulk_insert_boletas,
+	_insert_boleta_doc,
+)
+
+FETCHED_FIELDS = [
+	"marca_vehiculo",
+	"vehiculo_descripcion_marca",
+	"propietario",
+	"nit",
+	"articulo_valor",
+	"descripción_del_articulo",
+	"nombre_infractor",
+	"licencia_principal",
+	"tipo_de_licencia_principal",
+	"nombre_agente",
+]
+
+
+def make_fixture(doctype, name, **values):
+	if not frappe.db.exists(doctype, name):
+		# Los links de los catálogos no son parte de lo que se prueba
+		frappe.get_doc({"doctype": doctype, **values}).insert(ignore_permissions=True, ignore_links=True)
+
+
+def make_historico_row(idinfraccion):
+	return {
+		"name": f"PMT-H-TEST-{idinfraccion}",
+		"idinfraccion": idinfraccion,
+		"status": "VERIFICACION",
+		"placa_unificada": "PTEST015",
+		"fecha": "2026-03-12",
+		"idmarca": "MARCA HISTORICO",
+		"nombres": "Nombre",
+		"apellidos": "Historico",
+		"nlicencia": "LIC-HISTORICO",
+		"articulo_valido": "TEST-015",
+		"total": 999,
+		"fechalimite": "2026-03-20",
+		"detalle": "",
+		"consolidado": "",
+		"lugar": "Zona 1",
+	}
+
 
 class TestPMTBoleta(FrappeTestCase):
-	pass
+	def test_bulk_insert_matches_doc_insert(self):
+		make_fixture("PMT Boleta Estado", "VERIFICACION", boleta_estado="VERIFICACION")
+		make_fixture("PMT Agente", AGENTE_FIJO, id_agente=AGENTE_FIJO, agente_nombre="Agente de prueba")
+		make_fixture(
+			"PMT Infractor",
+			CUI_FIJO,
+			infractor_id=CUI_FIJO,
+			nombre_infractor="Infractor de prueba",
+			licencia_vehiculo="LIC-001",
+			licencia_tipo_persona="A",
+		)
+		make_fixture(
+			"PMT Vehiculo",
+			"PTEST015",
+			placa_tipo="P",
+			placa_numero="TEST015",
+			marca_vehiculo="TOYOTA",
+			propietario="Propietario de prueba",
+			nit_del_propietario="1234567",
+		)
+		make_fixture(
+			"PMT Articulo",
+			"TEST-015",
+			articulo_codigo="TEST-015",
+			articulo_valor=250,
+			articulo_descripcion="Artículo de prueba",
+		)
+		for name in ("990000151", "990000152"):
+			frappe.delete_doc_if_exists("PMT Boleta", name, force=True)
+
+		valid, rejected = _BoletaValidator()([make_historico_row(990000151), make_historico_row(990000152)])
+		self.assertEqual(rejected, [])
+
+		_bulk_insert_boletas(valid[:1])
+		_insert_boleta_doc(valid[1][1])
+
+		bulk = frappe.db.get_value("PMT Boleta", "990000151", FETCHED_FIELDS, as_dict=True)
+		doc = frappe.db.get_value("PMT Boleta", "990000152", FETCHED_FIELDS, as_dict=True)
+		self.assertEqual(bulk, doc)
+		self.assertEqual(bulk.articulo_valor, 250)
@@ -56,20 +56,7 @@ const FIELD_STYLE_CONFIG = {
 };
 
 const MULTAS_RESULT_LIMIT = 100;
-const PENDING_PAYMENT_STATE = ["PENDIENTE-PAGO", "VERIFICACION"];
-const MULTA_FIELDS = [
-	"name",
-	"boleta_id",
-	"fecha_infraccion",
-	"articulo_codigo",
-	"articulo_valor",
-	"infraccion_saldo",
-	"estado_boleta",
-	"marca_vehiculo",
-	"nombre_infractor",
-	"ubicacion_infraccion",
-	"observaciones",
-];
+const SOLVENCIA_METHOD = "sam.api.solvencia.lookup";
 const EDITABLE_FIELDS = ["placa_vehiculo_buscar"];
 const MESSAGE_PALETTE = {
 	muted: { text: "#495057", border: "#dee2e6", bg: "#f8f9fa" },
@@ -353,56 +340,10 @@ function formatCurrency(value) {
 	}
 }
 
-/**
- * Fetches articulo descriptions in bulk to avoid N+1 queries when rendering.
- */
-async function attachArticuloDescriptions(records) {
-	if (!Array.isArray(records) || !records.length) {
-		return records || [];
-	}
-
-	const uniqueCodes = [
-		...new Set(
-			records
-				.map((record) => (record?.articulo_codigo || "").trim())
-				.filter(Boolean)
-		),
-	];
-
-	if (!uniqueCodes.length) {
-		return records;
-	}
-
-	try {
-		const articulos = await frappe.db.get_list("PMT Articulo", {
-			filters: {
-				name: ["in", uniqueCodes],
-			},
-			fields: ["name", "articulo_descripcion"],
-			limit: uniqueCodes.length,
-		});
-
-		const articuloMap = articulos.reduce((acc, articulo) => {
-			acc[articulo.name] = articulo.articulo_descripcion || "";
-			return acc;
-		}, {});
-
-		return records.map((record) => ({
-			...record,
-			articulo_descripcion:
-				articuloMap[record.articulo_codigo] || record.articulo_descripcion || null,
-		}));
-	} catch (error) {
-		console.warn("No se pudieron cargar los artículos relacionados:", error);
-		return records;
-	}
-}
-
 /**
  * Renders the detail table using stored saldo values.
  */
-function buildMultasTable(records, placa) {
-	let totalSaldoRegistrado = 0;
+function buildMultasTable({ boletas: records, total_saldo: totalSaldoRegistrado }) {
 	const rows = records
 		.map((record) => {
 			const boleta = record.boleta_id || record.name || "-";
@@ -421,7 +362,6 @@ function buildMultasTable(records, placa) {
 			const saldoRegistrado = Number(
 				record.infraccion_saldo ?? record.articulo_valor ?? 0
 			);
-			totalSaldoRegistrado += saldoRegistrado;
 			const saldoFormatted = formatCurrency(saldoRegistrado);
 			return `<tr>
 				<td style="vertical-align:top;">${escapeHtml(String(boleta))}</td>
@@ -569,21 +509,16 @@ async function buscarMultasPendientes(frm) {
 
 	const lookupPromise = (async () => {
 		try {
-			const records = await frappe.db.get_list("PMT Boleta", {
-				filters: {
-					vehiculo_id: placa,
-					estado_boleta: ["in", PENDING_PAYMENT_STATE],
-				},
-				fields: MULTA_FIELDS,
-				order_by: "fecha_infraccion desc",
-				limit: MULTAS_RESULT_LIMIT,
+			const { message: result } = await frappe.call({
+				method: SOLVENCIA_METHOD,
+				args: { placa, limit: MULTAS_RESULT_LIMIT },
 			});
 
 			if (requestId !== state.lastRequestId) {
 				return;
 			}
 
-			if (!records.length) {
+			if (!result || result.es_solvente) {
 				await clearSummaryFields(frm);
 				setDetalleMultasHTML(
 					frm,
@@ -599,13 +534,8 @@ async function buscarMultasPendientes(frm) {
 				return;
 			}
 
-			const enrichedRecords = await attachArticuloDescriptions(records);
-			if (requestId !== state.lastRequestId) {
-				return;
-			}
-
-			await syncSummaryFieldsFromRecords(frm, enrichedRecords);
-			setDetalleMultasHTML(frm, buildMultasTable(enrichedRecords, placa));
+			await syncSummaryFieldsFromRecords(frm, result.boletas);
+			setDetalleMultasHTML(frm, buildMultasTable(result));
 			await updateEsSolventeStatus(frm, "insolvente");
 		} catch (error) {
 			if (requestId !== state.lastRequestId) {
@@ -18,56 +18,12 @@ frappe.ui.form.on('PMT Talonario', {
     }
 });
 
-const CHILD_TABLE_FIELDNAME = 'talonario_detalle';
-const CHILD_DOCTYPE_EXPECTED = 'PMT Talonario Detalle';
-
 // Fieldname del agente en el MAESTRO PMT Talonario.
 // CAMBIA ESTO si en tu maestro el fieldname real no es "agente_asignado".
 const AGENTE_FIELDNAME_MASTER = 'agente_asignado';
 
-// Fieldname del agente en el CHILD “PMT Talonario Detalle” (renombrado)
-const AGENTE_FIELDNAME_CHILD = 'agente_asignado_detalle';
-
-// Fieldname del talonario en el MAESTRO y en el CHILD (ajusta si tus nombres reales difieren)
+// Fieldname del talonario en el MAESTRO (ajusta si tu nombre real difiere)
 const TALONARIO_ID_MASTER_FIELD = 'talonario_id';
-const TALONARIO_ID_CHILD_FIELD = 'talonario_id';
-
-function validar_child_table_meta(frm) {
-    const field = frm.fields_dict[CHILD_TABLE_FIELDNAME];
-    if (!field) {
-        frappe.msgprint({
-            title: __('Error de Configuración'),
-            indicator: 'red',
-            message: __('No se encontró el campo de tabla "{0}" en el DocType PMT Talonario.', [CHILD_TABLE_FIELDNAME])
-        });
-        return { ok: false, reason: 'field_not_found' };
-    }
-    if (field.df.fieldtype !== 'Table') {
-        frappe.msgprint({
-            title: __('Error de Configuración'),
-            indicator: 'red',
-            message: __('El campo "{0}" no es de tipo Table (es {1}).', [CHILD_TABLE_FIELDNAME, field.df.fieldtype])
-        });
-        return { ok: false, reason: 'not_table' };
-    }
-    if (!field.df.options) {
-        frappe.msgprint({
-            title: __('Error de Configuración'),
-            indicator: 'red',
-            message: __('El campo Table "{0}" no tiene definido Options. Debe ser: {1}.', [CHILD_TABLE_FIELDNAME, CHILD_DOCTYPE_EXPECTED])
-        });
-        return { ok: false, reason: 'options_missing' };
-    }
-    if (field.df.options !== CHILD_DOCTYPE_EXPECTED) {
-        frappe.msgprint({
-            title: __('Error de Configuración'),
-            indicator: 'red',
-            message: __('El campo Table "{0}" tiene Options "{1}". Debe ser: "{2}".', [CHILD_TABLE_FIELDNAME, field.df.options, CHILD_DOCTYPE_EXPECTED])
-        });
-        return { ok: false, reason: 'wrong_options' };
-    }
-    return { ok: true };
-}
 
 function validar_campos_requeridos(frm) {
     const errores = [];
@@ -116,92 +72,43 @@ function validar_rango_boletas(boleta_inicial, boleta_final) {
     return true;
 }
 
-function generar_boletas(frm) {
-    console.log('=== INICIO: Generar Boletas ===');
-
-    const metaCheck = validar_child_table_meta(frm);
-    if (!metaCheck.ok) {
-        console.error('Error meta child table:', metaCheck.reason);
-        return;
-    }
-
+// El detalle se genera en el servidor (PMTTalonario.generar_boletas) con un
+// INSERT multi-fila; aquí solo se valida, se guarda y se recarga.
+async function generar_boletas(frm) {
     if (!validar_campos_requeridos(frm)) {
-        console.log('ERROR: Faltan campos requeridos');
         return;
     }
 
     const boleta_inicial = parseInt(frm.doc.boleta_inicial, 10);
     const boleta_final = parseInt(frm.doc.boleta_final, 10);
-    const agente_asignado_master = frm.doc[AGENTE_FIELDNAME_MASTER];
-    const talonario_id_maestro = frm.doc[TALONARIO_ID_MASTER_FIELD];
-
-    console.log('Boleta Inicial:', boleta_inicial);
-    console.log('Boleta Final:', boleta_final);
-    console.log(`Agente maestro (${AGENTE_FIELDNAME_MASTER}):`, agente_asignado_master);
-    console.log(`Talonario maestro (${TALONARIO_ID_MASTER_FIELD}):`, talonario_id_maestro);
-
     if (!validar_rango_boletas(boleta_inicial, boleta_final)) {
         return;
     }
 
-    frappe.show_alert({ message: __('Iniciando generación de boletas...'), indicator: 'blue' }, 3);
-
     try {
-        console.log('Limpiando tabla...');
-        frm.clear_table(CHILD_TABLE_FIELDNAME);
-
-        let contador = 0;
-
-        for (let i = boleta_inicial; i <= boleta_final; i++) {
-            const row = frm.add_child(CHILD_TABLE_FIELDNAME);
-            if (!row) throw new Error('No se pudo agregar la fila en el detalle');
-
-            row.boleta_id_detalle = i;
-            row.estado_boleta = 'DISPONIBLE';
-
-            // Usa el NUEVO fieldname en el CHILD
-            row[AGENTE_FIELDNAME_CHILD] = agente_asignado_master || null;
-
-            // Copiar talonario_id (ajusta si el fieldname en child es distinto)
-            row[TALONARIO_ID_CHILD_FIELD] = talonario_id_maestro || null;
-
-            contador++;
-            console.log('Boleta insertada:', {
-                boleta_id_detalle: row.boleta_id_detalle,
-                estado_boleta: row.estado_boleta,
-                [AGENTE_FIELDNAME_CHILD]: row[AGENTE_FIELDNAME_CHILD],
-                [TALONARIO_ID_CHILD_FIELD]: row[TALONARIO_ID_CHILD_FIELD]
-            });
+        if (frm.is_dirty()) {
+            await frm.save();
         }
 
-        frm.refresh_field(CHILD_TABLE_FIELDNAME);
+        const { message: resultado } = await frm.call({
+            method: 'generar_boletas',
+            freeze: true,
+            freeze_message: __('Generando boletas...')
+        });
+        await frm.reload_doc();
 
         frappe.msgprint({
             title: __('Éxito'),
             indicator: 'green',
-            message: __('Se generaron {0} boletas correctamente (desde {1} hasta {2})<br>Agente (maestro: {3}): {4}<br>Talonario (maestro: {5}): {6}', [
-                contador,
-                boleta_inicial,
-                boleta_final,
-                AGENTE_FIELDNAME_MASTER,
-                frappe.utils.escape_html(agente_asignado_master || ''),
-                TALONARIO_ID_MASTER_FIELD,
-                frappe.utils.escape_html(talonario_id_maestro || '')
+            message: __('Se generaron {0} boletas correctamente (desde {1} hasta {2})<br>Boletas que conservaron su estado: {3}', [
+                resultado.generadas,
+                resultado.boleta_inicial,
+                resultado.boleta_final,
+                resultado.conservadas
             ])
         });
-
-        console.log('Total de registros insertados:', contador);
-        console.log('=== FINALIZADO: Generación Exitosa ===');
-
-        frappe.show_alert({ message: __('Proceso finalizado correctamente'), indicator: 'green' }, 5);
-
     } catch (error) {
-        console.error('ERROR en la inserción:', error);
-        frappe.msgprint({
-            title: __('Error'),
-            indicator: 'red',
-            message: __('Ocurrió un error al generar las boletas: {0}', [error?.message || error])
-        });
-        console.log('=== FINALIZADO: Con Errores ===');
+        // Los errores del servidor ya se muestran con frappe.msgprint
+        console.error('ERROR al generar boletas:', error);
     }
-}
\ No newline at end of file
+}
@@ -1,9 +1,128 @@
 # Copyright (c) 2025, Lidar Holding Group S. A. and contributors
 # For license information, please see license.txt
 
-# import frappe
+import frappe
+from frappe import _
 from frappe.model.document import Document
+from frappe.utils import cint
+
+from sam.sam.pmt_utils import ESTADO_DISPONIBLE, clear_talonario_ranges
+
+CHILD_TABLE_FIELDNAME = "talonario_detalle"
+CHILD_DOCTYPE = "PMT Talonario Detalle"
+MAX_BOLETAS_POR_TALONARIO = 100000
 
 
 class PMTTalonario(Document):
-	pass
+	def validate(self):
+		# Los talonarios anteriores a la validación pueden traslaparse; se
+		# pueden seguir editando mientras no cambie su rango
+		if (
+			self.is_new()
+			or self.has_value_changed("boleta_inicial")
+			or self.has_value_changed("boleta_final")
+		):
+			self.validar_rango()
+
+	def on_update(self):
+		clear_talonario_ranges()
+
+	def on_trash(self):
+		clear_talonario_ranges()
+
+	def validar_rango(self):
+		inicial = cint(self.boleta_inicial)
+		final = cint(self.boleta_final)
+		if inicial <= 0 or final <= 0:
+			frappe.throw(_("Boleta Inicial y Boleta Final deben ser números mayores que cero"))
+		if inicial > final:
+			frappe.throw(_("Boleta Inicial debe ser menor o igual a Boleta Final"))
+		if final - inicial + 1 > MAX_BOLETAS_POR_TALONARIO:
+			frappe.throw(_("Un talonario no puede tener más de {0} boletas").format(MAX_BOLETAS_POR_TALONARIO))
+
+		traslapes = frappe.get_all(
+			"PMT Talonario",
+			filters={
+				"name": ["!=", self.name or ""],
+				"boleta_inicial": ["<=", final],
+				"boleta_final": [">=", inicial],
+			},
+			fields=["name", "boleta_inicial", "boleta_final"],
+			limit=5,
+		)
+		if traslapes:
+			detalle = ", ".join(f"{t.name} ({t.boleta_inicial}-{t.boleta_final})" for t in traslapes)
+			frappe.throw(_("El rango {0}-{1} se traslapa con: {2}").format(inicial, final, detalle))
+
+	@frappe.whitelist()
+	def generar_boletas(self):
+		"""
+		Genera el detalle del talonario con un INSERT multi-fila, sin cargar
+		las filas en el formulario.
+
+		Las boletas del rango se resuelven por el rango mismo
+		(sam.sam.pmt_utils.obtener_datos_boleta), así que solo se guardan
+		filas para las boletas cuyo estado difiere de DISPONIBLE; las
+		filas existentes se reemplazan y esas boletas conservan su estado.
+
+		Returns:
+			dict: generadas, conservadas, boleta_inicial, boleta_final
+		"""
+		self.check_permission("write")
+		if self.is_new():
+			frappe.throw(_("Guarde el talonario antes de generar las boletas"))
+		if not self.agente_asignado:
+			frappe.throw(_("Debe seleccionar un Agente Asignado"))
+		if not self.talonario_id:
+			frappe.throw(_("Debe definir el Talonario (talonario_id)"))
+		self.validar_rango()
+
+		inicial = cint(self.boleta_inicial)
+		final = cint(self.boleta_final)
+
+		estados = dict(
+			frappe.db.sql(
+				f"""
+				SELECT boleta_id_detalle, estado_boleta
+				FROM `tab{CHILD_DOCTYPE}`
+				WHERE parent = %s AND parenttype = %s AND parentfield = %s
+					AND estado_boleta IS NOT NULL AND estado_boleta != %s
+				""",
+				(self.name, self.doctype, CHILD_TABLE_FIELDNAME, ESTADO_DISPONIBLE),
+			)
+		)
+		conservadas = sorted(boleta for boleta in estados if inicial <= cint(boleta) <= final)
+		frappe.db.delete(
+			CHILD_DOCTYPE,
+			{"parent": self.name, "parenttype": self.doctype, "parentfield": CHILD_TABLE_FIELDNAME},
+		)
+
+		# Nombres deterministas: bulk_insert no reintenta si un hash aleatorio
+		# choca con otra fila, y las filas anteriores ya se borraron
+		now = frappe.utils.now()
+		owner = frappe.session.user
+		fields = [
+			"name", "owner", "creation", "modified", "modified_by", "docstatus",
+			"parent", "parenttype", "parentfield", "idx",
+			"boleta_id_detalle", "estado_boleta", "agente_asignado_detalle", "talonario_id",
+		]
+		values = (
+			(
+				f"{self.name}-{boleta}", owner, now, now, owner, 0,
+				self.name, self.doctype, CHILD_TABLE_FIELDNAME, idx,
+				boleta, estados[boleta], self.agente_asignado, self.talonario_id,
+			)
+			for idx, boleta in enumerate(conservadas, start=1)
+		)
+		frappe.db.bulk_insert(CHILD_DOCTYPE, fields, values)
+
+		# El formulario recarga el documento; modified evita el aviso de
+		# "documento modificado" al guardar después
+		frappe.db.set_value(self.doctype, self.name, "modified", now, update_modified=False)
+
+		return {
+			"generadas": final - inicial + 1,
+			"conservadas": len(conservadas),
+			"boleta_inicial": inicial,
+			"boleta_final": final,
+		}
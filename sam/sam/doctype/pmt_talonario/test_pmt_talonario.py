@@ -1,9 +1,203 @@
 # Copyright (c) 2025, Lidar Holding Group S. A. and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from sam.patches import compact_pmt_talonario_detalle
+from sam.sam.doctype.pmt_talonario.pmt_talonario import CHILD_DOCTYPE
+from sam.sam.pmt_utils import (
+	TALONARIO_RANGES_KEY,
+	buscar_talonarios,
+	clear_talonario_ranges,
+	get_talonario_ranges,
+	obtener_datos_boleta,
+)
+
+AGENTE = "AG-TEST-TALON"
+# Rango reservado para las pruebas, lejos de los talonarios reales
+BASE = 990100000
+
+
+def make_talonario(inicial, final, talonario_id="T-TEST"):
+	return frappe.get_doc(
+		{
+			"doctype": "PMT Talonario",
+			"talonario_id": talonario_id,
+			"boleta_inicial": BASE + inicial,
+			"boleta_final": BASE + final,
+			"agente_asignado": AGENTE,
+		}
+	).insert(ignore_permissions=True)
+
+
+def make_legacy_talonario(inicial, final, talonario_id="T-LEGACY"):
+	"""Talonario con un rango que ya no pasaría la validación de traslapes."""
+	doc = make_talonario(900, 910, talonario_id)
+	doc.db_set({"boleta_inicial": BASE + inicial, "boleta_final": BASE + final})
+	clear_talonario_ranges()
+	doc.reload()
+	return doc
+
+
+def add_detalle(talonario, *rows):
+	for boleta, estado, agente in rows:
+		talonario.append(
+			"talonario_detalle",
+			{
+				"boleta_id_detalle": BASE + boleta,
+				"estado_boleta": estado,
+				"agente_asignado_detalle": agente,
+				"talonario_id": talonario.talonario_id,
+			},
+		)
+	talonario.save(ignore_permissions=True)
+
+
+def detalle(talonario):
+	return frappe.get_all(
+		CHILD_DOCTYPE,
+		filters={"parent": talonario.name},
+		fields=["name", "boleta_id_detalle", "estado_boleta", "agente_asignado_detalle", "talonario_id"],
+		order_by="boleta_id_detalle",
+	)
+
 
 class TestPMTTalonario(FrappeTestCase):
-	pass
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		if not frappe.db.exists("PMT Agente", AGENTE):
+			frappe.get_doc(
+				{"doctype": "PMT Agente", "id_agente": AGENTE, "agente_nombre": "Agente de prueba"}
+			).insert(ignore_permissions=True, ignore_links=True)
+
+	def setUp(self):
+		talonarios = frappe.get_all("PMT Talonario", filters={"boleta_final": [">", BASE]}, pluck="name")
+		if talonarios:
+			frappe.db.delete(CHILD_DOCTYPE, {"parent": ["in", talonarios]})
+			frappe.db.delete("PMT Talonario", {"name": ["in", talonarios]})
+		clear_talonario_ranges()
+
+	def test_generar_boletas(self):
+		talonario = make_talonario(1, 10)
+		talonario.append("talonario_detalle", {"boleta_id_detalle": BASE + 3, "estado_boleta": "ANULADA"})
+		talonario.append("talonario_detalle", {"boleta_id_detalle": BASE + 5, "estado_boleta": "DISPONIBLE"})
+		# Fuera del rango actual del talonario
+		talonario.append("talonario_detalle", {"boleta_id_detalle": BASE + 20, "estado_boleta": "USADA"})
+		talonario.save(ignore_permissions=True)
+
+		for _ in range(2):
+			result = talonario.generar_boletas()
+
+			self.assertEqual(
+				result,
+				{"generadas": 10, "conservadas": 1, "boleta_inicial": BASE + 1, "boleta_final": BASE + 10},
+			)
+			self.assertEqual(
+				detalle(talonario),
+				[
+					{
+						"name": f"{talonario.name}-{BASE + 3}",
+						"boleta_id_detalle": BASE + 3,
+						"estado_boleta": "ANULADA",
+						"agente_asignado_detalle": AGENTE,
+						"talonario_id": "T-TEST",
+					}
+				],
+			)
+
+	def test_rejects_overlapping_ranges(self):
+		make_talonario(1, 10)
+
+		for inicial, final in ((5, 15), (10, 10), (0, 20)):
+			self.assertRaises(frappe.ValidationError, make_talonario, inicial, final)
+		self.assertRaises(frappe.ValidationError, make_talonario, 12, 11)
+
+		make_talonario(11, 20)
+
+	def test_legacy_overlap_saves_while_range_unchanged(self):
+		make_talonario(1, 10)
+		legacy = make_legacy_talonario(5, 15)
+
+		legacy.talonario_id = "T-LEGACY"
+		legacy.save(ignore_permissions=True)
+		self.assertRaises(frappe.ValidationError, legacy.generar_boletas)
+
+		legacy.boleta_final = BASE + 16
+		self.assertRaises(frappe.ValidationError, legacy.save, ignore_permissions=True)
+
+	def test_boleta_without_row_uses_range(self):
+		talonario = make_talonario(1, 10)
+
+		self.assertEqual(
+			obtener_datos_boleta(BASE + 2),
+			{"estado_boleta": "DISPONIBLE", "agente_asignado_detalle": AGENTE, "talonario_id": "T-TEST"},
+		)
+		self.assertEqual([t[2] for t in buscar_talonarios(BASE + 10)], [talonario.name])
+
+	def test_row_overrides_range(self):
+		talonario = make_talonario(1, 10)
+		add_detalle(talonario, (3, "ANULADA", "AG-OTRO"))
+
+		self.assertEqual(
+			obtener_datos_boleta(str(BASE + 3)),
+			{"estado_boleta": "ANULADA", "agente_asignado_detalle": "AG-OTRO", "talonario_id": "T-TEST"},
+		)
+
+	def test_nested_ranges_innermost_first(self):
+		externo = make_talonario(1, 100, "T-EXTERNO")
+		interno = make_legacy_talonario(10, 20, "T-INTERNO")
+		posterior = make_talonario(200, 210, "T-POSTERIOR")
+
+		self.assertEqual([t[2] for t in buscar_talonarios(BASE + 15)], [interno.name, externo.name])
+		self.assertEqual([t[2] for t in buscar_talonarios(BASE + 50)], [externo.name])
+		self.assertEqual([t[2] for t in buscar_talonarios(BASE + 205)], [posterior.name])
+		self.assertEqual(buscar_talonarios(BASE + 150), [])
+		self.assertEqual(obtener_datos_boleta(BASE + 15).talonario_id, "T-INTERNO")
+
+	def test_boleta_outside_ranges(self):
+		make_talonario(1, 10)
+
+		for boleta_id in (BASE, BASE + 11, 0):
+			self.assertRaises(frappe.ValidationError, obtener_datos_boleta, boleta_id)
+
+	def test_saving_talonario_clears_ranges(self):
+		make_talonario(1, 10)
+		get_talonario_ranges()
+		self.assertIsNotNone(frappe.cache().get_value(TALONARIO_RANGES_KEY))
+
+		talonario = make_talonario(11, 20)
+
+		self.assertIsNone(frappe.cache().get_value(TALONARIO_RANGES_KEY))
+		self.assertEqual([t[2] for t in buscar_talonarios(BASE + 15)], [talonario.name])
+
+		get_talonario_ranges()
+		talonario.boleta_final = BASE + 30
+		talonario.save(ignore_permissions=True)
+
+		self.assertEqual([t[2] for t in buscar_talonarios(BASE + 25)], [talonario.name])
+
+	def test_compaction_patch(self):
+		talonario = make_talonario(1, 10)
+		add_detalle(
+			talonario,
+			(2, "DISPONIBLE", AGENTE),
+			(3, "ANULADA", AGENTE),
+			(4, "DISPONIBLE", "AG-OTRO"),
+			(5, None, AGENTE),
+			(50, "DISPONIBLE", AGENTE),
+		)
+		traslapado = make_talonario(20, 30)
+		add_detalle(traslapado, (22, "DISPONIBLE", AGENTE))
+		legacy = make_legacy_talonario(25, 35)
+
+		compact_pmt_talonario_detalle.execute()
+
+		# Solo se borran las filas que repiten lo que da el rango
+		self.assertEqual([row.boleta_id_detalle - BASE for row in detalle(talonario)], [3, 4, 50])
+		# Los talonarios traslapados conservan todas sus filas
+		self.assertEqual([row.boleta_id_detalle - BASE for row in detalle(traslapado)], [22])
+		self.assertEqual(obtener_datos_boleta(BASE + 2).estado_boleta, "DISPONIBLE")
+		self.assertEqual(obtener_datos_boleta(BASE + 3).estado_boleta, "ANULADA")
+		self.assertEqual([t[2] for t in buscar_talonarios(BASE + 33)], [legacy.name])
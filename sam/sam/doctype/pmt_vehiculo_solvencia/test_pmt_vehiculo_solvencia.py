@@ -1,9 +1,245 @@
 # Copyright (c) 2025, Lidar Holding Group S. A. and Contributors
 # See license.txt
 
-# import frappe
+from unittest.mock import MagicMock, patch
+
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from sam.api.solvencia import (
+	MAX_BULK_PLACAS,
+	STATS_KEY,
+	_cache_key,
+	get_cache_stats,
+	get_solvencia,
+	lookup,
+	lookup_bulk,
+	parse_placas,
+	run_bulk_job,
+)
+
+PLACA = "PSOLV01"
+ARTICULO = "TEST-SOLV"
+
+
+def make_fixture(doctype, name, **values):
+	if not frappe.db.exists(doctype, name):
+		# Los links de los catálogos no son parte de lo que se prueba
+		frappe.get_doc({"doctype": doctype, **values}).insert(ignore_permissions=True, ignore_links=True)
+
+
+def make_vehiculo(placa_tipo, placa_numero):
+	make_fixture(
+		"PMT Vehiculo",
+		f"{placa_tipo}{placa_numero}",
+		placa_tipo=placa_tipo,
+		placa_numero=placa_numero,
+	)
+	return f"{placa_tipo}{placa_numero}"
+
+
+def make_boleta(boleta_id, vehiculo_id, estado, fecha, saldo=None):
+	frappe.delete_doc_if_exists("PMT Boleta", str(boleta_id), force=True)
+	doc = frappe.get_doc(
+		{
+			"doctype": "PMT Boleta",
+			"boleta_id": boleta_id,
+			"vehiculo_id": vehiculo_id,
+			"articulo_codigo": ARTICULO,
+			"fecha_infraccion": fecha,
+		}
+	).insert(ignore_permissions=True)
+	# before_insert siempre deja VERIFICACION
+	doc.db_set({"estado_boleta": estado, "infraccion_saldo": saldo})
+	return doc
+
+
+def make_csv(content):
+	return frappe.get_doc(
+		{"doctype": "File", "file_name": "placas_test.csv", "is_private": 1, "content": content}
+	).insert(ignore_permissions=True)
+
 
 class TestPMTVehiculoSolvencia(FrappeTestCase):
-	pass
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		for estado in ("VERIFICACION", "PENDIENTE-PAGO", "PAGADA"):
+			make_fixture("PMT Boleta Estado", estado, boleta_estado=estado)
+		make_fixture(
+			"PMT Articulo",
+			ARTICULO,
+			articulo_codigo=ARTICULO,
+			articulo_valor=250,
+			articulo_descripcion="Estacionar en lugar prohibido",
+		)
+		make_vehiculo("P", "SOLV01")
+
+	def setUp(self):
+		frappe.cache().delete_value(_cache_key(PLACA))
+
+	def assertCached(self, placa, cached=True):
+		self.assertEqual(frappe.cache().get_value(_cache_key(placa)) is not None, cached)
+
+	def make_pending_boletas(self):
+		make_boleta(990000301, PLACA, "PENDIENTE-PAGO", "2026-01-10", saldo=100)
+		make_boleta(990000302, PLACA, "VERIFICACION", "2026-02-10", saldo=200)
+		make_boleta(990000303, PLACA, "PENDIENTE-PAGO", "2026-03-10")
+		make_boleta(990000304, PLACA, "PAGADA", "2026-04-10", saldo=999)
+		frappe.cache().delete_value(_cache_key(PLACA))
+
+	def test_totals_cover_more_boletas_than_limit(self):
+		self.make_pending_boletas()
+
+		result = lookup(PLACA.lower(), limit=2)
+
+		self.assertEqual(result["placa"], PLACA)
+		# Las más recientes primero; la PAGADA no cuenta
+		self.assertEqual([b.boleta_id for b in result["boletas"]], [990000303, 990000302])
+		self.assertEqual(result["cantidad"], 3)
+		# La boleta sin infraccion_saldo cuenta con articulo_valor
+		self.assertEqual(result["total_saldo"], 550)
+		self.assertFalse(result["es_solvente"])
+
+	def test_boletas_include_articulo_descripcion(self):
+		self.make_pending_boletas()
+
+		boletas = get_solvencia(PLACA)["boletas"]
+
+		self.assertEqual({b.articulo_descripcion for b in boletas}, {"Estacionar en lugar prohibido"})
+
+	def test_verificacion_counts_as_pending(self):
+		placa = make_vehiculo("P", "SOLV02")
+		make_boleta(990000311, placa, "VERIFICACION", "2026-01-10")
+		frappe.cache().delete_value(_cache_key(placa))
+
+		result = get_solvencia(placa)
+
+		self.assertEqual(result["cantidad"], 1)
+		self.assertFalse(result["es_solvente"])
+
+	def test_empty_placa(self):
+		self.assertEqual(
+			lookup("  "),
+			{"placa": "", "boletas": [], "cantidad": 0, "total_saldo": 0, "es_solvente": None},
+		)
+
+	def test_cache_hits_and_misses(self):
+		frappe.cache().delete_value(STATS_KEY)
+
+		get_solvencia(PLACA)
+		get_solvencia(PLACA)
+		get_solvencia(PLACA)
+
+		stats = get_cache_stats()
+		self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+		self.assertEqual(stats["hit_rate"], round(2 / 3, 4))
+
+	def test_boleta_insert_invalidates(self):
+		placa = make_vehiculo("P", "SOLV11")
+		get_solvencia(placa)
+		self.assertCached(placa)
+
+		make_boleta(990000321, placa, "VERIFICACION", "2026-01-10")
+
+		self.assertCached(placa, False)
+
+	def test_boleta_estado_and_saldo_changes_invalidate(self):
+		placa = make_vehiculo("P", "SOLV12")
+		boleta = make_boleta(990000322, placa, "PENDIENTE-PAGO", "2026-01-10", saldo=100)
+
+		for fieldname, value in (("estado_boleta", "PAGADA"), ("infraccion_saldo", 50)):
+			get_solvencia(placa)
+			self.assertCached(placa)
+
+			boleta.reload()
+			boleta.set(fieldname, value)
+			boleta.save(ignore_permissions=True)
+
+			self.assertCached(placa, False)
+
+	def test_boleta_vehiculo_change_invalidates_both_placas(self):
+		placa = make_vehiculo("P", "SOLV13")
+		otra = make_vehiculo("P", "SOLV14")
+		boleta = make_boleta(990000323, placa, "PENDIENTE-PAGO", "2026-01-10")
+		get_solvencia(placa)
+		get_solvencia(otra)
+
+		boleta.reload()
+		boleta.vehiculo_id = otra
+		boleta.save(ignore_permissions=True)
+
+		self.assertCached(placa, False)
+		self.assertCached(otra, False)
+
+	def test_pago_invalidates(self):
+		placa = make_vehiculo("P", "SOLV15")
+		frappe.delete_doc_if_exists("PMT Boleta Pago", "990000324", force=True)
+		make_boleta(990000324, placa, "PENDIENTE-PAGO", "2026-01-10")
+		get_solvencia(placa)
+
+		frappe.get_doc({"doctype": "PMT Boleta Pago", "boleta_id": "990000324", "recibo_id": 1}).insert(
+			ignore_permissions=True
+		)
+
+		self.assertCached(placa, False)
+
+	def test_parse_placas(self):
+		self.assertEqual(parse_placas('["p123abc", "P123ABC", " c456 "]'), ["P123ABC", "C456"])
+		self.assertEqual(parse_placas("p123abc, c456\nm789,"), ["P123ABC", "C456", "M789"])
+
+		con_encabezado = make_csv("placa,nota\np123abc,flota\n\nc456,\n")
+		sin_encabezado = make_csv("p123abc\nc456\n")
+
+		self.assertEqual(parse_placas(file_url=con_encabezado.file_url), ["P123ABC", "C456"])
+		self.assertEqual(parse_placas(file_url=sin_encabezado.file_url), ["P123ABC", "C456"])
+		# Lista y archivo se combinan sin repetir
+		self.assertEqual(
+			parse_placas("m789,c456", file_url=sin_encabezado.file_url), ["M789", "C456", "P123ABC"]
+		)
+
+	def test_bulk_matches_placas_case_insensitively(self):
+		placa = make_vehiculo("p", "SOLV04")
+		make_boleta(990000331, placa, "PENDIENTE-PAGO", "2026-01-10", saldo=75)
+
+		result = lookup_bulk([placa.upper(), "PSOLV99"])
+
+		self.assertEqual(result["insolventes"], 1)
+		self.assertEqual(
+			[(r["placa"], r["cantidad"], r["total_saldo"], r["es_solvente"]) for r in result["resultados"]],
+			[("PSOLV04", 1, 75, False), ("PSOLV99", 0, 0, True)],
+		)
+
+	def test_bulk_limit_requires_background(self):
+		placas = [f"PX{i}" for i in range(MAX_BULK_PLACAS + 1)]
+
+		self.assertRaises(frappe.ValidationError, lookup_bulk, placas)
+
+		with patch("frappe.enqueue", return_value=MagicMock(id="job-1")) as enqueue:
+			result = lookup_bulk(placas, background=1)
+
+		self.assertEqual(result, {"queued": True, "job_id": "job-1", "placas": len(placas)})
+		self.assertEqual(enqueue.call_args.kwargs["placas"], placas)
+
+	def test_background_limit(self):
+		with (
+			patch("sam.api.solvencia.MAX_BACKGROUND_PLACAS", 2),
+			patch("frappe.enqueue") as enqueue,
+		):
+			self.assertRaises(frappe.ValidationError, lookup_bulk, ["P1", "P2", "P3"], background=1)
+			enqueue.assert_not_called()
+
+	def test_bulk_job_writes_csv(self):
+		self.make_pending_boletas()
+
+		with patch("frappe.publish_realtime") as publish:
+			file_url = run_bulk_job(["PSOLV99", PLACA], frappe.session.user)
+
+		self.assertEqual(publish.call_args.args[1], {"file_url": file_url, "placas": 2})
+		content = frappe.get_doc("File", {"file_url": file_url}).get_content()
+		if isinstance(content, bytes):
+			content = content.decode()
+		self.assertEqual(
+			content.splitlines(),
+			["placa,estado,cantidad,total_saldo", "PSOLV99,SOLVENTE,0,0.0", f"{PLACA},INSOLVENTE,3,550.0"],
+		)
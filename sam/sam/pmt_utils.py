@@ -1,20 +1,98 @@
+from bisect import bisect_right
+from functools import partial
+
 import frappe
 from frappe import _
+from frappe.utils import cint
+
+TALONARIO_RANGES_KEY = "sam_talonario_ranges"
+ESTADO_DISPONIBLE = "DISPONIBLE"
+
+
+def _load_talonario_ranges():
+    """
+    (inicios, finales_max, talonarios) ordenados por boleta_inicial, para
+    búsqueda binaria. finales_max[i] es el mayor boleta_final hasta i: los
+    talonarios anteriores a la validación de traslapes pueden traslaparse
+    o contener a otros.
+    """
+    talonarios = frappe.db.sql(
+        """
+        SELECT boleta_inicial, boleta_final, name, agente_asignado, talonario_id
+        FROM `tabPMT Talonario`
+        WHERE boleta_inicial > 0 AND boleta_final >= boleta_inicial
+        ORDER BY boleta_inicial
+        """
+    )
+    finales_max = []
+    for row in talonarios:
+        finales_max.append(max(row[1], finales_max[-1]) if finales_max else row[1])
+    return [row[0] for row in talonarios], finales_max, [tuple(row) for row in talonarios]
+
+
+def get_talonario_ranges():
+    """Mapa de rangos de PMT Talonario en cache; se descarta al guardar o borrar un talonario."""
+    return frappe.cache().get_value(TALONARIO_RANGES_KEY, generator=_load_talonario_ranges)
+
+
+def clear_talonario_ranges():
+    """Descarta el mapa ahora y después del commit, para que una consulta concurrente no guarde el anterior."""
+    frappe.cache().delete_value(TALONARIO_RANGES_KEY)
+    frappe.db.after_commit.add(partial(frappe.cache().delete_value, TALONARIO_RANGES_KEY))
+
+
+def buscar_talonarios(boleta_id):
+    """
+    Talonarios que contienen la boleta, del de mayor boleta_inicial al de
+    menor (el más interno primero si hay rangos anidados).
+
+    Returns:
+        list: tuplas (boleta_inicial, boleta_final, name, agente_asignado, talonario_id)
+    """
+    inicios, finales_max, talonarios = get_talonario_ranges()
+    encontrados = []
+    i = bisect_right(inicios, boleta_id) - 1
+    # Ningún talonario anterior a i llega a la boleta si finales_max[i] < boleta_id
+    while i >= 0 and finales_max[i] >= boleta_id:
+        if talonarios[i][1] >= boleta_id:
+            encontrados.append(talonarios[i])
+        i -= 1
+    return encontrados
+
 
 @frappe.whitelist()
 def obtener_datos_boleta(boleta_id):
-    """Obtiene estado_boleta, agente_asignado_detalle y talonario_id desde la tabla hija 'PMT Talonario Detalle'."""
+    """
+    Obtiene estado_boleta, agente_asignado_detalle y talonario_id de una boleta.
+
+    El talonario se resuelve por rango; la tabla hija 'PMT Talonario
+    Detalle' solo guarda las boletas cuyo estado difiere de DISPONIBLE, y
+    esas filas tienen prioridad.
+    """
     if not boleta_id:
         frappe.throw(_("El ID de boleta no puede estar vacío."))
 
+    boleta_id = cint(boleta_id)
+    talonarios = buscar_talonarios(boleta_id)
+
+    filters = {"boleta_id_detalle": boleta_id}
+    if talonarios:
+        filters["parent"] = ["in", [talonario[2] for talonario in talonarios]]
     resultado = frappe.db.get_value(
         "PMT Talonario Detalle",
-        {"boleta_id_detalle": boleta_id},
+        filters,
         ["estado_boleta", "agente_asignado_detalle", "talonario_id"],
         as_dict=True
     )
 
+    if not resultado and talonarios:
+        resultado = frappe._dict(
+            estado_boleta=ESTADO_DISPONIBLE,
+            agente_asignado_detalle=talonarios[0][3],
+            talonario_id=talonarios[0][4],
+        )
+
     if not resultado:
         frappe.throw(_("No se encontró una boleta con el ID proporcionado."))
 
-    return resultado
\ No newline at end of file
+    return resultado
@@ -6,12 +6,23 @@ Hikvision Attendance Report
 
 Reporte de asistencia que conecta los eventos del dispositivo Hikvision
 con los empleados de HRMS/ERPNext usando attendance_device_id.
+
+Lee el resumen diario Hikvision Attendance Day (primer y último marcaje
+por empleado y fecha), que se mantiene al ingresar los eventos.
 """
 
 import frappe
 from datetime import datetime, timedelta
 
 
+ENTRY_LATE = "<span style='color:red'>TARDE</span>"
+EXIT_EARLY = "<span style='color:red'>ANTES</span>"
+ON_TIME = "<span style='color:green'>OK</span>"
+INVALID_TIME = "-"
+
+ONE_DAY = timedelta(days=1)
+
+
 def execute(filters=None):
     """
     Execute the report.
@@ -53,7 +64,7 @@ def get_columns():
 
 def get_data(filters):
     """
-    Get attendance data from Hikvision Events.
+    Get attendance data from the Hikvision Attendance Day summary.
     
     Args:
         filters: Dictionary with filters
@@ -77,11 +88,11 @@ def get_data(filters):
         query_params["employee"] = filters["employee"]
     
     if filters.get("from_date"):
-        conditions.append("h.event_time >= %(from_date)s")
+        conditions.append("d.attendance_date >= %(from_date)s")
         query_params["from_date"] = filters["from_date"]
     
     if filters.get("to_date"):
-        conditions.append("h.event_time < %(to_date)s")
+        conditions.append("d.attendance_date < %(to_date)s")
         query_params["to_date"] = filters["to_date"]
     
     if filters.get("custom_renglon"):
@@ -98,107 +109,158 @@ def get_data(filters):
     
     where_clause = " AND ".join(conditions) if conditions else "1=1"
     
-    # Query to get attendance records grouped by employee and date
-    # Note: Using name_field (Employee ID from Hikvision) = Employee.name
+    # Daily first/last punch per employee, pre-aggregated from Hikvision Event
+    # Note: Hikvision Attendance Day.employee is name_field (Employee ID from Hikvision)
     query = """
         SELECT
             e.name AS employee,
             e.employee_name AS employee_name,
-            h.employee_no AS hikvision_id,
+            d.employee_no AS hikvision_id,
             e.custom_renglon,
             e.designation,
             e.department,
-            DATE(h.event_time) AS date,
-            MIN(TIME(h.event_time)) AS entry,
-            MAX(TIME(h.event_time)) AS exit_time,
-            s.start_time,
-            s.end_time
+            d.attendance_date AS date,
+            d.first_in AS entry,
+            d.last_out AS exit_time,
+            e.default_shift
         FROM 
-            `tabHikvision Event` h
+            `tabHikvision Attendance Day` d
         INNER JOIN
             `tabEmployee` e 
         ON 
-            h.name_field = e.name
-        LEFT JOIN 
-            `tabShift Type` s 
-        ON 
-            e.default_shift = s.name
+            d.employee = e.name
         WHERE
-            h.event_time IS NOT NULL
-            AND h.name_field IS NOT NULL
-            AND h.name_field != ''
-            AND {where_clause}
-        GROUP BY
-            e.name,
-            h.employee_no,
-            DATE(h.event_time)
+            {where_clause}
         ORDER BY
             e.employee_name,
-            DATE(h.event_time)
+            d.attendance_date
     """.format(where_clause=where_clause)
     
     attendance_records = frappe.db.sql(query, query_params, as_dict=1)
+    shifts = get_shift_bounds({record.default_shift for record in attendance_records})
+    
+    return process_records(attendance_records, shifts, filters)
+
+
+def get_shift_bounds(shift_names):
+    """
+    Fetch start/end of each Shift Type once.
+    
+    Args:
+        shift_names: Set of Shift Type names
+    
+    Returns:
+        Dict of shift name -> (start_time, end_time, start seconds, end seconds)
+    """
+    shift_names = [name for name in shift_names if name]
+    if not shift_names:
+        return {}
+    
+    shifts = frappe.get_all(
+        "Shift Type",
+        filters={"name": ["in", shift_names]},
+        fields=["name", "start_time", "end_time"],
+    )
+    return {
+        shift.name: (shift.start_time, shift.end_time, to_seconds(shift.start_time), to_seconds(shift.end_time))
+        for shift in shifts
+    }
+
+
+def to_seconds(value):
+    """
+    Seconds since midnight of a TIME value.
+    
+    Args:
+        value: timedelta (as returned for TIME columns) or "HH:MM:SS" string
+    
+    Returns:
+        int, or None when the value is not a plain HH:MM:SS time
+        (fractions of a second, negative or 24h+ values)
+    """
+    if isinstance(value, timedelta):
+        if value.microseconds or not timedelta(0) <= value < ONE_DAY:
+            return None
+        return value.seconds
+    
+    try:
+        parsed = datetime.strptime(str(value), "%H:%M:%S")
+    except (ValueError, TypeError):
+        return None
+    return parsed.hour * 3600 + parsed.minute * 60 + parsed.second
+
+
+def process_records(attendance_records, shifts, filters):
+    """
+    Compare entry/exit against the employee's shift and add the total row.
     
-    # Process records and calculate issues
+    All comparisons run on integer seconds since midnight.
+    
+    Args:
+        attendance_records: Rows from the attendance query
+        shifts: Result of get_shift_bounds
+        filters: Dictionary with filters
+    
+    Returns:
+        List of attendance records
+    """
     processed_records = []
-    filter_applied = filters.get("show_entries_late") or filters.get("show_leave_before")
-    total_extra_time = timedelta(0)
-    total_late_time = timedelta(0)
+    show_entries_late = filters.get("show_entries_late")
+    show_leave_before = filters.get("show_leave_before")
+    filter_applied = show_entries_late or show_leave_before
+    total_extra_seconds = 0
+    total_late_seconds = 0
+    no_shift = (None, None, None, None)
     
     for record in attendance_records:
+        entry, exit_time = record.entry, record.exit_time
+        start_time, end_time, start_seconds, end_seconds = shifts.get(record.default_shift, no_shift)
         entry_issue = ''
         exit_issue = ''
-        extra_time = timedelta(0)
-        late_time = timedelta(0)
+        extra_seconds = 0
+        late_seconds = 0
+        entry_seconds = to_seconds(entry) if entry else None
+        exit_seconds = to_seconds(exit_time) if exit_time else None
         
-        # Parse times for comparison
-        if record.entry and record.start_time:
-            try:
-                entry_time = datetime.strptime(str(record.entry), "%H:%M:%S")
-                shift_start_time = datetime.strptime(str(record.start_time), "%H:%M:%S")
-                
-                if entry_time > shift_start_time:
-                    entry_issue = "<span style='color:red'>TARDE</span>"
-                else:
-                    entry_issue = "<span style='color:green'>OK</span>"
-            except (ValueError, TypeError):
-                entry_issue = "-"
+        if entry and start_time:
+            if entry_seconds is None or start_seconds is None:
+                entry_issue = INVALID_TIME
+            elif entry_seconds > start_seconds:
+                entry_issue = ENTRY_LATE
+            else:
+                entry_issue = ON_TIME
         
-        if record.exit_time and record.end_time:
-            try:
-                exit_time = datetime.strptime(str(record.exit_time), "%H:%M:%S")
-                shift_end_time = datetime.strptime(str(record.end_time), "%H:%M:%S")
-                
-                if exit_time < shift_end_time:
-                    exit_issue = "<span style='color:red'>ANTES</span>"
-                else:
-                    exit_issue = "<span style='color:green'>OK</span>"
-            except (ValueError, TypeError):
-                exit_issue = "-"
+        if exit_time and end_time:
+            if exit_seconds is None or end_seconds is None:
+                exit_issue = INVALID_TIME
+            elif exit_seconds < end_seconds:
+                exit_issue = EXIT_EARLY
+            else:
+                exit_issue = ON_TIME
         
         # Calculate extra/late time
-        if record.entry and record.exit_time and record.start_time and record.end_time:
-            try:
-                entry_dt = datetime.strptime(str(record.entry), "%H:%M:%S")
-                exit_dt = datetime.strptime(str(record.exit_time), "%H:%M:%S")
-                shift_start_dt = datetime.strptime(str(record.start_time), "%H:%M:%S")
-                shift_end_dt = datetime.strptime(str(record.end_time), "%H:%M:%S")
-                
-                worked_hours = exit_dt - entry_dt
-                shift_duration = shift_end_dt - shift_start_dt
-                
-                if worked_hours > shift_duration:
-                    extra_time = worked_hours - shift_duration
-                    total_extra_time += extra_time
-                
-                if worked_hours < shift_duration:
-                    late_time = shift_duration - worked_hours
-                    total_late_time += late_time
-            except (ValueError, TypeError):
-                pass
+        if (
+            entry and exit_time and start_time and end_time
+            and None not in (entry_seconds, exit_seconds, start_seconds, end_seconds)
+        ):
+            worked_seconds = exit_seconds - entry_seconds
+            shift_seconds = end_seconds - start_seconds
+            
+            if worked_seconds > shift_seconds:
+                extra_seconds = worked_seconds - shift_seconds
+                total_extra_seconds += extra_seconds
+            elif worked_seconds < shift_seconds:
+                late_seconds = shift_seconds - worked_seconds
+                total_late_seconds += late_seconds
+        
+        # Apply filters if required
+        if filter_applied and not (
+            (show_entries_late and entry_issue == ENTRY_LATE)
+            or (show_leave_before and exit_issue == EXIT_EARLY)
+        ):
+            continue
         
-        # Build the processed record
-        processed_record = {
+        processed_records.append({
             "employee": record.employee,
             "employee_name": record.employee_name,
             "hikvision_id": record.hikvision_id,
@@ -206,26 +268,13 @@ def get_data(filters):
             "designation": record.designation or "",
             "department": record.department or "",
             "date": record.date,
-            "entry": record.entry,
-            "exit_time": record.exit_time,
+            "entry": entry,
+            "exit_time": exit_time,
             "entry_issue": entry_issue,
             "exit_issue": exit_issue,
-            "extra_time": format_timedelta(extra_time),
-            "late_time": format_timedelta(late_time),
-        }
-        
-        # Apply filters if required
-        if filter_applied:
-            should_add = False
-            if filters.get("show_entries_late") and "TARDE" in entry_issue:
-                should_add = True
-            if filters.get("show_leave_before") and "ANTES" in exit_issue:
-                should_add = True
-            
-            if should_add:
-                processed_records.append(processed_record)
-        else:
-            processed_records.append(processed_record)
+            "extra_time": format_seconds(extra_seconds),
+            "late_time": format_seconds(late_seconds),
+        })
     
     # Add total row at the end
     if processed_records:
@@ -241,27 +290,26 @@ def get_data(filters):
             "exit_time": "",
             "entry_issue": "",
             "exit_issue": "",
-            "extra_time": "<b>" + format_timedelta(total_extra_time) + "</b>",
-            "late_time": "<b>" + format_timedelta(total_late_time) + "</b>",
+            "extra_time": "<b>" + format_seconds(total_extra_seconds) + "</b>",
+            "late_time": "<b>" + format_seconds(total_late_seconds) + "</b>",
         })
     
     return processed_records
 
 
-def format_timedelta(td):
+def format_seconds(total_seconds):
     """
-    Format a timedelta object to HH:MM:SS string.
+    Format a number of seconds as HH:MM:SS (hours may exceed 24).
     
     Args:
-        td: timedelta object
+        total_seconds: int
     
     Returns:
         Formatted string
     """
-    if not td or td == timedelta(0):
+    if not total_seconds:
         return "00:00:00"
     
-    total_seconds = int(td.total_seconds())
     hours = total_seconds // 3600
     minutes = (total_seconds % 3600) // 60
     seconds = total_seconds % 60
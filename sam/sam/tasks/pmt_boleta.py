@@ -2,21 +2,33 @@
 
 from __future__ import annotations
 
+import time
 from datetime import date, timedelta
+from functools import lru_cache
 
 import frappe
 from frappe.utils import flt, getdate, today
 
+from sam.api.solvencia import invalidate_solvencia
+
 DISCOUNT_RATE = 0.25
 DISCOUNT_BUSINESS_DAYS = 5
 INTEREST_RATE = 0.20
 INTEREST_GRACE_DAYS = 6
 LOCKED_STATES = {"PAGADO", "ANULADA-JUZGADO"}
+UPDATE_CHUNK_SIZE = 1000
+
 
+def update_infraccion_saldos() -> dict:
+    """
+    Recalculate `infraccion_saldo` for open boletas once per day.
 
-def update_infraccion_saldos() -> None:
-    """Recalculate `infraccion_saldo` for open boletas once per day."""
+    Only rows whose stored saldo changed are written, with one `CASE` UPDATE
+    and a commit per chunk of `UPDATE_CHUNK_SIZE`. The cached solvency of
+    each affected placa is invalidated after its chunk.
+    """
 
+    started = time.monotonic()
     boletas = frappe.get_all(
         "PMT Boleta",
         filters={
@@ -24,54 +36,105 @@ def update_infraccion_saldos() -> None:
             "docstatus": ["<", 2],
             "articulo_valor": [">", 0],
         },
-        fields=["name", "articulo_valor", "fecha_infraccion"],
+        fields=["name", "articulo_valor", "fecha_infraccion", "infraccion_saldo", "vehiculo_id"],
     )
 
-    if not boletas:
+    stored = {boleta.name: boleta.infraccion_saldo for boleta in boletas}
+    placas = {boleta.name: boleta.vehiculo_id for boleta in boletas}
+    today_date = getdate(today())
+    changed = [
+        (saldo, name)
+        for saldo, name in calculate_infraccion_saldos(boletas, today_date)
+        if stored[name] is None or flt(stored[name]) != saldo
+    ]
+
+    for i in range(0, len(changed), UPDATE_CHUNK_SIZE):
+        chunk = changed[i : i + UPDATE_CHUNK_SIZE]
+        write_infraccion_saldos(chunk)
+        invalidate_solvencia({placas[name] for _, name in chunk})
+        frappe.db.commit()
+
+    stats = {
+        "scanned": len(boletas),
+        "changed": len(changed),
+        "seconds": round(time.monotonic() - started, 1),
+    }
+    frappe.logger("pmt_boleta", allow_site=True).info(f"update_infraccion_saldos: {stats}")
+    return stats
+
+
+def write_infraccion_saldos(updates: list[tuple[float, str]]) -> None:
+    """Apply `(saldo, name)` pairs with a single `CASE` UPDATE."""
+    if not updates:
         return
 
-    today_date = getdate(today())
-    updates: list[tuple[float, str]] = []
+    cases = " ".join("WHEN %s THEN %s" for _ in updates)
+    names = ", ".join(["%s"] * len(updates))
+    frappe.db.sql(
+        f"""
+        UPDATE `tabPMT Boleta`
+        SET infraccion_saldo = CASE name {cases} END
+        WHERE name IN ({names})
+        """,
+        [value for saldo, name in updates for value in (name, saldo)] + [name for _, name in updates],
+    )
 
+
+def calculate_infraccion_saldos(boletas: list, today_date: date) -> list[tuple[float, str]]:
+    """
+    `(saldo, name)` for every boleta with a saldo, in one pass. The deadlines
+    depend only on `fecha_infraccion`, so they are computed once per date.
+    """
+    updates = []
     for boleta in boletas:
         principal = flt(boleta.articulo_valor)
-        fecha_infraccion = getdate(boleta.fecha_infraccion) if boleta.fecha_infraccion else None
-        saldo = calculate_infraccion_saldo(principal, fecha_infraccion, today_date)
-        if saldo is None:
+        if not principal or not boleta.fecha_infraccion:
             continue
-        updates.append((saldo, boleta.name))
-
-    if not updates:
-        return
-
-    update_query = "UPDATE `tabPMT Boleta` SET infraccion_saldo = %s WHERE name = %s"
-    for params in updates:
-        frappe.db.sql(update_query, params)
+        updates.append((_saldo(principal, *_saldo_terms(getdate(boleta.fecha_infraccion), today_date)), boleta.name))
+    return updates
 
 
 def calculate_infraccion_saldo(principal: float, fecha_infraccion: date | None, today_date: date) -> float | None:
     if not principal or not fecha_infraccion:
         return None
+    return _saldo(principal, *_saldo_terms(fecha_infraccion, today_date))
+
 
+@lru_cache(maxsize=8192)
+def _saldo_terms(fecha_infraccion: date, today_date: date) -> tuple[bool, int | None]:
+    """`(discounted, elapsed interest days)`; elapsed is None before interest accrues."""
     discount_deadline = add_business_days(fecha_infraccion, DISCOUNT_BUSINESS_DAYS)
     accrual_start = add_business_days(fecha_infraccion, INTEREST_GRACE_DAYS)
 
-    if discount_deadline and today_date <= discount_deadline:
-        return round(principal * (1 - DISCOUNT_RATE), 2)
+    if today_date <= discount_deadline:
+        return True, None
+    if today_date <= accrual_start:
+        return False, None
+    return False, (today_date - accrual_start).days
 
-    if not accrual_start or today_date <= accrual_start:
-        return round(principal, 2)
 
-    elapsed_days = max(0, (today_date - accrual_start).days)
+def _saldo(principal: float, discounted: bool, elapsed_days: int | None) -> float:
+    if discounted:
+        return round(principal * (1 - DISCOUNT_RATE), 2)
+    if elapsed_days is None:
+        return round(principal, 2)
     interest = principal * INTEREST_RATE * (elapsed_days / 365)
     return round(principal + interest, 2)
 
 
 def add_business_days(start: date, days: int) -> date:
-    current = start
-    added = 0
-    while added < days:
-        current += timedelta(days=1)
-        if current.weekday() < 5:  # Monday-Friday
-            added += 1
-    return current
+    """`start` plus `days` business days (Monday-Friday), in closed form."""
+    if days <= 0:
+        return start
+
+    weekday = start.weekday()
+    if weekday > 4:
+        # From Saturday or Sunday the count starts on Monday, as from Friday
+        start -= timedelta(days=weekday - 4)
+        weekday = 4
+
+    weeks, rest = divmod(days, 5)
+    offset = weeks * 7 + rest
+    if weekday + rest > 4:
+        offset += 2  # Crosses a weekend
+    return start + timedelta(days=offset)
@@ -0,0 +1,83 @@
+# Copyright (c) 2026, Lidar Holding Group S. A. and Contributors
+# See license.txt
+
+from datetime import date, timedelta
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import flt
+from hypothesis import given
+from hypothesis import strategies as st
+
+from sam.sam.tasks.pmt_boleta import (
+	DISCOUNT_BUSINESS_DAYS,
+	DISCOUNT_RATE,
+	INTEREST_GRACE_DAYS,
+	INTEREST_RATE,
+	add_business_days,
+	calculate_infraccion_saldo,
+	calculate_infraccion_saldos,
+)
+
+
+def reference_add_business_days(start, days):
+	# Implementación anterior, día por día
+	current = start
+	added = 0
+	while added < days:
+		current += timedelta(days=1)
+		if current.weekday() < 5:
+			added += 1
+	return current
+
+
+def reference_saldo(principal, fecha_infraccion, today_date):
+	if not principal or not fecha_infraccion:
+		return None
+
+	discount_deadline = reference_add_business_days(fecha_infraccion, DISCOUNT_BUSINESS_DAYS)
+	accrual_start = reference_add_business_days(fecha_infraccion, INTEREST_GRACE_DAYS)
+
+	if discount_deadline and today_date <= discount_deadline:
+		return round(principal * (1 - DISCOUNT_RATE), 2)
+
+	if not accrual_start or today_date <= accrual_start:
+		return round(principal, 2)
+
+	elapsed_days = max(0, (today_date - accrual_start).days)
+	interest = principal * INTEREST_RATE * (elapsed_days / 365)
+	return round(principal + interest, 2)
+
+
+dates = st.dates(min_value=date(2000, 1, 1), max_value=date(2040, 12, 31))
+principals = st.one_of(st.just(0), st.integers(1, 100_000), st.floats(0.01, 100_000, allow_nan=False))
+
+
+class TestPMTBoletaSaldos(FrappeTestCase):
+	@given(start=dates, days=st.integers(-3, 400))
+	def test_add_business_days_matches_reference(self, start, days):
+		self.assertEqual(add_business_days(start, days), reference_add_business_days(start, days))
+
+	@given(principal=principals, fecha_infraccion=st.one_of(st.none(), dates), today_date=dates)
+	def test_saldo_matches_reference(self, principal, fecha_infraccion, today_date):
+		self.assertEqual(
+			calculate_infraccion_saldo(principal, fecha_infraccion, today_date),
+			reference_saldo(principal, fecha_infraccion, today_date),
+		)
+
+	@given(
+		rows=st.lists(st.tuples(principals, st.one_of(st.none(), dates)), max_size=50),
+		today_date=dates,
+	)
+	def test_batch_matches_reference(self, rows, today_date):
+		boletas = [
+			frappe._dict(name=f"B{i}", articulo_valor=principal, fecha_infraccion=fecha)
+			for i, (principal, fecha) in enumerate(rows)
+		]
+		expected = [
+			(saldo, boleta.name)
+			for boleta in boletas
+			if (saldo := reference_saldo(flt(boleta.articulo_valor), boleta.fecha_infraccion, today_date))
+			is not None
+		]
+		self.assertEqual(calculate_infraccion_saldos(boletas, today_date), expected)
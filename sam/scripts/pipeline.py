@@ -0,0 +1,325 @@
+"""
+Pipeline de cargas masivas de SAM.
+
+Etapas de cada carga:
+
+1. reader: produce los registros (o lotes Batch ya armados).
+2. transform: limpia un lote; corre en un pool de procesos si workers > 1
+   (debe ser una función de módulo o un partial, y no usar la base).
+3. validate: separa válidos y rechazados en el proceso principal, con
+   los catálogos precargados por el script.
+4. writer: escribe el lote con un INSERT multi-fila; si falla y hay
+   row_writer, se reintenta registro por registro.
+
+Con limit, validate recibe solo los registros necesarios para completar
+el límite, así que los contadores del script y el dead-letter no
+incluyen registros posteriores.
+
+Los rechazados y los registros que fallan al escribirse van al CSV de
+dead-letter. Cada lote termina en un commit (commit=False deja el commit
+al llamador) y el avance se reporta igual en todas las cargas: leídos,
+escritos, con error y filas/s.
+
+Uso:
+    >>> Pipeline("PMT Vehiculo", reader=rows, writer=bulk_insert_vehiculos).run()
+"""
+
+from __future__ import annotations
+
+import csv
+import multiprocessing
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from functools import partial
+from typing import Any
+
+import frappe
+
+
+@dataclass
+class Batch:
+    """Lote de registros; context viaja con el lote (p. ej. el offset en el CSV)."""
+
+    records: list
+    context: Any = None
+
+
+def batched(records: Iterable, size: int) -> Iterator[Batch]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield Batch(batch)
+            batch = []
+    if batch:
+        yield Batch(batch)
+
+
+def ordered_imap(pool, func, iterable, max_pending: int):
+    """
+    Como pool.imap (resultados en orden), pero con a lo sumo max_pending
+    lotes en vuelo: pool.imap lee toda la entrada de una vez y cargaría el
+    origen completo en memoria.
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def _apply_transform(transform, batch: Batch) -> Batch:
+    return Batch(transform(batch.records), batch.context)
+
+
+class DeadLetter:
+    """CSV de registros rechazados; el archivo se crea con el primer rechazo."""
+
+    def __init__(self, path: str | None, header: list[str] | None):
+        self.path = path
+        self.header = header
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def write(self, row: list):
+        self.count += 1
+        if not self.path:
+            return
+        if self._writer is None:
+            self._file = open(self.path, "w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+            if self.header:
+                self._writer.writerow(self.header)
+        self._writer.writerow(row)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+class Pipeline:
+    """
+    Carga masiva: reader -> transform (pool) -> validate -> writer.
+
+    Args:
+      name: nombre para el reporte de avance
+      reader: iterable de registros o de Batch
+      writer: writer(records) escribe un lote completo; si devuelve un
+        entero, es la cantidad de registros escritos
+      transform: transform(records) -> records
+      validate: validate(records) -> (válidos, filas de dead-letter)
+      row_writer: row_writer(record) para reintentar un lote fallido
+      needs_row_writer: needs_row_writer(record) -> True para escribir ese
+        registro siempre con row_writer (p. ej. para que la validación del
+        documento lo rechace con su propio error)
+      on_error: on_error(record, exc) -> fila de dead-letter; sin él, el
+        error de row_writer se propaga
+      on_commit: on_commit(batch, escritos) después de escribir cada lote
+        completo (no se llama si limit corta el lote)
+      batch_size: registros por lote (si reader no entrega Batch)
+      workers: procesos para transform
+      commit: commit por lote
+      limit: máximo de registros enviados a escribir
+      dead_letter_path, dead_letter_header: CSV de rechazados
+      progress_every: reporta avance cada tantos registros leídos
+      verbose: imprime el avance
+    """
+
+    def __init__(
+        self,
+        name: str,
+        reader: Iterable,
+        writer: Callable[[list], Any] | None = None,
+        transform: Callable[[list], list] | None = None,
+        validate: Callable[[list], tuple[list, list]] | None = None,
+        row_writer: Callable[[Any], Any] | None = None,
+        needs_row_writer: Callable[[Any], bool] | None = None,
+        on_error: Callable[[Any, Exception], list] | None = None,
+        on_commit: Callable[[Batch, int], Any] | None = None,
+        batch_size: int = 1000,
+        workers: int = 1,
+        commit: bool = True,
+        limit: int | None = None,
+        dead_letter_path: str | None = None,
+        dead_letter_header: list[str] | None = None,
+        progress_every: int | None = 10000,
+        verbose: bool = True,
+    ):
+        if not writer and not row_writer:
+            raise ValueError("Pipeline necesita writer o row_writer")
+        if writer and row_writer and not commit:
+            # El reintento fila por fila hace rollback del lote fallido
+            raise ValueError("row_writer como respaldo de writer requiere commit=True")
+        if needs_row_writer and not row_writer:
+            raise ValueError("needs_row_writer requiere row_writer")
+
+        self.name = name
+        self.reader = reader
+        self.writer = writer
+        self.transform = transform
+        self.validate = validate
+        self.row_writer = row_writer
+        self.needs_row_writer = needs_row_writer
+        self.on_error = on_error
+        self.on_commit = on_commit
+        self.batch_size = max(int(batch_size or 1), 1)
+        self.workers = max(int(workers or 1), 1)
+        self.commit = commit
+        self.limit = int(limit) if limit else None
+        self.dead_letter = DeadLetter(dead_letter_path, dead_letter_header)
+        self.progress_every = progress_every
+        self.verbose = verbose
+
+        self.read = 0
+        self.written = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def _batches(self) -> Iterator[Batch]:
+        pending = []
+        for item in self.reader:
+            if isinstance(item, Batch):
+                yield item
+                continue
+            pending.append(item)
+            if len(pending) >= self.batch_size:
+                yield Batch(pending)
+                pending = []
+        if pending:
+            yield Batch(pending)
+
+    def _write(self, records: list) -> int:
+        if not records:
+            return 0
+        if not self.writer:
+            return self._write_rows(records)
+
+        single = []
+        if self.needs_row_writer:
+            single = [record for record in records if self.needs_row_writer(record)]
+            if single:
+                records = [record for record in records if not self.needs_row_writer(record)]
+
+        written = 0
+        if records:
+            try:
+                bulk_written = self.writer(records)
+                if self.commit:
+                    frappe.db.commit()
+                written += len(records) if bulk_written is None else bulk_written
+            except Exception:
+                if not self.row_writer:
+                    raise
+                frappe.db.rollback()
+                single = records + single
+        return written + self._write_rows(single)
+
+    def _write_rows(self, records: list) -> int:
+        written = 0
+        for record in records:
+            try:
+                self.row_writer(record)
+                if self.commit:
+                    frappe.db.commit()
+                written += 1
+            except Exception as e:
+                if not self.on_error:
+                    raise
+                frappe.db.rollback()
+                self.failed += 1
+                self.dead_letter.write(self.on_error(record, e))
+        return written
+
+    def _limit_reached(self) -> bool:
+        return bool(self.limit) and self.written >= self.limit
+
+    def _process(self, records: list) -> tuple[int, bool]:
+        """
+        Valida y escribe un lote. Con limit se toman a lo sumo tantos
+        registros como faltan para el límite, hasta completarlo o terminar
+        el lote.
+
+        Returns:
+          (escritos, True si se procesó el lote completo)
+        """
+        written = 0
+        pos = 0
+        while pos < len(records) and not self._limit_reached():
+            chunk = records[pos : pos + self.limit - self.written] if self.limit else records[pos:]
+            pos += len(chunk)
+            self.read += len(chunk)
+            if self.validate:
+                valid, rejected = self.validate(chunk)
+                for row in rejected:
+                    self.dead_letter.write(row)
+                self.rejected += len(rejected)
+            else:
+                valid = chunk
+
+            chunk_written = self._write(valid)
+            written += chunk_written
+            self.written += chunk_written
+        return written, pos >= len(records)
+
+    def _report(self, started: float, final: bool = False):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        prefix = f"{self.name} terminado" if final else self.name
+        print(
+            f"{prefix}: {self.read:,} leídos | {self.written:,} escritos | "
+            f"{self.rejected + self.failed:,} con error | {self.read / elapsed:,.0f} filas/s"
+        )
+
+    def run(self) -> dict:
+        """
+        Ejecuta la carga.
+
+        Returns:
+          dict: read, written, rejected, failed, seconds, rows_per_second y
+          dead_letter (ruta del CSV, o None si no hubo errores)
+        """
+        started = time.monotonic()
+        next_report = self.progress_every or 0
+        pool = multiprocessing.Pool(self.workers) if self.transform and self.workers > 1 else None
+        try:
+            batches = self._batches()
+            if self.transform:
+                transform = partial(_apply_transform, self.transform)
+                if pool:
+                    batches = ordered_imap(pool, transform, batches, self.workers * 2)
+                else:
+                    batches = map(transform, batches)
+
+            for batch in batches:
+                written, complete = self._process(batch.records)
+                if self.on_commit and complete:
+                    self.on_commit(batch, written)
+
+                if self.verbose and (not self.progress_every or self.read >= next_report):
+                    self._report(started)
+                    next_report = self.read + (self.progress_every or 0)
+
+                if self._limit_reached():
+                    break
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+            self.dead_letter.close()
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        if self.verbose:
+            self._report(started, final=True)
+        return {
+            "read": self.read,
+            "written": self.written,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "seconds": round(elapsed, 1),
+            "rows_per_second": round(self.read / elapsed),
+            "dead_letter": self.dead_letter.path if self.dead_letter.count else None,
+        }
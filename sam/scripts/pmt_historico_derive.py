@@ -0,0 +1,636 @@
+"""
+PMT Historico: campos derivados
+
+Reglas compartidas por la importación (pmt_historico_import) y por
+rederive:
+
+- idtipolicencia, idsituacion, idmarca, status: código -> etiqueta
+- tipo_placa, tipo_placa_id: desde idtipovehiculo
+- placa_unificada: tipo_placa_id + placa
+- articulo_valido: blegal resuelto contra los códigos de PMT Articulo
+- consolidado: los demás campos concatenados con " | "
+
+La importación calcula todo al transformar cada fila. rederive recorre
+la tabla por bloques y reescribe, con un UPDATE por bloque, solo las
+filas cuyo valor derivado ya no corresponde a sus columnas de origen
+(p. ej. después de editar blegal o de agregar un PMT Articulo).
+
+Uso:
+    bench --site sam.mdf.lan pmt-historico-rederive
+"""
+
+from __future__ import annotations
+
+import time
+from datetime import timedelta
+from functools import cache
+
+import frappe
+from frappe.utils import cint
+
+from sam.scripts.streaming import iter_chunks
+
+DOCTYPE = "PMT Historico"
+REDERIVE_CHUNK_SIZE = 5000
+LAYOUT_FIELDTYPES = {"Section Break", "Column Break", "Tab Break"}
+
+TIPO_PLACA_MAP = {
+    0: "Nulo",
+    1: "PARTICULAR",
+    2: "COMERCIAL",
+    3: "AUTOMOVIL",
+    4: "BUS",
+    5: "CAMIONETILLA",
+    6: "MOTO",
+    7: "CAMION",
+    8: "ALQUILER",
+    9: "OFICIALES",
+    10: "U Bus Urbano",
+    11: "APACHE",
+    12: "EXTRANJERO",
+}
+
+TIPO_PLACA_ID_MAP = {
+    0: "N",
+    1: "P",
+    2: "C",
+    3: "P",
+    4: "BUS",
+    5: "P",
+    6: "M",
+    7: "C",
+    8: "A",
+    9: "O",
+    10: "U",
+    11: "M",
+    12: "N",
+}
+
+TIPO_LICENCIA_MAP = {
+    1: "C",
+    2: "B",
+    3: "A",
+    4: "M",
+    5: "E",
+    6: "NINGUNA",
+    7: "NULO",
+    8: "D",
+}
+
+TIPO_SITUACION_MAP = {
+    1: "CONDUCTOR AUSENTE",
+    2: "CONDUCTOR SE NEGÓ A FIRMAR",
+    3: "PILOTO A LA FUGA",
+    4: "NINGUNO DE LOS ANTERIORES",
+    5: "FIRMO",
+    6: "NULL",
+}
+
+TIPO_MARCA_MAP = {
+    0: "",
+    1: "TOYOTA",
+    2: "MAZDA",
+    3: "BLUE BIRD",
+    4: "NISSAN",
+    5: "INTERNACIONAL",
+    6: "TORRENT",
+    7: "ISUZU",
+    8: "MITSUBISHI",
+    9: "DATSUN",
+    10: "ITALIKA",
+    11: "BAJAJ",
+    12: "HONDA",
+    13: "PEUGEOT",
+    14: "SUZUKI",
+    15: "BARUCHI",
+    16: "YUMBO",
+    17: "CHEVROLET",
+    18: "HINO",
+    19: "VOLKSWAGEN",
+    20: "MERCEDES",
+    21: "MERCEDEZ BENZ",
+    22: "GMC",
+    23: "KYNLON",
+    24: "FORD",
+    25: "JEEP",
+    26: "MOVESA",
+    27: "QINGQI",
+    28: "HUMMER",
+    29: "MCI",
+    30: "GENESIS",
+    31: "KENWORTH",
+    32: "HYUNDAI",
+    33: "FREEDOM",
+    34: "KAWASAKI",
+    35: "LUS APACHE",
+    36: "LEXUS",
+    37: "SUBARU",
+    38: "YAMAHA",
+    39: "TVS",
+    40: "CITROEN",
+    41: "KIA",
+    42: "DOBLE",
+    43: "NINGUNA",
+    44: "LAND ROVER",
+    45: "MOVESA",
+    46: "EVEREST",
+    47: "RAIBAR",
+    48: "TOUGH",
+    49: "BMW",
+    50: "JAGUAR",
+    51: "ASIA HERO",
+    52: "MAZDA PROTEGE",
+    53: "PORSCHE",
+    54: "DODGE",
+    55: "LUFAN",
+    56: "FORTE",
+    57: "SHINERAY",
+    58: "DOGE",
+    59: "PLYMOUTH",
+    60: "TVS",
+    61: "CHEVROLET CELTA",
+    62: "VOLVO",
+    63: "JIALING",
+    64: "MOTOLANSA",
+    65: "KEEWAY",
+    66: "WOLKWAGEN",
+    67: "ACURA",
+    68: "OM",
+    69: "TVS",
+    70: "FASTRAN",
+    71: "CHEVY",
+    72: "CHRYSLER",
+    73: "GEO",
+    74: "REBELLIAN",
+    75: "LONCIN",
+    76: "JINBE",
+    77: "SCION",
+    78: "PONTIAC",
+    79: "FREIGHTLINER",
+    80: "TOYOTA RUNER",
+    81: "DESTINY",
+    82: "PULSAR",
+    83: "LIBERTY LIMITED ",
+    84: "VENTO",
+    85: "DAEWOO",
+    86: "CHANA",
+    87: "SRS",
+    88: "DFSK",
+    89: "DAIFO",
+    90: "UM",
+    91: "PEGASO",
+    92: "RENAULT",
+    93: "FIAT",
+    94: "FESTIVA",
+    95: "WUYANS",
+    96: "SHYNRAY",
+    97: "SPORT",
+    98: "HYOSUNG",
+    99: "RENAULT",
+    100: "LAND ROVER",
+    101: "DOD GEGRAND",
+    102: "CHERRY",
+    103: "JETTA",
+    104: "YALING",
+    105: "DISCOVER",
+    106: "GTR",
+    107: "SAMSUNG",
+    108: "DENA",
+    109: "AUDI",
+    110: "GEAT",
+    111: "SERPENTO",
+    112: "SEAT",
+    113: "CMC",
+    114: "JMS",
+    115: "BYD",
+    116: "CHANGAN",
+    117: "BTP",
+    118: "OVION",
+    119: "SKYGO",
+    120: "SANYA",
+    121: "ASIA",
+    122: "GUILLER",
+    123: "AVANTI",
+    124: "SKODA",
+    125: "BUICK",
+    126: "MAGNUN",
+    127: "ROSTR Z4",
+    128: "COROLLA",
+    129: "RSM",
+    130: "SANAYONA",
+    131: "SYM",
+    132: "DRAPER",
+    133: "GRAND CARAVAN",
+    134: "ASIA",
+    135: "NEON",
+    136: "TOYOTA HILUX",
+    137: "UM",
+    138: "WHITE",
+    139: "MAGIC",
+    140: "COLT",
+    141: "HILUX",
+    142: "BOXER",
+    143: "OPEL",
+    144: "ECLIPSE",
+    145: "JUMBO",
+    146: "DISCOVERI",
+    147: "PLATINA",
+    148: "ZX",
+    149: "HONLEI",
+    150: "HAFEI",
+    151: "AN",
+    152: "CUSTOM",
+    153: "DAIHATSU",
+    154: "HARLEY DAVISON",
+    155: "MTM",
+    156: "KYNCO",
+    157: "SUBURBAN",
+    158: "SUKIDA",
+    159: "TIMBER",
+    160: "AUTOCAR",
+    161: "MACK",
+    162: "ADMIRAL",
+    163: "DINA",
+    164: "CAYEN TURBO",
+    165: "RANGER ROVER",
+    166: "LIYAN",
+    167: "LAAAKJB",
+    168: "WULING",
+    169: "AHM",
+    170: "ROSMAN",
+    171: "JAC",
+    172: "DONG FENG",
+    173: "PATHFINDER",
+    174: "STERLING",
+    175: "KINROAD",
+    176: "LIFAN",
+    177: "VO TRUCKS",
+    178: "LANCER",
+    179: "KEIRO",
+    180: "UD TRUCKS",
+    181: "ALLAMERICAN",
+    182: "GREAT WALL",
+    183: "HERO",
+    184: "ROKETA",
+    185: "DAYUN",
+    186: "JMC",
+    187: "KTM",
+    188: "FIAL",
+    189: "MACK",
+    190: "ROVER",
+    191: "ROSMO",
+    192: "RENAUTO",
+    193: "MAHINDRA",
+    194: "ALFA ROMEO",
+    195: "BLEIZER",
+    196: "KINOTIC",
+    197: "HIUASHA",
+    198: "MARCK",
+    199: "TRAXX",
+    200: "GOLD CROWN",
+    201: "MAGNATIC",
+    202: "FAWJIABAO",
+    203: "EAGLE",
+    204: "NO VISIBLE",
+    205: "AUTO MOSA",
+    206: "MINICOPER",
+    207: "CANTER",
+    208: "MEGANE",
+    209: "SANG YONG",
+    210: "GOL",
+    211: "RINNO",
+    212: "LANCRUSER",
+    213: "BASHAN",
+    214: "TACOMA",
+    215: "CARENS",
+    216: "INFINITI",
+    217: "DMG",
+    218: "DAELIM",
+    219: "WOYANG",
+    220: "POWER",
+    221: "RINROAD",
+    222: "SANYANG",
+    223: "TANK",
+    224: "WHITE VOLVO GM",
+    225: "TERRACAN",
+    226: "HAOJIN",
+    227: "LIM",
+    228: "SMART",
+    229: "HONCIN",
+    230: "ROVER",
+    231: "MASERATI",
+    232: "JAM",
+    233: "MAREN",
+    234: "UN MAX 125",
+    235: "POOUGHAUT",
+    236: "MERCURY",
+    237: "DUTLANDER",
+    238: "GEELY",
+    239: "RESENT",
+    240: "JIAPENG",
+    241: "DAKAR",
+    242: "MEGANE",
+    243: "ZONGSHEN",
+    244: "ESCALADE",
+    245: "RUNNER",
+    246: "SANLG",
+    247: "SUNNY",
+    248: "VORTEX",
+    249: "APACHE",
+    250: "TRIUMPH",
+    251: "FLAME",
+    252: "DUSTER",
+    253: "DAYLIU",
+    254: "SIN MARCA",
+    255: "LANGOR",
+    256: "DUSTER",
+    257: "SEPHIA",
+    258: "CITY",
+    259: "NAVARRA",
+    260: "AVEO",
+    261: "CEBELLEAUS",
+    262: "SUKIDA",
+    263: "INTER",
+    264: "MOTOGO",
+    265: "FIRE",
+    266: "COOPER",
+    267: "FAW",
+    268: "SANLG",
+    269: "HALIKA",
+    270: "DAYUN",
+    271: "FYM",
+    272: "HAOJUE",
+    273: "RENNO",
+    274: "VESPA",
+    275: "SACHS MOPEDS",
+    276: "HUNK",
+    277: "PRINZ",
+    278: "KUMOTO",
+    279: "RACING",
+    280: "FENGCHI",
+    281: "MAX",
+    282: "VIKING",
+    283: "PETERBILT",
+    284: "SENKE",
+    285: "ATOS",
+    286: "APRILIA",
+    287: "BENELLI",
+    288: "FOTON",
+    289: "Iveco",
+    290: "UNICO",
+    291: "Cobra",
+    292: "SATURN",
+    293: "APOLO",
+    294: "MRT",
+    295: "SINSKI",
+    296: "MTX",
+    297: "AG",
+    298: "CFMOTO",
+    299: "FOX",
+    300: "KING LONG",
+    301: "DUCATI",
+    302: "MASESA",
+    303: "HILINER",
+    304: "HYUNDAI",
+    305: "OCTAVIA",
+    306: "MONTERO",
+    307: "XITARGA",
+    308: "ENPIRE",
+    309: "YITARGA",
+    310: "VAYU",
+    311: "OSBORNE",
+    312: "AKT",
+    313: "FUSO",
+    314: "NORTEX",
+    315: "CNJ",
+    316: "FT",
+    317: "TMR",
+    318: "NAVI",
+    319: "RAM",
+    320: "COMMER",
+    321: "BAJAJ PULSAR",
+    322: "VENUS",
+    323: "FORWARD",
+    324: "MOTO GUZZI",
+    325: "JMT",
+    326: "DIVISA",
+    327: "HUSQUEARNA",
+    328: "HAULOE",
+    329: "WUYANO",
+    330: "HAUJE",
+    331: "GOLDEN",
+    332: "AMAROK",
+    333: "THOMAS",
+    334: "MIRAGE",
+    335: "JINCHENG",
+    336: "FORLAND",
+    337: "NIPPONIA",
+    338: "SEPON",
+    339: "SUNRA",
+    340: "TESLA",
+    341: "CRAZY ",
+    342: "scania",
+    343: "HURRICANE",
+    344: "YARIS",
+    345: "PALETA",
+    346: "CANGHE",
+    347: "PULSAR",
+}
+
+TIPO_STATUS_MAP = {
+    1: "PENDIENTE-PAGO",
+    2: "PAGADA",
+}
+
+
+# Campos de código: mapa y valor por defecto
+CODE_FIELDS = {
+    "idtipolicencia": (TIPO_LICENCIA_MAP, "NULO"),
+    "idsituacion": (TIPO_SITUACION_MAP, "NULL"),
+    "idmarca": (TIPO_MARCA_MAP, ""),
+    "status": (TIPO_STATUS_MAP, ""),
+}
+
+DERIVED_FIELDS = [
+    *CODE_FIELDS,
+    "tipo_placa",
+    "tipo_placa_id",
+    "placa_unificada",
+    "articulo_valido",
+    "consolidado",
+]
+
+SPECIAL_MAP = {
+    "181.14": "181.14a",
+    "180.2": "180.2a",
+}
+
+
+def map_code(value, mapping: dict, default: str) -> str:
+    if value is None:
+        return default
+    if isinstance(value, int):
+        return mapping.get(value, default)
+    if isinstance(value, str):
+        cleaned = value.strip()
+        if cleaned == "":
+            return default
+        if cleaned.isdigit():
+            return mapping.get(int(cleaned), default)
+        return cleaned
+    return default
+
+
+def derive_code(fieldname: str, value):
+    """
+    Etiqueta de un campo de código ya guardado: solo se mapean los códigos
+    numéricos y los vacíos; una etiqueta se deja tal cual.
+    """
+    if isinstance(value, str) and value.strip() and not value.strip().isdigit():
+        return value
+    return map_code(value, *CODE_FIELDS[fieldname])
+
+
+def normalize_codigo(value: str) -> str:
+    value = (value or "").strip()
+    if not value:
+        return ""
+    cleaned = value.replace("-", ".").replace(" ", "").lower()
+    parts = cleaned.split(".")
+    normalized_parts: list[str] = []
+    for part in parts:
+        if part.isdigit():
+            # remove leading zeros from purely numeric segments
+            normalized_parts.append(str(int(part)))
+        else:
+            normalized_parts.append(part)
+    return ".".join(normalized_parts)
+
+
+def load_articulo_codigos() -> list[str]:
+    return [c for c in frappe.get_all("PMT Articulo", pluck="articulo_codigo") if c]
+
+
+def make_articulo_resolver(codigos: list[str]):
+    """
+    Devuelve resolve(blegal) -> articulo_codigo ("" si no corresponde a
+    ninguno), con un cache por valor distinto de blegal.
+
+    Orden de búsqueda: código exacto, sin distinguir mayúsculas, y luego
+    el código normalizado (SPECIAL_MAP primero).
+    """
+    codigos = [c for c in codigos if c]
+    codigo_set = set(codigos)
+    codigo_lower_map: dict[str, str | None] = {}
+    for codigo in codigos:
+        key = codigo.lower()
+        if key in codigo_lower_map:
+            codigo_lower_map[key] = None
+        else:
+            codigo_lower_map[key] = codigo
+
+    @cache
+    def resolve(raw: str) -> str:
+        raw = raw.strip()
+        if raw in codigo_set:
+            return raw
+        mapped = codigo_lower_map.get(raw.lower())
+        if mapped:
+            return mapped
+
+        normalized = normalize_codigo(raw)
+        special = SPECIAL_MAP.get(normalized)
+        if special:
+            if special in codigo_set:
+                return special
+            return codigo_lower_map.get(special.lower()) or ""
+        if normalized in codigo_set:
+            return normalized
+        return codigo_lower_map.get(normalized) or ""
+
+    return resolve
+
+
+def sql_text(value) -> str:
+    """Igual que COALESCE(CAST(value AS CHAR), '') en MariaDB."""
+    if value is None:
+        return ""
+    if isinstance(value, timedelta):
+        seconds = int(value.total_seconds())
+        return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return str(value)
+
+
+def make_consolidado(values) -> str:
+    return " | ".join(sql_text(value) for value in values)
+
+
+def get_consolidado_fields() -> list[str]:
+    """Campos de PMT Historico que forman consolidado, en el orden del DocType."""
+    return [
+        f.fieldname
+        for f in frappe.get_meta(DOCTYPE).fields
+        if f.fieldname and f.fieldname != "consolidado" and f.fieldtype not in LAYOUT_FIELDTYPES
+    ]
+
+
+def derive_values(row: dict, resolve_articulo, consolidado_fields: list[str]) -> dict:
+    """Valores de DERIVED_FIELDS para una fila de PMT Historico tal como está guardada."""
+    derived = {fieldname: derive_code(fieldname, row.get(fieldname)) for fieldname in CODE_FIELDS}
+
+    idtipovehiculo = cint(row.get("idtipovehiculo"))
+    derived["tipo_placa"] = TIPO_PLACA_MAP.get(idtipovehiculo, "Nulo")
+    derived["tipo_placa_id"] = TIPO_PLACA_ID_MAP.get(idtipovehiculo, "N")
+    derived["placa_unificada"] = derived["tipo_placa_id"] + (row.get("placa") or "")
+
+    blegal = (row.get("blegal") or "").strip()
+    derived["articulo_valido"] = resolve_articulo(blegal) if blegal else row.get("articulo_valido")
+
+    merged = {**row, **derived}
+    derived["consolidado"] = make_consolidado(merged.get(fieldname) for fieldname in consolidado_fields)
+    return derived
+
+
+def rederive(chunk_size: int = REDERIVE_CHUNK_SIZE, verbose: bool = True) -> dict:
+    """
+    Recalcula los campos derivados de PMT Historico y escribe solo las
+    filas que cambiaron, todos sus campos derivados en un solo UPDATE por
+    bloque y un commit por bloque.
+
+    Args:
+      chunk_size: filas leídas por bloque (paginación por name)
+      verbose: imprime el avance
+
+    Returns:
+      dict: filas revisadas, filas actualizadas y segundos
+    """
+    if not frappe.db.exists("DocType", DOCTYPE):
+        return {"scanned": 0, "changed": 0, "seconds": 0}
+
+    consolidado_fields = get_consolidado_fields()
+    columns = ["name", *consolidado_fields, "consolidado"]
+    resolve_articulo = make_articulo_resolver(load_articulo_codigos())
+
+    started = time.monotonic()
+    scanned = changed = 0
+    for rows in iter_chunks(DOCTYPE, columns, chunk_size=chunk_size):
+        rows = [dict(zip(columns, row, strict=True)) for row in rows]
+        updates = {}
+        for row in rows:
+            derived = derive_values(row, resolve_articulo, consolidado_fields)
+            if any(row.get(fieldname) != value for fieldname, value in derived.items()):
+                updates[row["name"]] = derived
+
+        if updates:
+            frappe.db.bulk_update(DOCTYPE, updates, chunk_size=500, update_modified=False)
+        frappe.db.commit()
+
+        scanned += len(rows)
+        changed += len(updates)
+        if verbose:
+            print(f"{scanned:,} filas revisadas | {changed:,} actualizadas")
+
+    seconds = round(time.monotonic() - started, 1)
+    if verbose:
+        print(f"Rederive terminado: {changed:,} de {scanned:,} filas actualizadas en {seconds}s")
+    return {"scanned": scanned, "changed": changed, "seconds": seconds}
@@ -1,13 +1,30 @@
 from __future__ import annotations
 
+import codecs
 import csv
+import hashlib
+import json
+import os
 import re
 import unicodedata
 from datetime import datetime
+from functools import partial
+from operator import itemgetter
 from typing import Iterable
 
 import frappe
 
+from sam.scripts.pmt_historico_derive import (
+    CODE_FIELDS,
+    TIPO_PLACA_ID_MAP,
+    TIPO_PLACA_MAP,
+    load_articulo_codigos,
+    make_articulo_resolver,
+    make_consolidado,
+    map_code,
+)
+from sam.scripts.pipeline import Batch, Pipeline
+
 
 CSV_PATH = "/home/frappe/frappe-bench/sites/sam.mdf.lan/public/files/PMT Historico.csv"
 
@@ -79,473 +96,7 @@ FIELDS = [
     {"fieldname": "consolidado", "label": "Consolidado", "fieldtype": "Data"},
 ]
 
-TIPO_PLACA_MAP = {
-    0: "Nulo",
-    1: "PARTICULAR",
-    2: "COMERCIAL",
-    3: "AUTOMOVIL",
-    4: "BUS",
-    5: "CAMIONETILLA",
-    6: "MOTO",
-    7: "CAMION",
-    8: "ALQUILER",
-    9: "OFICIALES",
-    10: "U Bus Urbano",
-    11: "APACHE",
-    12: "EXTRANJERO",
-}
-
-TIPO_PLACA_ID_MAP = {
-    0: "N",
-    1: "P",
-    2: "C",
-    3: "P",
-    4: "BUS",
-    5: "P",
-    6: "M",
-    7: "C",
-    8: "A",
-    9: "O",
-    10: "U",
-    11: "M",
-    12: "N",
-}
-
-TIPO_LICENCIA_MAP = {
-    1: "C",
-    2: "B",
-    3: "A",
-    4: "M",
-    5: "E",
-    6: "NINGUNA",
-    7: "NULO",
-    8: "D",
-}
-
-TIPO_SITUACION_MAP = {
-    1: "CONDUCTOR AUSENTE",
-    2: "CONDUCTOR SE NEGÓ A FIRMAR",
-    3: "PILOTO A LA FUGA",
-    4: "NINGUNO DE LOS ANTERIORES",
-    5: "FIRMO",
-    6: "NULL",
-}
-
-TIPO_MARCA_MAP = {
-    0: "",
-    1: "TOYOTA",
-    2: "MAZDA",
-    3: "BLUE BIRD",
-    4: "NISSAN",
-    5: "INTERNACIONAL",
-    6: "TORRENT",
-    7: "ISUZU",
-    8: "MITSUBISHI",
-    9: "DATSUN",
-    10: "ITALIKA",
-    11: "BAJAJ",
-    12: "HONDA",
-    13: "PEUGEOT",
-    14: "SUZUKI",
-    15: "BARUCHI",
-    16: "YUMBO",
-    17: "CHEVROLET",
-    18: "HINO",
-    19: "VOLKSWAGEN",
-    20: "MERCEDES",
-    21: "MERCEDEZ BENZ",
-    22: "GMC",
-    23: "KYNLON",
-    24: "FORD",
-    25: "JEEP",
-    26: "MOVESA",
-    27: "QINGQI",
-    28: "HUMMER",
-    29: "MCI",
-    30: "GENESIS",
-    31: "KENWORTH",
-    32: "HYUNDAI",
-    33: "FREEDOM",
-    34: "KAWASAKI",
-    35: "LUS APACHE",
-    36: "LEXUS",
-    37: "SUBARU",
-    38: "YAMAHA",
-    39: "TVS",
-    40: "CITROEN",
-    41: "KIA",
-    42: "DOBLE",
-    43: "NINGUNA",
-    44: "LAND ROVER",
-    45: "MOVESA",
-    46: "EVEREST",
-    47: "RAIBAR",
-    48: "TOUGH",
-    49: "BMW",
-    50: "JAGUAR",
-    51: "ASIA HERO",
-    52: "MAZDA PROTEGE",
-    53: "PORSCHE",
-    54: "DODGE",
-    55: "LUFAN",
-    56: "FORTE",
-    57: "SHINERAY",
-    58: "DOGE",
-    59: "PLYMOUTH",
-    60: "TVS",
-    61: "CHEVROLET CELTA",
-    62: "VOLVO",
-    63: "JIALING",
-    64: "MOTOLANSA",
-    65: "KEEWAY",
-    66: "WOLKWAGEN",
-    67: "ACURA",
-    68: "OM",
-    69: "TVS",
-    70: "FASTRAN",
-    71: "CHEVY",
-    72: "CHRYSLER",
-    73: "GEO",
-    74: "REBELLIAN",
-    75: "LONCIN",
-    76: "JINBE",
-    77: "SCION",
-    78: "PONTIAC",
-    79: "FREIGHTLINER",
-    80: "TOYOTA RUNER",
-    81: "DESTINY",
-    82: "PULSAR",
-    83: "LIBERTY LIMITED ",
-    84: "VENTO",
-    85: "DAEWOO",
-    86: "CHANA",
-    87: "SRS",
-    88: "DFSK",
-    89: "DAIFO",
-    90: "UM",
-    91: "PEGASO",
-    92: "RENAULT",
-    93: "FIAT",
-    94: "FESTIVA",
-    95: "WUYANS",
-    96: "SHYNRAY",
-    97: "SPORT",
-    98: "HYOSUNG",
-    99: "RENAULT",
-    100: "LAND ROVER",
-    101: "DOD GEGRAND",
-    102: "CHERRY",
-    103: "JETTA",
-    104: "YALING",
-    105: "DISCOVER",
-    106: "GTR",
-    107: "SAMSUNG",
-    108: "DENA",
-    109: "AUDI",
-    110: "GEAT",
-    111: "SERPENTO",
-    112: "SEAT",
-    113: "CMC",
-    114: "JMS",
-    115: "BYD",
-    116: "CHANGAN",
-    117: "BTP",
-    118: "OVION",
-    119: "SKYGO",
-    120: "SANYA",
-    121: "ASIA",
-    122: "GUILLER",
-    123: "AVANTI",
-    124: "SKODA",
-    125: "BUICK",
-    126: "MAGNUN",
-    127: "ROSTR Z4",
-    128: "COROLLA",
-    129: "RSM",
-    130: "SANAYONA",
-    131: "SYM",
-    132: "DRAPER",
-    133: "GRAND CARAVAN",
-    134: "ASIA",
-    135: "NEON",
-    136: "TOYOTA HILUX",
-    137: "UM",
-    138: "WHITE",
-    139: "MAGIC",
-    140: "COLT",
-    141: "HILUX",
-    142: "BOXER",
-    143: "OPEL",
-    144: "ECLIPSE",
-    145: "JUMBO",
-    146: "DISCOVERI",
-    147: "PLATINA",
-    148: "ZX",
-    149: "HONLEI",
-    150: "HAFEI",
-    151: "AN",
-    152: "CUSTOM",
-    153: "DAIHATSU",
-    154: "HARLEY DAVISON",
-    155: "MTM",
-    156: "KYNCO",
-    157: "SUBURBAN",
-    158: "SUKIDA",
-    159: "TIMBER",
-    160: "AUTOCAR",
-    161: "MACK",
-    162: "ADMIRAL",
-    163: "DINA",
-    164: "CAYEN TURBO",
-    165: "RANGER ROVER",
-    166: "LIYAN",
-    167: "LAAAKJB",
-    168: "WULING",
-    169: "AHM",
-    170: "ROSMAN",
-    171: "JAC",
-    172: "DONG FENG",
-    173: "PATHFINDER",
-    174: "STERLING",
-    175: "KINROAD",
-    176: "LIFAN",
-    177: "VO TRUCKS",
-    178: "LANCER",
-    179: "KEIRO",
-    180: "UD TRUCKS",
-    181: "ALLAMERICAN",
-    182: "GREAT WALL",
-    183: "HERO",
-    184: "ROKETA",
-    185: "DAYUN",
-    186: "JMC",
-    187: "KTM",
-    188: "FIAL",
-    189: "MACK",
-    190: "ROVER",
-    191: "ROSMO",
-    192: "RENAUTO",
-    193: "MAHINDRA",
-    194: "ALFA ROMEO",
-    195: "BLEIZER",
-    196: "KINOTIC",
-    197: "HIUASHA",
-    198: "MARCK",
-    199: "TRAXX",
-    200: "GOLD CROWN",
-    201: "MAGNATIC",
-    202: "FAWJIABAO",
-    203: "EAGLE",
-    204: "NO VISIBLE",
-    205: "AUTO MOSA",
-    206: "MINICOPER",
-    207: "CANTER",
-    208: "MEGANE",
-    209: "SANG YONG",
-    210: "GOL",
-    211: "RINNO",
-    212: "LANCRUSER",
-    213: "BASHAN",
-    214: "TACOMA",
-    215: "CARENS",
-    216: "INFINITI",
-    217: "DMG",
-    218: "DAELIM",
-    219: "WOYANG",
-    220: "POWER",
-    221: "RINROAD",
-    222: "SANYANG",
-    223: "TANK",
-    224: "WHITE VOLVO GM",
-    225: "TERRACAN",
-    226: "HAOJIN",
-    227: "LIM",
-    228: "SMART",
-    229: "HONCIN",
-    230: "ROVER",
-    231: "MASERATI",
-    232: "JAM",
-    233: "MAREN",
-    234: "UN MAX 125",
-    235: "POOUGHAUT",
-    236: "MERCURY",
-    237: "DUTLANDER",
-    238: "GEELY",
-    239: "RESENT",
-    240: "JIAPENG",
-    241: "DAKAR",
-    242: "MEGANE",
-    243: "ZONGSHEN",
-    244: "ESCALADE",
-    245: "RUNNER",
-    246: "SANLG",
-    247: "SUNNY",
-    248: "VORTEX",
-    249: "APACHE",
-    250: "TRIUMPH",
-    251: "FLAME",
-    252: "DUSTER",
-    253: "DAYLIU",
-    254: "SIN MARCA",
-    255: "LANGOR",
-    256: "DUSTER",
-    257: "SEPHIA",
-    258: "CITY",
-    259: "NAVARRA",
-    260: "AVEO",
-    261: "CEBELLEAUS",
-    262: "SUKIDA",
-    263: "INTER",
-    264: "MOTOGO",
-    265: "FIRE",
-    266: "COOPER",
-    267: "FAW",
-    268: "SANLG",
-    269: "HALIKA",
-    270: "DAYUN",
-    271: "FYM",
-    272: "HAOJUE",
-    273: "RENNO",
-    274: "VESPA",
-    275: "SACHS MOPEDS",
-    276: "HUNK",
-    277: "PRINZ",
-    278: "KUMOTO",
-    279: "RACING",
-    280: "FENGCHI",
-    281: "MAX",
-    282: "VIKING",
-    283: "PETERBILT",
-    284: "SENKE",
-    285: "ATOS",
-    286: "APRILIA",
-    287: "BENELLI",
-    288: "FOTON",
-    289: "Iveco",
-    290: "UNICO",
-    291: "Cobra",
-    292: "SATURN",
-    293: "APOLO",
-    294: "MRT",
-    295: "SINSKI",
-    296: "MTX",
-    297: "AG",
-    298: "CFMOTO",
-    299: "FOX",
-    300: "KING LONG",
-    301: "DUCATI",
-    302: "MASESA",
-    303: "HILINER",
-    304: "HYUNDAI",
-    305: "OCTAVIA",
-    306: "MONTERO",
-    307: "XITARGA",
-    308: "ENPIRE",
-    309: "YITARGA",
-    310: "VAYU",
-    311: "OSBORNE",
-    312: "AKT",
-    313: "FUSO",
-    314: "NORTEX",
-    315: "CNJ",
-    316: "FT",
-    317: "TMR",
-    318: "NAVI",
-    319: "RAM",
-    320: "COMMER",
-    321: "BAJAJ PULSAR",
-    322: "VENUS",
-    323: "FORWARD",
-    324: "MOTO GUZZI",
-    325: "JMT",
-    326: "DIVISA",
-    327: "HUSQUEARNA",
-    328: "HAULOE",
-    329: "WUYANO",
-    330: "HAUJE",
-    331: "GOLDEN",
-    332: "AMAROK",
-    333: "THOMAS",
-    334: "MIRAGE",
-    335: "JINCHENG",
-    336: "FORLAND",
-    337: "NIPPONIA",
-    338: "SEPON",
-    339: "SUNRA",
-    340: "TESLA",
-    341: "CRAZY ",
-    342: "scania",
-    343: "HURRICANE",
-    344: "YARIS",
-    345: "PALETA",
-    346: "CANGHE",
-    347: "PULSAR",
-}
-
-TIPO_STATUS_MAP = {
-    1: "PENDIENTE-PAGO",
-    2: "PAGADA",
-}
-
-
-def _map_idtipolicencia(value) -> str:
-    if value is None:
-        return "NULO"
-    if isinstance(value, int):
-        return TIPO_LICENCIA_MAP.get(value, "NULO")
-    if isinstance(value, str):
-        cleaned = value.strip()
-        if cleaned == "":
-            return "NULO"
-        if cleaned.isdigit():
-            return TIPO_LICENCIA_MAP.get(int(cleaned), "NULO")
-        return cleaned
-    return "NULO"
-
-
-def _map_idsituacion(value) -> str:
-    if value is None:
-        return "NULL"
-    if isinstance(value, int):
-        return TIPO_SITUACION_MAP.get(value, "NULL")
-    if isinstance(value, str):
-        cleaned = value.strip()
-        if cleaned == "":
-            return "NULL"
-        if cleaned.isdigit():
-            return TIPO_SITUACION_MAP.get(int(cleaned), "NULL")
-        return cleaned
-    return "NULL"
-
-
-def _map_idmarca(value) -> str:
-    if value is None:
-        return ""
-    if isinstance(value, int):
-        return TIPO_MARCA_MAP.get(value, "")
-    if isinstance(value, str):
-        cleaned = value.strip()
-        if cleaned == "":
-            return ""
-        if cleaned.isdigit():
-            return TIPO_MARCA_MAP.get(int(cleaned), "")
-        return cleaned
-    return ""
-
-
-def _map_status(value) -> str:
-    if value is None:
-        return ""
-    if isinstance(value, int):
-        return TIPO_STATUS_MAP.get(value, "")
-    if isinstance(value, str):
-        cleaned = value.strip()
-        if cleaned == "":
-            return ""
-        if cleaned.isdigit():
-            return TIPO_STATUS_MAP.get(int(cleaned), "")
-        return cleaned
-    return ""
+CHECK_TRUE_VALUES = {"1", "true", "yes", "si", "sí"}
 
 
 def _parse_date(value: str) -> str | None:
@@ -567,34 +118,90 @@ def _parse_time(value: str) -> str | None:
     return f"{int(hh):02d}:{int(mm):02d}:{int(ss):02d}"
 
 
-def _clean_value(fieldname: str, value: str):
+# Convertidores por tipo de campo. Vacío o "NULL" vale 0 en Int/Check y
+# None en los demás.
+
+
+def _to_text(value: str | None) -> str | None:
     if value is None:
-        if fieldname in INT_FIELDS or fieldname in CHECK_FIELDS:
-            return 0
         return None
     value = value.strip()
-    if value == "" or value.upper() == "NULL":
-        if fieldname in INT_FIELDS or fieldname in CHECK_FIELDS:
-            return 0
+    if not value or (len(value) == 4 and value.upper() == "NULL"):
         return None
+    return value
 
-    if fieldname in CHECK_FIELDS:
-        v = value.lower()
-        return 1 if v in {"1", "true", "yes", "si", "sí"} else 0
 
-    if fieldname in INT_FIELDS:
+def _to_int(value: str | None) -> int:
+    # int() ya ignora los espacios y rechaza "", "NULL" y None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _to_check(value: str | None) -> int:
+    value = _to_text(value)
+    return 1 if value and value.lower() in CHECK_TRUE_VALUES else 0
+
+
+def _to_date(value: str | None) -> str | None:
+    value = _to_text(value)
+    return _parse_date(value) if value else None
+
+
+def _to_time(value: str | None) -> str | None:
+    value = _to_text(value)
+    return _parse_time(value) if value else None
+
+
+def _vehicle_info(value: str | None) -> tuple[int, str, str]:
+    """(idtipovehiculo, tipo_placa, tipo_placa_id) de un valor crudo."""
+    idtipovehiculo = _to_int(value)
+    return (
+        idtipovehiculo,
+        TIPO_PLACA_MAP.get(idtipovehiculo, "Nulo"),
+        TIPO_PLACA_ID_MAP.get(idtipovehiculo, "N"),
+    )
+
+
+def _memoize(func, seed: dict | None = None):
+    """
+    Convierte cada valor distinto una sola vez. Solo para columnas con
+    pocos valores distintos (códigos, fechas, horas).
+    """
+    cache = dict(seed or {})
+
+    def convert(value):
         try:
-            return int(value)
-        except Exception:
-            return 0
+            return cache[value]
+        except KeyError:
+            result = cache[value] = func(value)
+            return result
 
-    if fieldname in DATE_FIELDS:
-        return _parse_date(value)
+    return convert
 
-    if fieldname in TIME_FIELDS:
-        return _parse_time(value)
 
-    return value
+def _code_converter(mapping: dict, default: str):
+    """Convertidor de un campo de código con el mapa precalculado (int y str)."""
+    seed = {None: default, "": default}
+    for code, label in mapping.items():
+        seed[code] = label
+        seed[str(code)] = label
+    return _memoize(partial(map_code, mapping=mapping, default=default), seed)
+
+
+def _field_converter(fieldname: str):
+    if fieldname in CODE_FIELDS:
+        return _code_converter(*CODE_FIELDS[fieldname])
+    if fieldname in CHECK_FIELDS:
+        return _memoize(_to_check)
+    if fieldname in INT_FIELDS:
+        return _to_int
+    if fieldname in DATE_FIELDS:
+        return _memoize(_to_date)
+    if fieldname in TIME_FIELDS:
+        return _memoize(_to_time)
+    return _to_text
 
 
 def create_doctype():
@@ -647,67 +254,288 @@ def _normalize_header(value: str) -> str:
     return value
 
 
-def _iter_rows() -> Iterable[tuple]:
+HEADER_ALIASES = {
+    "tipoplaca": "tipo_placa",
+    "articulovalido": "articulo_valido",
+}
+
+
+class _CsvSource:
+    """
+    Lee el CSV en binario línea por línea, llevando el offset en bytes.
+
+    csv.reader consume exactamente las líneas de un registro (incluidos
+    los campos con saltos de línea), así que después de cada registro
+    ``offset`` apunta al inicio del siguiente.
+    """
+
+    def __init__(self, f, offset: int = 0):
+        self.f = f
+        self.offset = offset
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = self.f.readline()
+        if not line:
+            raise StopIteration
+        if self.offset == 0 and line.startswith(codecs.BOM_UTF8):
+            self.offset += len(codecs.BOM_UTF8)
+            line = line[len(codecs.BOM_UTF8):]
+        self.offset += len(line)
+        return line.decode("utf-8", errors="replace")
+
+
+def _sniff_dialect(csv_path: str):
+    with open(csv_path, newline="", encoding="utf-8-sig", errors="replace") as f:
+        sample = f.read(2048)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=[",", ";", "\t", "|"])
+    except Exception:
+        return csv.get_dialect("excel")
+
+
+def _build_field_index(headers: list[str]) -> list[tuple[str, int | None]]:
+    """
+    Posición en el CSV de cada fieldname de FIELDS (None si no viene).
+
+    Mismo criterio que csv.DictReader: con encabezados repetidos gana la
+    última columna.
+    """
     fieldnames = [f["fieldname"] for f in FIELDS if f.get("fieldname")]
-    aliases = {
-        "tipoplaca": "tipo_placa",
-        "articulovalido": "articulo_valido",
+    header_index = {header: i for i, header in enumerate(headers)}
+    field_index = {}
+    for header, i in header_index.items():
+        normalized = _normalize_header(header)
+        mapped = HEADER_ALIASES.get(normalized, normalized)
+        if mapped in fieldnames:
+            field_index[mapped] = i
+    return [(fieldname, field_index.get(fieldname)) for fieldname in fieldnames]
+
+
+def _column(i: int | None):
+    """Lector de la columna i de una fila cruda (None si el CSV no la trae)."""
+    if i is None:
+        return lambda row: None
+    return itemgetter(i)
+
+
+def _compile_transformer(field_index: list[tuple[str, int | None]], codigos: tuple[str, ...] = ()):
+    """
+    Compila el mapeo de encabezados en una lista de convertidores, uno por
+    fieldname de FIELDS, y devuelve la función fila cruda -> tupla.
+
+    Los campos derivados se calculan aquí mismo (ver pmt_historico_derive):
+    tipo_placa, tipo_placa_id y placa_unificada comparten un cache por
+    valor crudo de idtipovehiculo; articulo_valido se resuelve desde
+    blegal contra codigos (los de PMT Articulo) y consolidado se arma con
+    los demás valores ya convertidos.
+    """
+    positions = dict(field_index)
+    width = max((i for i in positions.values() if i is not None), default=-1) + 1
+    padding = [None] * width
+
+    vehicle = _memoize(_vehicle_info)
+    tipo_vehiculo = _column(positions.get("idtipovehiculo"))
+    placa = _column(positions.get("placa"))
+    blegal = _column(positions.get("blegal"))
+    articulo_csv = _column(positions.get("articulo_valido"))
+    resolve_articulo = make_articulo_resolver(list(codigos))
+    # None si la fila no trae blegal: se conserva el articulo_valido del CSV
+    articulo = _memoize(lambda raw: resolve_articulo(value) if (value := _to_text(raw)) else None)
+
+    def articulo_valido(row):
+        value = articulo(blegal(row))
+        return _to_text(articulo_csv(row)) if value is None else value
+
+    derived = {
+        "idtipovehiculo": lambda row: vehicle(tipo_vehiculo(row))[0],
+        "tipo_placa": lambda row: vehicle(tipo_vehiculo(row))[1],
+        "tipo_placa_id": lambda row: vehicle(tipo_vehiculo(row))[2],
+        "placa_unificada": lambda row: vehicle(tipo_vehiculo(row))[2] + (_to_text(placa(row)) or ""),
+        "articulo_valido": articulo_valido,
+        "consolidado": lambda row: None,
     }
-    with open(CSV_PATH, newline="", encoding="utf-8-sig", errors="replace") as f:
-        sample = f.read(2048)
-        f.seek(0)
-        try:
-            dialect = csv.Sniffer().sniff(sample, delimiters=[",", ";", "\t", "|"])
-        except Exception:
-            dialect = csv.get_dialect("excel")
-        reader = csv.DictReader(f, dialect=dialect)
-        mapped_headers = {}
-        for header in reader.fieldnames or []:
-            normalized = _normalize_header(header)
-            mapped = aliases.get(normalized, normalized)
-            if mapped in fieldnames:
-                mapped_headers[header] = mapped
-        for row in reader:
-            row_mapped = {mapped: row.get(orig) for orig, mapped in mapped_headers.items()}
-            idtipovehiculo = _clean_value("idtipovehiculo", row_mapped.get("idtipovehiculo"))
-            idtipolicencia = _map_idtipolicencia(row_mapped.get("idtipolicencia"))
-            idsituacion = _map_idsituacion(row_mapped.get("idsituacion"))
-            idmarca = _map_idmarca(row_mapped.get("idmarca"))
-            status = _map_status(row_mapped.get("status"))
-            values = []
-            for fieldname in fieldnames:
-                if fieldname == "tipo_placa":
-                    values.append(TIPO_PLACA_MAP.get(idtipovehiculo, "Nulo"))
-                elif fieldname == "tipo_placa_id":
-                    values.append(TIPO_PLACA_ID_MAP.get(idtipovehiculo, "N"))
-                elif fieldname == "placa_unificada":
-                    tipo = TIPO_PLACA_ID_MAP.get(idtipovehiculo, "N")
-                    placa = (_clean_value("placa", row_mapped.get("placa")) or "")
-                    values.append(f"{tipo}{placa}")
-                elif fieldname == "idtipovehiculo":
-                    values.append(idtipovehiculo)
-                elif fieldname == "idtipolicencia":
-                    values.append(idtipolicencia)
-                elif fieldname == "idsituacion":
-                    values.append(idsituacion)
-                elif fieldname == "idmarca":
-                    values.append(idmarca)
-                elif fieldname == "status":
-                    values.append(status)
-                else:
-                    values.append(_clean_value(fieldname, row_mapped.get(fieldname)))
-            yield tuple(values)
-
-
-def import_data(batch_size: int = 2000, truncate: bool = True):
+
+    def converter(fieldname, i):
+        if fieldname in derived:
+            return derived[fieldname]
+        convert = _field_converter(fieldname)
+        if i is None:
+            value = convert(None)
+            return lambda row: value
+        return lambda row: convert(row[i])
+
+    converters = [converter(fieldname, i) for fieldname, i in field_index]
+    fieldnames = [fieldname for fieldname, _ in field_index]
+    consolidado_at = fieldnames.index("consolidado")
+    consolidado_from = [j for j in range(len(fieldnames)) if j != consolidado_at]
+
+    def transform(row: list[str]) -> tuple:
+        if len(row) < width:  # Columnas faltantes al final de la fila
+            row = row + padding
+        values = [convert(row) for convert in converters]
+        values[consolidado_at] = make_consolidado([values[j] for j in consolidado_from])
+        return tuple(values)
+
+    return transform
+
+
+_TRANSFORMERS: dict[tuple, object] = {}
+
+
+def _get_transformer(field_index: list[tuple[str, int | None]], codigos: tuple[str, ...]):
+    """Transformador compilado de (field_index, codigos), uno por proceso."""
+    key = (tuple(field_index), codigos)
+    if key not in _TRANSFORMERS:
+        _TRANSFORMERS[key] = _compile_transformer(field_index, codigos)
+    return _TRANSFORMERS[key]
+
+
+def _transform_batch(records, field_index, codigos=()):
+    """Transform del pipeline: [(offset, fila cruda)] -> [(offset, tupla)]."""
+    transform = _get_transformer(field_index, codigos)
+    return [(offset, transform(row)) for offset, row in records]
+
+
+def _iter_raw_batches(csv_path: str, dialect, start_offset: int, batch_size: int):
+    """
+    Lee el CSV desde start_offset y entrega lotes de filas crudas.
+
+    Returns:
+        (headers, generador de Batch([(offset, fila)], context=end_offset))
+    """
+    f = open(csv_path, "rb")
+    source = _CsvSource(f)
+    reader = csv.reader(source, dialect=dialect)
+    headers = next(reader, None) or []
+    if start_offset:
+        f.seek(start_offset)
+        source.offset = start_offset
+
+    def batches():
+        with f:
+            batch = []
+            offset = source.offset
+            for row in reader:
+                if row:  # csv.DictReader también descarta filas vacías
+                    batch.append((offset, row))
+                offset = source.offset
+                if len(batch) >= batch_size:
+                    yield Batch(batch, offset)
+                    batch = []
+            if batch:
+                yield Batch(batch, source.offset)
+
+    return headers, batches()
+
+
+def _iter_rows(csv_path: str = CSV_PATH, codigos: tuple[str, ...] = ()) -> Iterable[tuple]:
+    dialect = _sniff_dialect(csv_path)
+    headers, batches = _iter_raw_batches(csv_path, dialect, 0, 2000)
+    transform = _compile_transformer(_build_field_index(headers), codigos)
+    for batch in batches:
+        for _, row in batch.records:
+            yield transform(row)
+
+
+def _checkpoint_path(csv_path: str) -> str:
+    return f"{csv_path}.checkpoint.json"
+
+
+def _file_signature(csv_path: str) -> dict:
+    stat = os.stat(csv_path)
+    return {"csv_path": os.path.abspath(csv_path), "size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+def _name_prefix(signature: dict) -> str:
+    """PMT-H-<hash>: distingue los offsets de un CSV de los de otro archivo o versión."""
+    digest = hashlib.sha1(json.dumps(signature, sort_keys=True).encode()).hexdigest()[:8]
+    return f"PMT-H-{digest}"
+
+
+def _load_checkpoint(checkpoint_path: str, signature: dict) -> dict | None:
+    if not os.path.exists(checkpoint_path):
+        return None
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    if any(checkpoint.get(key) != value for key, value in signature.items()):
+        raise RuntimeError(
+            f"El checkpoint {checkpoint_path} corresponde a otra versión del CSV. "
+            "Usa resume=False (--restart) para importar desde el inicio."
+        )
+    return checkpoint
+
+
+def _save_checkpoint(checkpoint_path: str, checkpoint: dict):
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def import_data(
+    batch_size: int = 2000,
+    truncate: bool = True,
+    csv_path: str = CSV_PATH,
+    workers: int | None = None,
+    resume: bool = True,
+    checkpoint_path: str | None = None,
+    verbose: bool = True,
+) -> dict:
+    """
+    Importa el CSV a PMT Historico en lotes, con checkpoints reanudables.
+
+    - Un solo lector recorre el archivo y registra el offset en bytes de
+      cada fila; un pool de procesos transforma los lotes (en orden) y el
+      proceso principal los inserta con un INSERT multi-fila y un commit
+      por lote (sam.scripts.pipeline).
+    - Después de cada commit se guarda el checkpoint (offset y filas) en
+      ``<csv>.checkpoint.json``; si el proceso se interrumpe, la siguiente
+      corrida continúa desde ahí sin truncar la tabla.
+    - El nombre de cada registro es PMT-H-<hash del archivo>-<offset>. Al
+      reanudar, el primer lote puede haberse insertado sin llegar a guardar
+      el checkpoint: solo en ese lote se omiten los nombres que ya existen.
+      Fuera de ese caso un nombre repetido es un error, como antes.
+    - Los campos derivados (tipo_placa, placa_unificada, articulo_valido,
+      consolidado, etc.) se calculan al transformar cada fila, así que no
+      hace falta ningún UPDATE posterior sobre la tabla.
+
+    Args:
+      batch_size: filas por INSERT/commit
+      truncate: vacía la tabla antes de empezar (se ignora al reanudar)
+      csv_path: ruta del CSV
+      workers: procesos para transformar filas (default: núcleos - 1)
+      resume: continuar desde el checkpoint si existe
+      checkpoint_path: ruta del checkpoint (default: <csv>.checkpoint.json)
+      verbose: imprime progreso y velocidad
+
+    Returns:
+      dict: filas importadas en la corrida, total de filas y segundos
+    """
     doctype_name = "PMT Historico"
     if not frappe.db.exists("DocType", doctype_name):
         raise RuntimeError("DocType 'PMT Historico' no existe. Ejecuta create_doctype primero.")
 
-    if truncate:
-        table = f"tab{doctype_name}"
-        frappe.db.sql(f"TRUNCATE `{table}`")
-        frappe.db.commit()
+    checkpoint_path = checkpoint_path or _checkpoint_path(csv_path)
+    signature = _file_signature(csv_path)
+    checkpoint = _load_checkpoint(checkpoint_path, signature) if resume else None
+
+    if checkpoint and checkpoint.get("done"):
+        if verbose:
+            print(f"{csv_path} ya fue importado ({checkpoint['rows']} filas). Usa resume=False para reimportar.")
+        return {"imported": 0, "rows": checkpoint["rows"], "seconds": 0}
+
+    if checkpoint:
+        if verbose:
+            print(f"Reanudando desde el byte {checkpoint['offset']} ({checkpoint['rows']} filas ya importadas)")
+    else:
+        checkpoint = {**signature, "offset": 0, "rows": 0, "done": False}
+        if truncate:
+            table = f"tab{doctype_name}"
+            frappe.db.sql(f"TRUNCATE `{table}`")
+            frappe.db.commit()
 
     data_fields = [f["fieldname"] for f in FIELDS if f.get("fieldname")]
     fields = [
@@ -722,65 +550,52 @@ def import_data(batch_size: int = 2000, truncate: bool = True):
     now = frappe.utils.now()
     owner = "Administrator"
 
-    def value_batches():
-        batch = []
-        counter = 0
-        for row in _iter_rows():
-            counter += 1
-            name = f"PMT-H-{counter:06d}"
-            batch.append((name, owner, now, now, owner, 0, *row))
-            if len(batch) >= batch_size:
-                yield batch
-                batch = []
-        if batch:
-            yield batch
-
-    for batch in value_batches():
-        frappe.db.bulk_insert(doctype_name, fields, batch)
-        frappe.db.commit()
+    dialect = _sniff_dialect(csv_path)
+    headers, raw_batches = _iter_raw_batches(csv_path, dialect, checkpoint["offset"], batch_size)
 
+    prefix = _name_prefix(signature)
+    replaying = [bool(checkpoint["offset"])]
 
-def update_tipo_placa_id_records():
-    doctype_name = "PMT Historico"
-    table = f"tab{doctype_name}"
-    frappe.db.sql(
-        f"""
-        UPDATE `{table}`
-        SET tipo_placa_id = CASE idtipovehiculo
-            WHEN 0 THEN 'N'
-            WHEN 1 THEN 'P'
-            WHEN 2 THEN 'C'
-            WHEN 3 THEN 'P'
-            WHEN 4 THEN 'BUS'
-            WHEN 5 THEN 'P'
-            WHEN 6 THEN 'M'
-            WHEN 7 THEN 'C'
-            WHEN 8 THEN 'A'
-            WHEN 9 THEN 'O'
-            WHEN 10 THEN 'U'
-            WHEN 11 THEN 'M'
-            WHEN 12 THEN 'N'
-            ELSE 'N'
-        END
-        """
-    )
-    frappe.db.commit()
-
-
-def update_placa_unificada_records():
-    doctype_name = "PMT Historico"
-    table = f"tab{doctype_name}"
-    frappe.db.sql(
-        f"""
-        UPDATE `{table}`
-        SET placa_unificada = CONCAT(COALESCE(tipo_placa_id, ''), COALESCE(placa, ''))
-        """
-    )
-    frappe.db.commit()
+    def write(records):
+        batch = [(f"{prefix}-{offset:012d}", owner, now, now, owner, 0, *row) for offset, row in records]
+        if replaying[0]:
+            replaying[0] = False
+            existing = set(
+                frappe.get_all(doctype_name, filters={"name": ["in", [row[0] for row in batch]]}, pluck="name")
+            )
+            batch = [row for row in batch if row[0] not in existing]
+        if batch:
+            frappe.db.bulk_insert(doctype_name, fields, batch)
+        return len(batch)
+
+    def save_checkpoint(batch, written):
+        checkpoint["offset"] = batch.context
+        checkpoint["rows"] += written
+        _save_checkpoint(checkpoint_path, checkpoint)
+
+    stats = Pipeline(
+        doctype_name,
+        reader=raw_batches,
+        transform=partial(
+            _transform_batch,
+            field_index=_build_field_index(headers),
+            codigos=tuple(load_articulo_codigos()),
+        ),
+        writer=write,
+        on_commit=save_checkpoint,
+        workers=workers if workers is not None else max(1, (os.cpu_count() or 2) - 1),
+        progress_every=None,
+        verbose=verbose,
+    ).run()
+
+    checkpoint["done"] = True
+    _save_checkpoint(checkpoint_path, checkpoint)
+
+    if verbose:
+        print(f"{checkpoint['rows']:,} filas en total")
+    return {"imported": stats["written"], "rows": checkpoint["rows"], "seconds": stats["seconds"]}
 
 
 def run_all():
     create_doctype()
-    import_data()
-    update_tipo_placa_id_records()
-    update_placa_unificada_records()
+    import_data(resume=False)
@@ -1,16 +1,65 @@
 from __future__ import annotations
 
-import csv
 import os
 from datetime import datetime
 
 import frappe
+from frappe.utils import flt
+
+from sam.api.solvencia import invalidate_solvencia
+from sam.scripts.pipeline import Pipeline
+from sam.scripts.streaming import iter_rows
 
 
 AGENTE_FIJO = "HR-EMP-00001"
 NOMBRE_AGENTE_FIJO = "Agente Importado"
 CUI_FIJO = "0000000000000"
 
+HISTORICO_FIELDS = [
+    "name",
+    "idinfraccion",
+    "idmulta",
+    "status",
+    "placa_unificada",
+    "fecha",
+    "idmarca",
+    "nombres",
+    "apellidos",
+    "nlicencia",
+    "articulo_valido",
+    "total",
+    "fechalimite",
+    "detalle",
+    "consolidado",
+    "lugar",
+]
+
+# Columnas de PMT Boleta escritas por insert_massive (además de las estándar)
+BOLETA_FIELDS = [
+    "boleta_id",
+    "estado_boleta",
+    "agente",
+    "nombre_agente",
+    "vehiculo_id",
+    "fecha_infraccion",
+    "marca_vehiculo",
+    "cui",
+    "nombre_infractor",
+    "licencia_principal",
+    "articulo_codigo",
+    "articulo_valor",
+    "fecha_infraccion_descuento",
+    "descripción_del_articulo",
+    "observaciones",
+    "ubicacion_infraccion",
+    "firmo_boleta",
+    "se_nego_a_firmar",
+    "propietario",
+    "nit",
+    "tipo_de_licencia_principal",
+    "vehiculo_descripcion_marca",
+]
+
 
 def _clean(value) -> str:
     return (value or "").strip()
@@ -23,10 +72,47 @@ def _estado_valido(value: str) -> str:
     return "VERIFICACION"
 
 
+def _boleta_data(r, estado_boleta: str, vehiculo_id: str, articulo_codigo: str) -> dict:
+    return {
+        "boleta_id": r.get("idinfraccion"),
+        "estado_boleta": estado_boleta,
+        "agente": AGENTE_FIJO,
+        "nombre_agente": NOMBRE_AGENTE_FIJO,
+        "vehiculo_id": vehiculo_id,
+        "fecha_infraccion": r.get("fecha"),
+        "marca_vehiculo": _clean(r.get("idmarca")),
+        "cui": CUI_FIJO,
+        "nombre_infractor": _nombre_infractor(r.get("nombres"), r.get("apellidos")),
+        "licencia_principal": _clean(r.get("nlicencia")),
+        "articulo_codigo": articulo_codigo,
+        "articulo_valor": r.get("total") or 0,
+        "fecha_infraccion_descuento": r.get("fechalimite"),
+        "descripción_del_articulo": _clean(r.get("detalle")),
+        "observaciones": _clean(r.get("consolidado")),
+        "ubicacion_infraccion": _clean(r.get("lugar")),
+    }
+
+
+def _insert_boleta_doc(data: dict):
+    doc = frappe.get_doc({"doctype": "PMT Boleta", **data})
+    doc.insert(ignore_permissions=True)
+
+    # before_insert fija VERIFICACION; forzamos el estado solicitado después de insertar.
+    if data["estado_boleta"] != "VERIFICACION":
+        doc.db_set("estado_boleta", data["estado_boleta"], update_modified=False)
+    return doc
+
+
 def _nombre_infractor(nombres: str, apellidos: str) -> str:
     return " ".join(part for part in [_clean(nombres), _clean(apellidos)] if part)
 
 
+def _iter_historico_rows():
+    """PMT Historico en orden (creation, name), leído por bloques."""
+    for row in iter_rows("PMT Historico", HISTORICO_FIELDS, order_by=("creation", "name")):
+        yield dict(zip(HISTORICO_FIELDS, row, strict=True))
+
+
 def _build_error_file_paths() -> tuple[str, str]:
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     base_dir = "/home/frappe/frappe-bench/sites/sam.mdf.lan/private/files"
@@ -47,35 +133,11 @@ def insert_test(limit: int = 5, verbose: bool = True) -> dict:
     if not frappe.db.exists("PMT Infractor", CUI_FIJO):
         raise RuntimeError(f"No existe PMT Infractor '{CUI_FIJO}'")
 
-    rows = frappe.get_all(
-        "PMT Historico",
-        fields=[
-            "name",
-            "idinfraccion",
-            "idmulta",
-            "status",
-            "placa_unificada",
-            "fecha",
-            "idmarca",
-            "nombres",
-            "apellidos",
-            "nlicencia",
-            "articulo_valido",
-            "total",
-            "fechalimite",
-            "detalle",
-            "consolidado",
-            "lugar",
-        ],
-        order_by="creation asc, name asc",
-        limit_page_length=0,
-    )
-
     inserted = 0
     skipped_invalid = 0
     skipped_existing = 0
 
-    for r in rows:
+    for r in _iter_historico_rows():
         boleta_id = r.get("idinfraccion")
         vehiculo_id = _clean(r.get("placa_unificada"))
         articulo_codigo = _clean(r.get("articulo_valido"))
@@ -98,32 +160,7 @@ def insert_test(limit: int = 5, verbose: bool = True) -> dict:
 
         estado_boleta = _estado_valido(r.get("status"))
 
-        doc = frappe.get_doc(
-            {
-                "doctype": "PMT Boleta",
-                "boleta_id": boleta_id,
-                "estado_boleta": estado_boleta,
-                "agente": AGENTE_FIJO,
-                "nombre_agente": NOMBRE_AGENTE_FIJO,
-                "vehiculo_id": vehiculo_id,
-                "fecha_infraccion": r.get("fecha"),
-                "marca_vehiculo": _clean(r.get("idmarca")),
-                "cui": CUI_FIJO,
-                "nombre_infractor": _nombre_infractor(r.get("nombres"), r.get("apellidos")),
-                "licencia_principal": _clean(r.get("nlicencia")),
-                "articulo_codigo": articulo_codigo,
-                "articulo_valor": r.get("total") or 0,
-                "fecha_infraccion_descuento": r.get("fechalimite"),
-                "descripción_del_articulo": _clean(r.get("detalle")),
-                "observaciones": _clean(r.get("consolidado")),
-                "ubicacion_infraccion": _clean(r.get("lugar")),
-            }
-        )
-        doc.insert(ignore_permissions=True)
-
-        # before_insert fija VERIFICACION; forzamos el estado solicitado después de insertar.
-        if estado_boleta != "VERIFICACION":
-            doc.db_set("estado_boleta", estado_boleta, update_modified=False)
+        _insert_boleta_doc(_boleta_data(r, estado_boleta, vehiculo_id, articulo_codigo))
 
         frappe.db.commit()
         inserted += 1
@@ -147,161 +184,183 @@ def insert_test(limit: int = 5, verbose: bool = True) -> dict:
     return summary
 
 
-def insert_massive(
-    limit: int | None = None,
-    progress_every: int = 10000,
-    commit_every: int = 1000,
-    verbose: bool = True,
-) -> dict:
-    """
-    Inserción masiva PMT Boleta desde PMT Historico.
-    - Reporta avance cada `progress_every` registros procesados.
-    - Genera CSV con errores (si existen) y TXT de resumen.
-    """
+ERROR_CSV_HEADER = ["historico_name", "boleta_id", "error_type", "error_detail"]
 
-    if not frappe.db.exists("PMT Agente", AGENTE_FIJO):
-        raise RuntimeError(f"No existe PMT Agente '{AGENTE_FIJO}'")
-    if not frappe.db.exists("PMT Infractor", CUI_FIJO):
-        raise RuntimeError(f"No existe PMT Infractor '{CUI_FIJO}'")
 
-    rows = frappe.get_all(
-        "PMT Historico",
-        fields=[
-            "name",
-            "idinfraccion",
-            "idmulta",
-            "status",
-            "placa_unificada",
-            "fecha",
-            "idmarca",
-            "nombres",
-            "apellidos",
-            "nlicencia",
-            "articulo_valido",
-            "total",
-            "fechalimite",
-            "detalle",
-            "consolidado",
-            "lugar",
-        ],
-        order_by="creation asc, name asc",
-        limit_page_length=0,
-    )
+def _bulk_insert_boletas(pending: list[tuple[str, dict]]):
+    """Writer del pipeline: un INSERT multi-fila con las boletas del lote."""
+    now = frappe.utils.now()
+    owner = frappe.session.user
+    fields = ["name", "owner", "creation", "modified", "modified_by", "docstatus", *BOLETA_FIELDS]
+    values = [
+        (
+            str(data["boleta_id"]), owner, now, now, owner, 0,
+            *({**data, "firmo_boleta": 0, "se_nego_a_firmar": 0}[f] for f in BOLETA_FIELDS),
+        )
+        for _, data in pending
+    ]
+    frappe.db.bulk_insert("PMT Boleta", fields, values)
+    # El INSERT multi-fila no dispara los doc_events que limpian la cache de solvencia
+    invalidate_solvencia({data["vehiculo_id"] for _, data in pending})
 
-    error_csv_path, summary_txt_path = _build_error_file_paths()
-    errors_written = 0
 
-    inserted = 0
-    processed = 0
-    skipped_invalid = 0
-    skipped_existing = 0
-    skipped_missing_vehicle = 0
-    skipped_missing_article = 0
-    skipped_exception = 0
-    uncommitted = 0
+class _BoletaValidator:
+    """
+    Validate del pipeline: filtra filas de PMT Historico contra las boletas,
+    vehículos, artículos y estados precargados y cuenta cada motivo.
+
+    También completa los campos fetch_from de PMT Boleta (vehículo,
+    artículo, infractor y agente) como lo haría doc.insert, porque el
+    INSERT multi-fila no los aplica.
+    """
 
-    with open(error_csv_path, "w", newline="", encoding="utf-8") as err_file:
-        writer = csv.writer(err_file)
-        writer.writerow(["historico_name", "boleta_id", "error_type", "error_detail"])
+    def __init__(self):
+        self.existing_boletas = set(frappe.db.sql_list("SELECT name FROM `tabPMT Boleta`"))
+        self.vehiculos = {
+            name: (marca_vehiculo, propietario, nit)
+            for name, marca_vehiculo, propietario, nit in frappe.db.sql(
+                "SELECT name, marca_vehiculo, propietario, nit_del_propietario FROM `tabPMT Vehiculo`"
+            )
+        }
+        self.articulos = {
+            name: (valor, descripcion)
+            for name, valor, descripcion in frappe.db.sql(
+                "SELECT name, articulo_valor, articulo_descripcion FROM `tabPMT Articulo`"
+            )
+        }
+        self.estados = set(frappe.db.sql_list("SELECT name FROM `tabPMT Boleta Estado`"))
+        self.infractor = frappe.db.get_value(
+            "PMT Infractor",
+            CUI_FIJO,
+            ["nombre_infractor", "licencia_vehiculo", "licencia_tipo_persona"],
+            as_dict=True,
+        )
+        self.nombre_agente = frappe.db.get_value("PMT Agente", AGENTE_FIJO, "agente_nombre")
+
+        self.skipped_invalid = 0
+        self.skipped_existing = 0
+        self.skipped_missing_vehicle = 0
+        self.skipped_missing_article = 0
 
+    def __call__(self, rows: list[dict]) -> tuple[list[tuple[str, dict]], list[list]]:
+        valid = []
+        rejected = []
         for r in rows:
-            processed += 1
             boleta_id = r.get("idinfraccion")
             vehiculo_id = _clean(r.get("placa_unificada"))
             articulo_codigo = _clean(r.get("articulo_valido"))
 
             if not boleta_id or not vehiculo_id or not articulo_codigo:
-                skipped_invalid += 1
-                errors_written += 1
-                writer.writerow([r.get("name"), boleta_id, "invalid_required", "Falta boleta_id, vehiculo_id o articulo_codigo"])
+                self.skipped_invalid += 1
+                rejected.append([r.get("name"), boleta_id, "invalid_required", "Falta boleta_id, vehiculo_id o articulo_codigo"])
                 continue
 
-            if frappe.db.exists("PMT Boleta", str(boleta_id)):
-                skipped_existing += 1
+            if str(boleta_id) in self.existing_boletas:
+                self.skipped_existing += 1
                 continue
 
-            if not frappe.db.exists("PMT Vehiculo", vehiculo_id):
-                skipped_missing_vehicle += 1
-                errors_written += 1
-                writer.writerow([r.get("name"), boleta_id, "missing_vehicle", f"No existe PMT Vehiculo: {vehiculo_id}"])
+            if vehiculo_id not in self.vehiculos:
+                self.skipped_missing_vehicle += 1
+                rejected.append([r.get("name"), boleta_id, "missing_vehicle", f"No existe PMT Vehiculo: {vehiculo_id}"])
                 continue
 
-            if not frappe.db.exists("PMT Articulo", articulo_codigo):
-                skipped_missing_article += 1
-                errors_written += 1
-                writer.writerow([r.get("name"), boleta_id, "missing_article", f"No existe PMT Articulo: {articulo_codigo}"])
+            if articulo_codigo not in self.articulos:
+                self.skipped_missing_article += 1
+                rejected.append([r.get("name"), boleta_id, "missing_article", f"No existe PMT Articulo: {articulo_codigo}"])
                 continue
 
-            estado_boleta = _estado_valido(r.get("status"))
-
-            try:
-                doc = frappe.get_doc(
-                    {
-                        "doctype": "PMT Boleta",
-                        "boleta_id": boleta_id,
-                        "estado_boleta": estado_boleta,
-                        "agente": AGENTE_FIJO,
-                        "nombre_agente": NOMBRE_AGENTE_FIJO,
-                        "vehiculo_id": vehiculo_id,
-                        "fecha_infraccion": r.get("fecha"),
-                        "marca_vehiculo": _clean(r.get("idmarca")),
-                        "cui": CUI_FIJO,
-                        "nombre_infractor": _nombre_infractor(r.get("nombres"), r.get("apellidos")),
-                        "licencia_principal": _clean(r.get("nlicencia")),
-                        "articulo_codigo": articulo_codigo,
-                        "articulo_valor": r.get("total") or 0,
-                        "fecha_infraccion_descuento": r.get("fechalimite"),
-                        "descripción_del_articulo": _clean(r.get("detalle")),
-                        "observaciones": _clean(r.get("consolidado")),
-                        "ubicacion_infraccion": _clean(r.get("lugar")),
-                    }
-                )
-                doc.insert(ignore_permissions=True)
-
-                if estado_boleta != "VERIFICACION":
-                    doc.db_set("estado_boleta", estado_boleta, update_modified=False)
-
-                inserted += 1
-                uncommitted += 1
-
-                if commit_every and uncommitted >= int(commit_every):
-                    frappe.db.commit()
-                    uncommitted = 0
-
-            except Exception as e:
-                skipped_exception += 1
-                errors_written += 1
-                writer.writerow([r.get("name"), boleta_id, "insert_exception", str(e)])
-
-            if progress_every and processed % int(progress_every) == 0:
-                frappe.db.commit()
-                uncommitted = 0
-                if verbose:
-                    print(
-                        f"Avance: procesados={processed}, insertados={inserted}, "
-                        f"errores={errors_written}, existentes={skipped_existing}"
-                    )
-
-            if limit and inserted >= int(limit):
-                break
-
-    if uncommitted > 0:
-        frappe.db.commit()
+            estado_boleta = _clean(r.get("status")) or "VERIFICACION"
+            if estado_boleta not in self.estados:
+                estado_boleta = "VERIFICACION"
+
+            self.existing_boletas.add(str(boleta_id))
+            data = _boleta_data(r, estado_boleta, vehiculo_id, articulo_codigo)
+            valid.append((r.get("name"), {**data, **self.fetched_values(data)}))
+        return valid, rejected
+
+    def fetched_values(self, data: dict) -> dict:
+        """Campos fetch_from de PMT Boleta, con los mismos valores que asigna doc.insert."""
+        marca_vehiculo, propietario, nit = self.vehiculos[data["vehiculo_id"]]
+        articulo_valor, articulo_descripcion = self.articulos[data["articulo_codigo"]]
+        return {
+            "marca_vehiculo": marca_vehiculo,
+            "vehiculo_descripcion_marca": marca_vehiculo,
+            "propietario": propietario,
+            "nit": nit,
+            "articulo_valor": flt(articulo_valor),
+            # El único fetch_from con fetch_if_empty
+            "descripción_del_articulo": data["descripción_del_articulo"] or articulo_descripcion,
+            "nombre_infractor": self.infractor.nombre_infractor,
+            "licencia_principal": self.infractor.licencia_vehiculo,
+            "tipo_de_licencia_principal": self.infractor.licencia_tipo_persona,
+            "nombre_agente": self.nombre_agente,
+        }
+
+    def insert_failed(self, record: tuple[str, dict], error: Exception) -> list:
+        historico_name, data = record
+        self.existing_boletas.discard(str(data["boleta_id"]))
+        return [historico_name, data["boleta_id"], "insert_exception", str(error)]
+
+
+def insert_massive(
+    limit: int | None = None,
+    progress_every: int = 10000,
+    commit_every: int = 1000,
+    verbose: bool = True,
+) -> dict:
+    """
+    Inserción masiva PMT Boleta desde PMT Historico (sam.scripts.pipeline).
+    - Las boletas, vehículos, artículos y estados existentes se cargan una
+      sola vez; PMT Historico se lee por bloques.
+    - Las boletas válidas se insertan con un INSERT multi-fila por cada
+      `commit_every`, ya con su estado final. Si un lote falla se reintenta
+      fila por fila y cada error queda en el CSV. Las filas sin fecha van
+      directo a doc.insert.
+    - Reporta avance cada `progress_every` registros procesados.
+    - Genera CSV con errores (si existen) y TXT de resumen.
+    """
+
+    if not frappe.db.exists("PMT Agente", AGENTE_FIJO):
+        raise RuntimeError(f"No existe PMT Agente '{AGENTE_FIJO}'")
+    if not frappe.db.exists("PMT Infractor", CUI_FIJO):
+        raise RuntimeError(f"No existe PMT Infractor '{CUI_FIJO}'")
+
+    validator = _BoletaValidator()
+    error_csv_path, summary_txt_path = _build_error_file_paths()
+
+    stats = Pipeline(
+        "PMT Boleta",
+        reader=_iter_historico_rows(),
+        validate=validator,
+        writer=_bulk_insert_boletas,
+        row_writer=lambda record: _insert_boleta_doc(record[1]),
+        # Obligatoria en PMT Boleta pero la columna admite NULL: doc.insert
+        # la rechaza con el mismo error de siempre
+        needs_row_writer=lambda record: not record[1]["fecha_infraccion"],
+        on_error=validator.insert_failed,
+        batch_size=commit_every,
+        limit=limit,
+        dead_letter_path=error_csv_path,
+        dead_letter_header=ERROR_CSV_HEADER,
+        progress_every=progress_every,
+        verbose=verbose,
+    ).run()
 
     summary = {
-        "processed": processed,
-        "inserted": inserted,
-        "skipped_existing": skipped_existing,
-        "skipped_invalid": skipped_invalid,
-        "skipped_missing_vehicle": skipped_missing_vehicle,
-        "skipped_missing_article": skipped_missing_article,
-        "skipped_exception": skipped_exception,
-        "errors_written": errors_written,
-        "error_csv": error_csv_path if errors_written else None,
+        "processed": stats["read"],
+        "inserted": stats["written"],
+        "skipped_existing": validator.skipped_existing,
+        "skipped_invalid": validator.skipped_invalid,
+        "skipped_missing_vehicle": validator.skipped_missing_vehicle,
+        "skipped_missing_article": validator.skipped_missing_article,
+        "skipped_exception": stats["failed"],
+        "errors_written": stats["rejected"] + stats["failed"],
+        "error_csv": stats["dead_letter"],
         "summary_txt": summary_txt_path,
         "progress_every": progress_every,
         "commit_every": commit_every,
         "limit": limit,
+        "seconds": stats["seconds"],
     }
 
     with open(summary_txt_path, "w", encoding="utf-8") as f:
@@ -309,12 +368,6 @@ def insert_massive(
         for k, v in summary.items():
             f.write(f"{k}: {v}\n")
 
-    if errors_written == 0:
-        try:
-            os.remove(error_csv_path)
-        except FileNotFoundError:
-            pass
-
     if verbose:
         print(f"Finalizado: {summary}")
 
@@ -2,6 +2,9 @@ from __future__ import annotations
 
 import frappe
 
+from sam.scripts.pipeline import Pipeline
+from sam.scripts.streaming import iter_rows
+
 
 def _clean(value: str | None) -> str:
     return (value or "").strip()
@@ -20,19 +23,113 @@ def _normalize_marca(value: str | None) -> str:
     return _clean(value)
 
 
-def _marca_exists(value: str) -> bool:
-    if not value:
-        return False
-    return bool(frappe.db.exists("PMT Marca Vehiculo", value))
+INSERT_BATCH_SIZE = 1000
+
+
+def _load_lookups() -> frappe._dict:
+    """
+    Tipos de placa, marcas y vehículos existentes, cargados una sola vez.
+
+    Las llaves van en mayúsculas, como las compara MariaDB; el valor es el
+    nombre real del registro.
+    """
+    existing = set()
+    for name, placa_tipo, placa_numero in frappe.db.sql(
+        "SELECT name, placa_tipo, placa_numero FROM `tabPMT Vehiculo`"
+    ):
+        existing.add((name or "").upper())
+        existing.add(f"{placa_tipo or ''}{placa_numero or ''}".upper())
+
+    return frappe._dict(
+        placa_tipos={n.upper(): n for n in frappe.db.sql_list("SELECT name FROM `tabPMT Placa Tipo`")},
+        marcas={n.upper(): n for n in frappe.db.sql_list("SELECT name FROM `tabPMT Marca Vehiculo`")},
+        vehiculos=existing,
+    )
+
+
+def _iter_historico_rows():
+    return iter_rows("PMT Historico", ["tipo_placa_id", "placa", "idmarca"], order_by=("creation", "name"))
+
 
+class _VehiculoValidator:
+    """
+    Validate del pipeline con la validación y deduplicación de siempre:
+    entrega (name, placa_tipo, placa_numero, marca_vehiculo) de cada
+    vehículo a insertar y acumula los contadores de omitidos.
+
+    El nombre de PMT Vehiculo es {placa_tipo}{placa_numero}, así que el
+    anti-join contra los existentes (y los ya entregados) es por nombre.
+    """
+
+    def __init__(self, counters: dict, lookups: frappe._dict):
+        self.counters = counters
+        self.lookups = lookups
+        self.seen_source: set[tuple[str, str, str]] = set()
+
+    def __call__(self, rows: list[tuple]) -> tuple[list[tuple], list]:
+        counters = self.counters
+        lookups = self.lookups
+        valid = []
+        for tipo_placa_id, placa, idmarca, *_ in rows:
+            placa_tipo = _normalize_placa_tipo(tipo_placa_id)
+            placa_numero = _normalize_placa_numero(placa)
+            marca_vehiculo = _normalize_marca(idmarca)
+
+            # PMT Vehiculo exige estos campos
+            if not placa_tipo or not placa_numero:
+                counters["skipped_invalid"] += 1
+                continue
+            placa_tipo_link = lookups.placa_tipos.get(placa_tipo)
+            if not placa_tipo_link:
+                counters["skipped_invalid_placa_tipo_link"] += 1
+                continue
+
+            dedupe_key = (placa_tipo, placa_numero, marca_vehiculo)
+            if dedupe_key in self.seen_source:
+                counters["skipped_source_duplicate"] += 1
+                continue
+            self.seen_source.add(dedupe_key)
+
+            name = f"{placa_tipo}{placa_numero}"
+            if name in lookups.vehiculos:
+                counters["skipped_existing_target"] += 1
+                continue
+            lookups.vehiculos.add(name)
+
+            marca_link = lookups.marcas.get(marca_vehiculo.upper()) if marca_vehiculo else None
+            if marca_vehiculo and not marca_link:
+                counters["skipped_missing_brand_link"] += 1
+
+            valid.append((name, placa_tipo_link, placa_numero, marca_link))
+        return valid, []
+
+
+def _new_counters() -> dict:
+    return {
+        "skipped_source_duplicate": 0,
+        "skipped_existing_target": 0,
+        "skipped_invalid": 0,
+        "skipped_missing_brand_link": 0,
+        "skipped_invalid_placa_tipo_link": 0,
+    }
 
-def _placa_tipo_exists(value: str) -> bool:
-    if not value:
-        return False
-    return bool(frappe.db.exists("PMT Placa Tipo", value))
+
+def _bulk_insert_vehiculos(batch: list[tuple]):
+    now = frappe.utils.now()
+    owner = frappe.session.user
+    frappe.db.bulk_insert(
+        "PMT Vehiculo",
+        ["name", "owner", "creation", "modified", "modified_by", "docstatus", "placa_tipo", "placa_numero", "marca_vehiculo"],
+        [(name, owner, now, now, owner, 0, placa_tipo, placa_numero, marca) for name, placa_tipo, placa_numero, marca in batch],
+    )
 
 
-def insert_from_historico(limit: int | None = None, commit: bool = False, verbose: bool = True) -> dict:
+def insert_from_historico(
+    limit: int | None = None,
+    commit: bool = False,
+    verbose: bool = True,
+    batch_size: int = INSERT_BATCH_SIZE,
+) -> dict:
     """
     Inserta en PMT Vehiculo usando PMT Historico con mapeo:
       placa_tipo   <- tipo_placa_id
@@ -43,86 +140,46 @@ def insert_from_historico(limit: int | None = None, commit: bool = False, verbos
       - solo toma la primera ocurrencia por clave (placa_tipo, placa_numero, marca_vehiculo)
       - también evita insertar si ya existe PMT Vehiculo con (placa_tipo, placa_numero)
 
+    Los tipos de placa, marcas y vehículos existentes se cargan una sola
+    vez y los vehículos nuevos se insertan en lotes de `batch_size`.
+
     Args:
       limit: máximo de inserciones efectivas (útil para pruebas)
       commit: hace commit al finalizar
       verbose: imprime trazas por consola
+      batch_size: vehículos por INSERT
     """
 
-    source_rows = frappe.get_all(
-        "PMT Historico",
-        fields=["name", "tipo_placa_id", "placa", "idmarca", "creation"],
-        order_by="creation asc, name asc",
-        limit_page_length=0,
-    )
-
-    seen_source: set[tuple[str, str, str]] = set()
-    inserted = 0
-    skipped_source_duplicate = 0
-    skipped_invalid = 0
-    skipped_existing_target = 0
-    skipped_missing_brand_link = 0
-    skipped_invalid_placa_tipo_link = 0
-
-    for row in source_rows:
-        placa_tipo = _normalize_placa_tipo(row.get("tipo_placa_id"))
-        placa_numero = _normalize_placa_numero(row.get("placa"))
-        marca_vehiculo = _normalize_marca(row.get("idmarca"))
-
-        # PMT Vehiculo exige estos campos
-        if not placa_tipo or not placa_numero:
-            skipped_invalid += 1
-            continue
-        if not _placa_tipo_exists(placa_tipo):
-            skipped_invalid_placa_tipo_link += 1
-            continue
-
-        dedupe_key = (placa_tipo, placa_numero, marca_vehiculo)
-        if dedupe_key in seen_source:
-            skipped_source_duplicate += 1
-            continue
-        seen_source.add(dedupe_key)
-
-        if frappe.db.exists(
-            "PMT Vehiculo",
-            {
-                "placa_tipo": placa_tipo,
-                "placa_numero": placa_numero,
-            },
-        ):
-            skipped_existing_target += 1
-            continue
-
-        doc = frappe.new_doc("PMT Vehiculo")
-        doc.placa_tipo = placa_tipo
-        doc.placa_numero = placa_numero
-        if marca_vehiculo and _marca_exists(marca_vehiculo):
-            doc.marca_vehiculo = marca_vehiculo
-        elif marca_vehiculo:
-            skipped_missing_brand_link += 1
-        doc.insert(ignore_permissions=True)
+    processed_source = frappe.db.count("PMT Historico")
+    counters = _new_counters()
 
-        inserted += 1
+    def write(batch):
+        _bulk_insert_vehiculos(batch)
         if verbose:
-            print(
-                f"Insertado PMT Vehiculo: placa_tipo={placa_tipo}, "
-                f"placa_numero={placa_numero}, marca_vehiculo={marca_vehiculo or '-'}"
-            )
-
-        if limit and inserted >= int(limit):
-            break
+            for _, placa_tipo, placa_numero, marca_vehiculo in batch:
+                print(
+                    f"Insertado PMT Vehiculo: placa_tipo={placa_tipo}, "
+                    f"placa_numero={placa_numero}, marca_vehiculo={marca_vehiculo or '-'}"
+                )
+
+    stats = Pipeline(
+        "PMT Vehiculo",
+        reader=_iter_historico_rows(),
+        validate=_VehiculoValidator(counters, _load_lookups()),
+        writer=write,
+        batch_size=batch_size,
+        commit=False,
+        limit=limit,
+        verbose=verbose,
+    ).run()
 
     if commit:
         frappe.db.commit()
 
     summary = {
-        "inserted": inserted,
-        "skipped_source_duplicate": skipped_source_duplicate,
-        "skipped_existing_target": skipped_existing_target,
-        "skipped_invalid": skipped_invalid,
-        "skipped_missing_brand_link": skipped_missing_brand_link,
-        "skipped_invalid_placa_tipo_link": skipped_invalid_placa_tipo_link,
-        "processed_source": len(source_rows),
+        "inserted": stats["written"],
+        **counters,
+        "processed_source": processed_source,
         "committed": bool(commit),
         "limit": limit,
     }
@@ -147,59 +204,19 @@ def insert_one_by_one(
     Inserta uno a uno (commit por cada inserción), para validar ejecución paso a paso.
     Usa la misma lógica de deduplicación y validación que insert_from_historico.
     """
-    source_rows = frappe.get_all(
-        "PMT Historico",
-        fields=["name", "tipo_placa_id", "placa", "idmarca", "creation"],
-        order_by="creation asc, name asc",
-        limit_page_length=0,
-    )
-
-    seen_source: set[tuple[str, str, str]] = set()
+    processed_source = frappe.db.count("PMT Historico")
+    counters = _new_counters()
     inserted = 0
-    skipped_source_duplicate = 0
-    skipped_invalid = 0
-    skipped_existing_target = 0
-    skipped_missing_brand_link = 0
-    skipped_invalid_placa_tipo_link = 0
-
-    for row in source_rows:
-        placa_tipo = _normalize_placa_tipo(row.get("tipo_placa_id"))
-        placa_numero = _normalize_placa_numero(row.get("placa"))
-        marca_vehiculo = _normalize_marca(row.get("idmarca"))
-
-        if not placa_tipo or not placa_numero:
-            skipped_invalid += 1
-            continue
-        if not _placa_tipo_exists(placa_tipo):
-            skipped_invalid_placa_tipo_link += 1
-            continue
-
-        dedupe_key = (placa_tipo, placa_numero, marca_vehiculo)
-        if dedupe_key in seen_source:
-            skipped_source_duplicate += 1
-            continue
-        seen_source.add(dedupe_key)
-
-        if frappe.db.exists(
-            "PMT Vehiculo",
-            {
-                "placa_tipo": placa_tipo,
-                "placa_numero": placa_numero,
-            },
-        ):
-            skipped_existing_target += 1
-            continue
 
+    def insert(vehiculo):
+        nonlocal inserted
+        _, placa_tipo, placa_numero, marca_vehiculo = vehiculo
         doc = frappe.new_doc("PMT Vehiculo")
         doc.placa_tipo = placa_tipo
         doc.placa_numero = placa_numero
-        if marca_vehiculo and _marca_exists(marca_vehiculo):
+        if marca_vehiculo:
             doc.marca_vehiculo = marca_vehiculo
-        elif marca_vehiculo:
-            skipped_missing_brand_link += 1
-
         doc.insert(ignore_permissions=True)
-        frappe.db.commit()
 
         inserted += 1
         if verbose:
@@ -207,20 +224,21 @@ def insert_one_by_one(
                 f"[{inserted}] Insertado: placa_tipo={placa_tipo}, "
                 f"placa_numero={placa_numero}, marca_vehiculo={marca_vehiculo or '-'}"
             )
-        elif progress_every and inserted % int(progress_every) == 0:
-            print(f"Avance: {inserted} registros insertados")
 
-        if limit and inserted >= int(limit):
-            break
+    Pipeline(
+        "PMT Vehiculo",
+        reader=_iter_historico_rows(),
+        validate=_VehiculoValidator(counters, _load_lookups()),
+        row_writer=insert,
+        limit=limit,
+        progress_every=progress_every,
+        verbose=not verbose and bool(progress_every),
+    ).run()
 
     summary = {
         "inserted": inserted,
-        "skipped_source_duplicate": skipped_source_duplicate,
-        "skipped_existing_target": skipped_existing_target,
-        "skipped_invalid": skipped_invalid,
-        "skipped_missing_brand_link": skipped_missing_brand_link,
-        "skipped_invalid_placa_tipo_link": skipped_invalid_placa_tipo_link,
-        "processed_source": len(source_rows),
+        **counters,
+        "processed_source": processed_source,
         "limit": limit,
         "progress_every": progress_every,
         "mode": "one-by-one",
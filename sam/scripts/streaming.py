@@ -0,0 +1,90 @@
+"""
+Lectura por bloques de tablas grandes (PMT Historico, PMT Boleta, ...).
+
+frappe.get_all(..., limit_page_length=0) y frappe.db.sql(..., as_dict=True)
+cargan la tabla completa como lista de dicts antes de procesarla. Aquí se
+lee por bloques de tamaño fijo con paginación por llave (keyset) sobre
+order_by, y cada fila es una tupla simple.
+
+No se usa un cursor sin buffer: mientras se consume, la conexión no admite
+otras consultas, y los scripts insertan y hacen commit entre bloques.
+
+Uso:
+    >>> from sam.scripts.streaming import iter_chunks
+    >>> for rows in iter_chunks("PMT Historico", ["name", "placa"]):
+    ...     for name, placa in rows:
+    ...         ...
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator, Sequence
+
+import frappe
+
+CHUNK_SIZE = 5000
+
+
+def iter_chunks(
+    doctype: str,
+    fields: Sequence[str],
+    conditions: str = "",
+    values: dict | None = None,
+    order_by: Sequence[str] = ("name",),
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[list[tuple]]:
+    """
+    Recorre `tab<doctype>` en orden de order_by, de a chunk_size filas.
+
+    Las columnas de order_by que no estén en fields se agregan al final de
+    cada tupla (se necesitan para pedir el bloque siguiente).
+
+    Args:
+      doctype: DocType a leer
+      fields: columnas, en el orden de la tupla
+      conditions: filtro SQL adicional, con placeholders %(nombre)s
+      values: valores de conditions
+      order_by: llave única y ordenable (default: name)
+      chunk_size: filas por bloque
+
+    Yields:
+      list[tuple]: un bloque de filas
+    """
+    columns = list(fields) + [key for key in order_by if key not in fields]
+    key_positions = [columns.index(key) for key in order_by]
+    select = ", ".join(f"`{column}`" for column in columns)
+    key_columns = ", ".join(f"`{key}`" for key in order_by)
+    key_placeholders = ", ".join(f"%(__key_{i})s" for i in range(len(order_by)))
+
+    values = dict(values or {})
+    last = None
+    while True:
+        where = [f"({conditions})"] if conditions else []
+        if last is not None:
+            where.append(f"({key_columns}) > ({key_placeholders})")
+            values.update({f"__key_{i}": last[position] for i, position in enumerate(key_positions)})
+
+        rows = frappe.db.sql(
+            f"""
+            SELECT {select}
+            FROM `tab{doctype}`
+            {"WHERE " + " AND ".join(where) if where else ""}
+            ORDER BY {key_columns}
+            LIMIT {int(chunk_size)}
+            """,
+            values,
+        )
+        if not rows:
+            return
+
+        rows = list(rows)
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]
+
+
+def iter_rows(doctype: str, fields: Sequence[str], **kwargs) -> Iterator[tuple]:
+    """Como iter_chunks, pero fila por fila."""
+    for rows in iter_chunks(doctype, fields, **kwargs):
+        yield from rows
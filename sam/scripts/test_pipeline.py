@@ -0,0 +1,59 @@
+# Copyright (c) 2026, Lidar Holding Group S. A. and Contributors
+# See license.txt
+
+from frappe.tests.utils import FrappeTestCase
+
+from sam.scripts.pipeline import Pipeline
+
+
+class CountingValidator:
+	"""Rechaza los múltiplos de 3 y registra cada registro validado."""
+
+	def __init__(self):
+		self.seen = []
+
+	def __call__(self, records):
+		self.seen.extend(records)
+		valid = [r for r in records if r % 3]
+		rejected = [[r, "múltiplo de 3"] for r in records if not r % 3]
+		return valid, rejected
+
+
+class TestPipeline(FrappeTestCase):
+	def test_limit_stops_validation(self):
+		validator = CountingValidator()
+		written = []
+
+		stats = Pipeline(
+			"test",
+			reader=range(1, 1001),
+			validate=validator,
+			writer=written.extend,
+			batch_size=1000,
+			commit=False,
+			limit=5,
+			verbose=False,
+		).run()
+
+		self.assertEqual(written, [1, 2, 4, 5, 7])
+		# No se validan registros posteriores al quinto escrito
+		self.assertEqual(validator.seen, [1, 2, 3, 4, 5, 6, 7])
+		self.assertEqual((stats["read"], stats["written"], stats["rejected"]), (7, 5, 2))
+
+	def test_needs_row_writer(self):
+		bulk = []
+		single = []
+
+		stats = Pipeline(
+			"test",
+			reader=range(1, 11),
+			writer=bulk.extend,
+			row_writer=single.append,
+			needs_row_writer=lambda r: r % 4 == 0,
+			batch_size=5,
+			verbose=False,
+		).run()
+
+		self.assertEqual(bulk, [1, 2, 3, 5, 6, 7, 9, 10])
+		self.assertEqual(single, [4, 8])
+		self.assertEqual(stats["written"], 10)
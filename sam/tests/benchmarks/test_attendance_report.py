@@ -0,0 +1,201 @@
+# Copyright (c) 2026, Lidar Holding Group S. A. and Contributors
+# See license.txt
+
+"""
+Benchmark del cálculo de cumplimiento de turno del Hikvision Attendance
+Report (100k filas) contra la implementación anterior con strptime.
+
+    pip install pytest-benchmark
+    pytest sam/tests/benchmarks --benchmark-only
+"""
+
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import frappe
+
+from sam.sam.report.hikvision_attendance_report.hikvision_attendance_report import (
+	process_records,
+	to_seconds,
+)
+
+ROWS = 100_000
+
+SHIFTS = {
+	"Matutino": (timedelta(hours=8), timedelta(hours=16)),
+	"Vespertino": (timedelta(hours=13), timedelta(hours=21)),
+	"Nocturno": (timedelta(hours=22), timedelta(hours=6)),
+	"Medianoche": (timedelta(0), timedelta(hours=8)),
+}
+
+
+def make_records(rows=ROWS, seed=7):
+	rng = random.Random(seed)
+	shift_names = [*SHIFTS, None]
+	records = []
+	for i in range(rows):
+		entry = timedelta(seconds=rng.randrange(5 * 3600, 11 * 3600))
+		exit_time = entry + timedelta(seconds=rng.randrange(0, 11 * 3600))
+		if i % 997 == 0:
+			exit_time += timedelta(microseconds=500)
+		if i % 1009 == 0:
+			entry = timedelta(0)
+		shift = rng.choice(shift_names)
+		start_time, end_time = SHIFTS.get(shift, (None, None))
+		records.append(
+			frappe._dict(
+				employee=f"HR-EMP-{i % 500:05d}",
+				employee_name=f"Empleado {i % 500}",
+				hikvision_id=str(i % 500),
+				custom_renglon=None,
+				designation="Agente",
+				department=None,
+				date=date(2026, 1, 1) + timedelta(days=i // 500),
+				entry=entry,
+				exit_time=exit_time,
+				default_shift=shift,
+				start_time=start_time,
+				end_time=end_time,
+			)
+		)
+	return records
+
+
+def make_shifts():
+	return {name: (start, end, to_seconds(start), to_seconds(end)) for name, (start, end) in SHIFTS.items()}
+
+
+def legacy_process_records(attendance_records, filters):
+	"""Cálculo anterior (strptime por comparación), como referencia."""
+	processed_records = []
+	filter_applied = filters.get("show_entries_late") or filters.get("show_leave_before")
+	total_extra_time = timedelta(0)
+	total_late_time = timedelta(0)
+
+	for record in attendance_records:
+		entry_issue = ""
+		exit_issue = ""
+		extra_time = timedelta(0)
+		late_time = timedelta(0)
+
+		if record.entry and record.start_time:
+			try:
+				entry_time = datetime.strptime(str(record.entry), "%H:%M:%S")
+				shift_start_time = datetime.strptime(str(record.start_time), "%H:%M:%S")
+				if entry_time > shift_start_time:
+					entry_issue = "<span style='color:red'>TARDE</span>"
+				else:
+					entry_issue = "<span style='color:green'>OK</span>"
+			except (ValueError, TypeError):
+				entry_issue = "-"
+
+		if record.exit_time and record.end_time:
+			try:
+				exit_time = datetime.strptime(str(record.exit_time), "%H:%M:%S")
+				shift_end_time = datetime.strptime(str(record.end_time), "%H:%M:%S")
+				if exit_time < shift_end_time:
+					exit_issue = "<span style='color:red'>ANTES</span>"
+				else:
+					exit_issue = "<span style='color:green'>OK</span>"
+			except (ValueError, TypeError):
+				exit_issue = "-"
+
+		if record.entry and record.exit_time and record.start_time and record.end_time:
+			try:
+				entry_dt = datetime.strptime(str(record.entry), "%H:%M:%S")
+				exit_dt = datetime.strptime(str(record.exit_time), "%H:%M:%S")
+				shift_start_dt = datetime.strptime(str(record.start_time), "%H:%M:%S")
+				shift_end_dt = datetime.strptime(str(record.end_time), "%H:%M:%S")
+				worked_hours = exit_dt - entry_dt
+				shift_duration = shift_end_dt - shift_start_dt
+				if worked_hours > shift_duration:
+					extra_time = worked_hours - shift_duration
+					total_extra_time += extra_time
+				if worked_hours < shift_duration:
+					late_time = shift_duration - worked_hours
+					total_late_time += late_time
+			except (ValueError, TypeError):
+				pass
+
+		processed_record = {
+			"employee": record.employee,
+			"employee_name": record.employee_name,
+			"hikvision_id": record.hikvision_id,
+			"custom_renglon": record.custom_renglon or "",
+			"designation": record.designation or "",
+			"department": record.department or "",
+			"date": record.date,
+			"entry": record.entry,
+			"exit_time": record.exit_time,
+			"entry_issue": entry_issue,
+			"exit_issue": exit_issue,
+			"extra_time": legacy_format_timedelta(extra_time),
+			"late_time": legacy_format_timedelta(late_time),
+		}
+
+		if filter_applied:
+			should_add = False
+			if filters.get("show_entries_late") and "TARDE" in entry_issue:
+				should_add = True
+			if filters.get("show_leave_before") and "ANTES" in exit_issue:
+				should_add = True
+			if should_add:
+				processed_records.append(processed_record)
+		else:
+			processed_records.append(processed_record)
+
+	if processed_records:
+		processed_records.append(
+			{
+				"employee": "<b>TOTAL</b>",
+				"employee_name": "",
+				"hikvision_id": "",
+				"custom_renglon": "",
+				"designation": "",
+				"department": "",
+				"date": "",
+				"entry": "",
+				"exit_time": "",
+				"entry_issue": "",
+				"exit_issue": "",
+				"extra_time": "<b>" + legacy_format_timedelta(total_extra_time) + "</b>",
+				"late_time": "<b>" + legacy_format_timedelta(total_late_time) + "</b>",
+			}
+		)
+
+	return processed_records
+
+
+def legacy_format_timedelta(td):
+	if not td or td == timedelta(0):
+		return "00:00:00"
+	total_seconds = int(td.total_seconds())
+	hours = total_seconds // 3600
+	minutes = (total_seconds % 3600) // 60
+	seconds = total_seconds % 60
+	return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+FILTERS = [{}, {"show_entries_late": 1}, {"show_entries_late": 1, "show_leave_before": 1}]
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_matches_legacy_output(filters):
+	records = make_records(rows=20_000)
+
+	assert process_records(records, make_shifts(), filters) == legacy_process_records(records, filters)
+
+
+def test_process_records_100k(benchmark):
+	records = make_records()
+	shifts = make_shifts()
+	benchmark(process_records, records, shifts, {})
+
+
+def test_legacy_process_records_100k(benchmark):
+	records = make_records()
+	benchmark(legacy_process_records, records, {})
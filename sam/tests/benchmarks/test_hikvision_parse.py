@@ -0,0 +1,52 @@
+# Copyright (c) 2026, Lidar Holding Group S. A. and Contributors
+# See license.txt
+
+"""
+Benchmarks del parser de eventos Hikvision (costo por evento).
+
+    pip install pytest-benchmark
+    pytest sam/tests/benchmarks --benchmark-only
+"""
+
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from sam.api.hikvision import build_event_row, parse_hikvision_event
+
+SAMPLES = Path(__file__).parent / "samples"
+
+CASES = {
+	"json": ("access_controller_event.json", "application/json"),
+	"multipart": ("access_controller_event_multipart.txt", "multipart/form-data; boundary=MIME_boundary"),
+	"xml": ("event_notification_alert.xml", "application/xml"),
+}
+
+
+def load_sample(kind):
+	filename, content_type = CASES[kind]
+	# newline="" conserva los \r\n del multipart grabado
+	with open(SAMPLES / filename, encoding="utf-8", newline="") as f:
+		return f.read(), content_type
+
+
+@pytest.mark.parametrize("kind", CASES)
+def test_parse_event(benchmark, kind):
+	raw_body, content_type = load_sample(kind)
+	parsed = benchmark(parse_hikvision_event, raw_body, content_type)
+
+	assert parsed["dateTime"].startswith("2026-03-12")
+
+
+@pytest.mark.parametrize("kind", CASES)
+def test_parse_and_build_row(benchmark, kind):
+	raw_body, content_type = load_sample(kind)
+
+	def run():
+		return build_event_row(parse_hikvision_event(raw_body, content_type), raw_body, content_type, "172.16.0.25")
+
+	row = benchmark(run)
+
+	assert row["name_field"] == "Juan Perez"
@@ -0,0 +1,114 @@
+# Copyright (c) 2026, Lidar Holding Group S. A. and Contributors
+# See license.txt
+
+"""
+Benchmark del transformador compilado de la importación de PMT Historico
+sobre un CSV sintético de 1M filas; reporta filas/s en extra_info.
+
+    pip install pytest-benchmark
+    pytest sam/tests/benchmarks --benchmark-only
+"""
+
+import csv
+import random
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from sam.scripts.pmt_historico_import import (
+	_build_field_index,
+	_compile_transformer,
+	_iter_rows,
+)
+
+ROWS = 1_000_000
+
+HEADERS = [
+	"IdInfraccion", "Fecha", "Hora", "BLegal", "Detalle", "Lugar", "Total", "Observaciones",
+	"FechaLimite", "TotalLimite", "Foto1", "Foto2", "Foto3", "IdInstitucion", "IdSituacion",
+	"IdAgente", "IdMulta", "Status", "Placa", "TCirculacion", "Color", "IdTipoVehiculo",
+	"TipoPlaca", "IdMarca", "NitConductor", "Nombres", "Apellidos", "DPI", "Cedula",
+	"NLicencia", "IdTipoLicencia", "FechaOpera", "ArticuloValido",
+]
+
+
+def make_row(i, rng):
+	return [
+		str(i),
+		f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/20{rng.randint(10, 25)}",
+		f"{rng.randint(0, 23)}:{rng.randint(0, 59):02d}",
+		str(rng.randint(1, 200)),
+		"Detalle de la infracción",
+		"Zona 1",
+		str(rng.choice([100, 300, 500])),
+		rng.choice(["", "NULL", "Sin observaciones"]),
+		"",
+		str(rng.choice([50, 150, 250])),
+		"", "", "",
+		rng.choice(["0", "1", ""]),
+		str(rng.randint(1, 6)),
+		str(rng.randint(1, 400)),
+		str(rng.randint(1, 50)),
+		rng.choice(["1", "2"]),
+		f"{rng.randint(100, 999)}{rng.choice('ABCDEFG')}{rng.choice('HJKLMN')}{rng.choice('PQRST')}",
+		str(rng.randint(10**6, 10**7)),
+		rng.choice(["ROJO", "NEGRO", "BLANCO", "NULL"]),
+		str(rng.randint(0, 12)),
+		"",
+		str(rng.randint(0, 347)),
+		"CF",
+		"Nombre",
+		"Apellido",
+		"",
+		"",
+		"",
+		rng.choice(["1", "2", "3", "", "NULL"]),
+		"2020-01-01",
+		"",
+	]
+
+
+@pytest.fixture(scope="module")
+def synthetic_csv(tmp_path_factory):
+	path = tmp_path_factory.mktemp("pmt") / "PMT Historico.csv"
+	rng = random.Random(11)
+	with open(path, "w", newline="", encoding="utf-8") as f:
+		writer = csv.writer(f)
+		writer.writerow(HEADERS)
+		writer.writerows(make_row(i, rng) for i in range(ROWS))
+	return str(path)
+
+
+def test_compiled_transformer_values():
+	transform = _compile_transformer(_build_field_index(HEADERS))
+	row = make_row(1, random.Random(0))
+	row[1], row[2], row[13], row[14] = "1/2/2020", "8:05", "Sí", " 05 "
+	row[17], row[18], row[21], row[23], row[30] = "PAGADA", " P123ABC ", "6", "", "NULL"
+
+	values = dict(zip([fieldname for fieldname, _ in _build_field_index(HEADERS)], transform(row), strict=True))
+
+	assert values["fecha"] == "2020-02-01"
+	assert values["hora"] == "08:05:00"
+	assert values["idinstitucion"] == 1
+	assert values["idsituacion"] == "FIRMO"
+	assert values["status"] == "PAGADA"
+	assert values["placa"] == "P123ABC"
+	assert values["idtipovehiculo"] == 6
+	assert (values["tipo_placa"], values["tipo_placa_id"]) == ("MOTO", "M")
+	assert values["placa_unificada"] == "MP123ABC"
+	assert values["idmarca"] == ""
+	assert values["idtipolicencia"] == "NULL"
+	assert values["articulo_valido"] == ""  # blegal sin PMT Articulo que le corresponda
+	assert values["consolidado"].startswith("1 | 2020-02-01 | 08:05:00 | ")
+
+
+def test_transform_rows_1m(benchmark, synthetic_csv):
+	def run():
+		return sum(1 for _ in _iter_rows(synthetic_csv))
+
+	rows = benchmark.pedantic(run, rounds=1, iterations=1)
+
+	assert rows == ROWS
+	benchmark.extra_info["rows"] = rows
+	benchmark.extra_info["rows_per_second"] = round(rows / benchmark.stats.stats.mean)
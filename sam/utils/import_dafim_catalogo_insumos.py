@@ -1,8 +1,11 @@
+from functools import partial
 from pathlib import Path
 
 import frappe
+from frappe.utils import cint
 from openpyxl import load_workbook
 
+from sam.scripts.pipeline import Pipeline
 
 DOCTYPE_FIELDS = {
     "codigo_insumo",
@@ -18,8 +21,14 @@ DOCTYPE_FIELDS = {
 
 REQUIRED_FIELDS = {"codigo_insumo", "nombre_insumo", "renglon_presupuestario"}
 
+INT_FIELDS = {"codigo_insumo", "codigo_presentacion"}
+
 NAMING_PATTERN = "format:{codigo_insumo}-{renglon_presupuestario}"
 
+DOCTYPE = "DAFIM Catalogo Insumos"
+
+ERROR_CSV_HEADER = ["fila", "codigo_insumo", "renglon_presupuestario", "error"]
+
 
 def _sanitize_utf8(value):
     if value is None:
@@ -41,16 +50,138 @@ def _normalize_cell(value):
     return value
 
 
-def import_dafim_catalogo_insumos(limit=None):
+def _row_values(row, column_indexes):
+    values = {}
+    for fieldname in DOCTYPE_FIELDS:
+        column_index = column_indexes.get(fieldname)
+        raw_value = row[column_index] if column_index is not None else None
+        values[fieldname] = _normalize_cell(raw_value)
+
+    mapped_indexes = set(column_indexes.values())
+    extras = []
+    for index, cell in enumerate(row):
+        if index in mapped_indexes:
+            continue
+        cleaned = _normalize_cell(cell)
+        if cleaned not in (None, ""):
+            extras.append(str(cleaned))
+
+    if extras:
+        if values.get("caracteristicas"):
+            values["caracteristicas"] = f"{values['caracteristicas']} {' '.join(extras)}"
+        else:
+            values["caracteristicas"] = " ".join(extras)
+
+    for fieldname in ("nombre_insumo", "caracteristicas"):
+        if isinstance(values[fieldname], str):
+            values[fieldname] = values[fieldname].strip()
+    if isinstance(values["nombre_insumo"], str):
+        values["nombre_insumo"] = values["nombre_insumo"][:140]
+    return values
+
+
+def _transform_rows(records, column_indexes):
+    """Transform del pipeline: [(fila Excel, celdas)] -> [(fila Excel, valores)]."""
+    return [(excel_row_index, _row_values(row, column_indexes)) for excel_row_index, row in records]
+
+
+def _combination_key(codigo_insumo, renglon_presupuestario):
+    return (str(cint(codigo_insumo)), str(renglon_presupuestario))
+
+
+class _InsumoValidator:
+    """
+    Validate del pipeline: datos requeridos, repetidos en el archivo y
+    combinaciones (codigo_insumo, renglon_presupuestario) ya existentes,
+    cargadas una sola vez.
+    """
+
+    def __init__(self):
+        self.seen_combinations = set()
+        self.existing = {
+            _combination_key(codigo_insumo, renglon_presupuestario)
+            for codigo_insumo, renglon_presupuestario in frappe.db.sql(
+                f"SELECT codigo_insumo, renglon_presupuestario FROM `tab{DOCTYPE}`"
+            )
+        }
+
+    def __call__(self, records):
+        valid = []
+        rejected = []
+        for excel_row_index, values in records:
+            codigo_insumo = values.get("codigo_insumo")
+            renglon_presupuestario = values.get("renglon_presupuestario")
+
+            if not codigo_insumo or not values.get("nombre_insumo") or not renglon_presupuestario:
+                rejected.append([
+                    excel_row_index,
+                    codigo_insumo,
+                    renglon_presupuestario,
+                    f"Datos requeridos faltantes (nombre_insumo={values.get('nombre_insumo')})",
+                ])
+                continue
+
+            combination_key = _combination_key(codigo_insumo, renglon_presupuestario)
+            if combination_key in self.seen_combinations:
+                continue
+            self.seen_combinations.add(combination_key)
+
+            if combination_key in self.existing:
+                rejected.append([
+                    excel_row_index,
+                    codigo_insumo,
+                    renglon_presupuestario,
+                    "codigo_insumo y renglon_presupuestario ya existen",
+                ])
+                continue
+
+            valid.append((excel_row_index, values))
+        return valid, rejected
+
+
+def _bulk_insert(records):
+    now = frappe.utils.now()
+    owner = frappe.session.user
+    fields = sorted(DOCTYPE_FIELDS)
+    frappe.db.bulk_insert(
+        DOCTYPE,
+        ["name", "owner", "creation", "modified", "modified_by", "docstatus", *fields],
+        [
+            (
+                f"{values['codigo_insumo']}-{values['renglon_presupuestario']}", owner, now, now, owner, 0,
+                *(cint(values[f]) if f in INT_FIELDS else values[f] for f in fields),
+            )
+            for _, values in records
+        ],
+    )
+
+
+def _insert_doc(record):
+    _, values = record
+    doc = frappe.new_doc(DOCTYPE)
+    doc.update(values)
+    doc.insert(ignore_permissions=True)
+
+
+def _insert_failed(record, error):
+    excel_row_index, values = record
+    return [excel_row_index, values.get("codigo_insumo"), values.get("renglon_presupuestario"), str(error)]
+
+
+def import_dafim_catalogo_insumos(limit=None, batch_size=500):
+    """
+    Importa el Excel de insumos con sam.scripts.pipeline: INSERT
+    multi-fila y commit por lote; las filas omitidas o que fallan quedan
+    en import_dafim_catalogo_insumos_errors.csv.
+    """
     app_path = Path(frappe.get_app_path("sam"))
     file_path = app_path / "utils" / "insumos_excel.xlsx"
-    log_path = app_path / "utils" / "import_dafim_catalogo_insumos_errors.log"
-    doctype = "DAFIM Catalogo Insumos"
+    error_path = app_path / "utils" / "import_dafim_catalogo_insumos_errors.csv"
 
     if not file_path.exists():
         raise FileNotFoundError(f"Archivo no encontrado: {file_path}")
 
-    meta = frappe.get_meta(doctype)
+    meta = frappe.get_meta(DOCTYPE)
     if meta.autoname != NAMING_PATTERN:
         raise ValueError(
             f"El autoname del DocType ({meta.autoname}) no coincide con el esperado ({NAMING_PATTERN})."
@@ -79,84 +210,26 @@ def import_dafim_catalogo_insumos(limit=None):
             f"El archivo Excel no contiene las columnas requeridas: {', '.join(missing_columns)}"
         )
 
-    inserted = 0
-    seen_combinations = set()
-    for excel_row_index, row in enumerate(rows, start=2):
-        if not any(cell not in (None, "") for cell in row):
-            continue
-
-        if limit is not None and inserted >= limit:
-            break
-
-        values = {}
-        for fieldname in DOCTYPE_FIELDS:
-            column_index = column_indexes.get(fieldname)
-            raw_value = row[column_index] if column_index is not None else None
-            values[fieldname] = _normalize_cell(raw_value)
-
-        mapped_indexes = set(column_indexes.values())
-        extras = []
-        for index, cell in enumerate(row):
-            if index in mapped_indexes:
-                continue
-            cleaned = _normalize_cell(cell)
-            if cleaned not in (None, ""):
-                extras.append(str(cleaned))
-
-        if extras:
-            if values.get("caracteristicas"):
-                values["caracteristicas"] = f"{values['caracteristicas']} {' '.join(extras)}"
-            else:
-                values["caracteristicas"] = " ".join(extras)
-
-        codigo_insumo = values.get("codigo_insumo")
-        renglon_presupuestario = values.get("renglon_presupuestario")
-
-        if not codigo_insumo or not values.get("nombre_insumo") or not renglon_presupuestario:
-            error_line = (
-                f"Fila {excel_row_index} omitida (datos requeridos faltantes). "
-                f"Valores: codigo_insumo={codigo_insumo}, nombre_insumo={values.get('nombre_insumo')}, "
-                f"renglon_presupuestario={renglon_presupuestario}\n"
-            )
-            with log_path.open("a", encoding="utf-8") as logfile:
-                logfile.write(error_line)
-            continue
-
-        combination_key = (codigo_insumo, renglon_presupuestario)
-        if combination_key in seen_combinations:
-            continue
-        seen_combinations.add(combination_key)
-
-        if frappe.db.exists(
-            doctype,
-            {"codigo_insumo": codigo_insumo, "renglon_presupuestario": renglon_presupuestario},
-        ):
-            print(
-                f"Fila {excel_row_index} omitida "
-                f"(codigo_insumo y renglon_presupuestario ya existen): "
-                f"{codigo_insumo} / {renglon_presupuestario}"
-            )
-            continue
-
-        try:
-            doc = frappe.new_doc(doctype)
-
-            for fieldname, value in values.items():
-                if fieldname in {"nombre_insumo", "caracteristicas"} and isinstance(value, str):
-                    value = value.strip()
-                if fieldname == "nombre_insumo" and isinstance(value, str):
-                    value = value[:140]
-                doc.set(fieldname, value)
-
-            doc.insert(ignore_permissions=True)
-            inserted += 1
-            print(f"Fila {excel_row_index} insertada correctamente")
-        except Exception as exc:
-            error_line = (
-                f"Fila {excel_row_index} (codigo_insumo={codigo_insumo}): {exc}\n"
-            )
-            with log_path.open("a", encoding="utf-8") as logfile:
-                logfile.write(error_line)
-
-    frappe.db.commit()
+    records = (
+        (excel_row_index, row)
+        for excel_row_index, row in enumerate(rows, start=2)
+        if any(cell not in (None, "") for cell in row)
+    )
+    stats = Pipeline(
+        DOCTYPE,
+        reader=records,
+        transform=partial(_transform_rows, column_indexes=column_indexes),
+        validate=_InsumoValidator(),
+        writer=_bulk_insert,
+        row_writer=_insert_doc,
+        on_error=_insert_failed,
+        batch_size=batch_size,
+        limit=limit,
+        dead_letter_path=str(error_path),
+        dead_letter_header=ERROR_CSV_HEADER,
+    ).run()
+
+    if stats["dead_letter"]:
+        print(f"Filas omitidas o con error en {stats['dead_letter']}")
     print("Importacion completada.")
+    return stats
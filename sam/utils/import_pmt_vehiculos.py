@@ -1,29 +1,122 @@
-import frappe
 import csv
+import os
 
-def import_pmt_vehiculos():
-    file_path = "/home/frappe/frappe-bench/pmt_vehiculo.csv"
-    doctype = "PMT Vehiculo"   # ← nombre correcto del Doctype
+import frappe
 
-    with open(file_path, "r") as csvfile:
-        reader = csv.DictReader(csvfile)
-        row_number = 0
+from sam.scripts.pipeline import Pipeline
+
+FILE_PATH = "/home/frappe/frappe-bench/pmt_vehiculo.csv"
+DOCTYPE = "PMT Vehiculo"   # ← nombre correcto del Doctype
+
+CSV_FIELDS = [
+    "placa_tipo",
+    "placa_numero",
+    "tipo_vehiculo",
+    "color",
+    "tarjeta_circulacion",
+    "marca_vehiculo",
+]
+
+LINK_FIELDS = {
+    "placa_tipo": "PMT Placa Tipo",
+    "tipo_vehiculo": "PMT Vehiculo Tipo",
+    "color": "PMT Vehiculo Color",
+    "marca_vehiculo": "PMT Marca Vehiculo",
+}
+
+ERROR_CSV_HEADER = ["fila", "placa_tipo", "placa_numero", "error"]
+
+
+class _VehiculoValidator:
+    """
+    Validate del pipeline: valida los links y los vehículos existentes
+    contra catálogos cargados una sola vez. Las llaves van en mayúsculas,
+    como las compara MariaDB; el valor es el nombre real del registro.
+    """
+
+    def __init__(self):
+        self.links = {
+            fieldname: {n.upper(): n for n in frappe.db.sql_list(f"SELECT name FROM `tab{doctype}`")}
+            for fieldname, doctype in LINK_FIELDS.items()
+        }
+        self.existing = {n.upper() for n in frappe.db.sql_list(f"SELECT name FROM `tab{DOCTYPE}`")}
 
-        for row in reader:
-            row_number += 1
+    def __call__(self, records):
+        valid = []
+        rejected = []
+        for row_number, row in records:
+            values = {fieldname: (row.get(fieldname) or "").strip() or None for fieldname in CSV_FIELDS}
+            # Igual que PMTVehiculo.validate
+            values["placa_numero"] = (values["placa_numero"] or "").upper() or None
 
-            doc = frappe.new_doc(doctype)
+            if not values["placa_tipo"] or not values["placa_numero"]:
+                rejected.append([row_number, values["placa_tipo"], values["placa_numero"], "Falta placa_tipo o placa_numero"])
+                continue
 
-            doc.placa_tipo = row.get("placa_tipo")
-            doc.placa_numero = row.get("placa_numero")
-            doc.tipo_vehiculo = row.get("tipo_vehiculo")
-            doc.color = row.get("color")
-            doc.tarjeta_circulacion = row.get("tarjeta_circulacion")
-            doc.marca_vehiculo = row.get("marca_vehiculo")
+            error = None
+            for fieldname, doctype in LINK_FIELDS.items():
+                if values[fieldname]:
+                    link = self.links[fieldname].get(values[fieldname].upper())
+                    if not link:
+                        error = f"No existe {doctype}: {values[fieldname]}"
+                        break
+                    values[fieldname] = link
+            if error:
+                rejected.append([row_number, values["placa_tipo"], values["placa_numero"], error])
+                continue
 
-            doc.insert(ignore_permissions=True)
+            name = f"{values['placa_tipo']}{values['placa_numero']}"
+            if name.upper() in self.existing:
+                rejected.append([row_number, values["placa_tipo"], values["placa_numero"], f"Ya existe {DOCTYPE}: {name}"])
+                continue
+            self.existing.add(name.upper())
 
-            print(f"Fila {row_number} insertada correctamente")
+            valid.append((row_number, name, values))
+        return valid, rejected
+
+
+def _bulk_insert(records):
+    now = frappe.utils.now()
+    owner = frappe.session.user
+    frappe.db.bulk_insert(
+        DOCTYPE,
+        ["name", "owner", "creation", "modified", "modified_by", "docstatus", *CSV_FIELDS],
+        [(name, owner, now, now, owner, 0, *(values[f] for f in CSV_FIELDS)) for _, name, values in records],
+    )
+
+
+def _insert_doc(record):
+    _, _, values = record
+    doc = frappe.new_doc(DOCTYPE)
+    doc.update(values)
+    doc.insert(ignore_permissions=True)
+
+
+def _insert_failed(record, error):
+    row_number, _, values = record
+    return [row_number, values["placa_tipo"], values["placa_numero"], str(error)]
+
+
+def import_pmt_vehiculos(file_path=FILE_PATH, batch_size=1000):
+    """
+    Importa el CSV a PMT Vehiculo con sam.scripts.pipeline: INSERT
+    multi-fila y commit por lote; las filas rechazadas o que fallan van a
+    <csv>_errors.csv.
+    """
+    with open(file_path, "r") as csvfile:
+        stats = Pipeline(
+            DOCTYPE,
+            reader=enumerate(csv.DictReader(csvfile), start=1),
+            validate=_VehiculoValidator(),
+            writer=_bulk_insert,
+            row_writer=_insert_doc,
+            on_error=_insert_failed,
+            batch_size=batch_size,
+            dead_letter_path=f"{os.path.splitext(file_path)[0]}_errors.csv",
+            dead_letter_header=ERROR_CSV_HEADER,
+        ).run()
 
-    frappe.db.commit()
+    if stats["dead_letter"]:
+        print(f"Filas con error en {stats['dead_letter']}")
     print("Importación completada.")
+    return stats